@@ -0,0 +1,282 @@
+"""
+Measures bulk mail throughput by sending a synthetic campaign with
+send_emails_smtp to an in-process SMTP sink, and keeps a history of runs so
+regressions are visible. The PDF/DOCX libraries are not needed, as the body
+is HTML.
+
+Every run happens in a fresh interpreter and reports messages (SMTP
+transactions), recipients and bytes per second, p50/p99 per-message latency
+and peak RSS (the sink shares the process but keeps no message bodies).
+
+Usage (from the bulk_mail folder):
+    python benchmarks/throughput.py                      # run, compare, save
+    python benchmarks/throughput.py --recipients 2000 --attachments 2 --size 5M
+    python benchmarks/throughput.py --connections 8 --batch-size 50 --no-save
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import time
+
+BULK_MAIL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_RUNS = os.path.join(os.path.dirname(__file__), "runs.jsonl")
+DEFAULT_TIMEOUT = 600.0  # Seconds a campaign may take before it counts as hung
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua."
+)
+
+
+def parse_size(value: str) -> int:
+    """Byte count with an optional K/M/G suffix, e.g. "512K" or "20M"."""
+    units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+    value = value.strip().upper()
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+
+def make_attachments(folder: str, count: int, size: int):
+    """Deterministic incompressible attachments, written in 1 MB chunks."""
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f"attachment_{index + 1}.bin")
+        if not os.path.exists(path) or os.path.getsize(path) != size:
+            generator = random.Random(index)
+            with open(path, "wb") as f:
+                remaining = size
+                while remaining:
+                    chunk = min(remaining, 1024 * 1024)
+                    f.write(generator.randbytes(chunk))
+                    remaining -= chunk
+        paths.append(path)
+    return paths
+
+
+def make_recipients(count: int, domains: int = 10):
+    return [f"user{index}@example{index % domains}.com" for index in range(count)]
+
+
+def make_body(paragraphs: int = 20, personalized: bool = False):
+    greeting = "<p>Dear {{ name }} ({{ company }}),</p>" if personalized else ""
+    return greeting + "".join(f"<p>{LOREM}</p>" for _ in range(paragraphs))
+
+
+def percentile(values, fraction: float):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _measure(params, attachment_paths, results):
+    os.chdir(BULK_MAIL_DIR)
+    sys.path.insert(0, BULK_MAIL_DIR)
+    from src.bulk_mail import send_emails_smtp
+    from src.smtp_sink import SMTPSink
+
+    recipients = make_recipients(params["recipients"])
+    fields = None
+    if params["personalized"]:
+        fields = {
+            recipient: {"name": f"User {index}", "company": "Example Ltd"}
+            for index, recipient in enumerate(recipients)
+        }
+    durations = []
+    finished = {}
+
+    def on_event(event):
+        if event["event"] in ("sent", "failed") and event["duration"] is not None:
+            durations.append(event["duration"])
+        elif event["event"] == "finished":
+            finished.update(event)
+
+    try:
+        with SMTPSink(keep_messages=False) as sink:
+            account = sink.account(
+                rate_per_second=params["rate"], connections=params["connections"]
+            )
+            start = time.perf_counter()
+            send_emails_smtp(
+                account,
+                recipients,
+                "Benchmark campaign",
+                make_body(personalized=params["personalized"]),
+                attachment_paths,
+                True,
+                on_event=on_event,
+                batch_size=params["batch_size"],
+                recipient_fields=fields,
+            )
+            elapsed = time.perf_counter() - start
+            messages = sink.message_count
+            recipient_count = sink.recipient_count
+            bytes_received = sink.bytes_received
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        return
+
+    results.put(
+        {
+            "elapsed_s": round(elapsed, 4),
+            "messages": messages,
+            "recipients": recipient_count,
+            "failed_recipients": finished["failed"],
+            # A batched message is one transaction for several recipients
+            "messages_per_s": round(messages / elapsed, 2),
+            "recipients_per_s": round(recipient_count / elapsed, 2),
+            "mb_per_s": round(bytes_received / elapsed / 1024**2, 3),
+            "p50_ms": _milliseconds(percentile(durations, 0.50)),
+            "p99_ms": _milliseconds(percentile(durations, 0.99)),
+            "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+    )
+
+
+def _collect(process, results, timeout: float):
+    """Waits for the metrics of the benchmark process, or for it to die or hang."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                return {"error": f"Benchmark process exited with {process.exitcode}"}
+            if time.monotonic() > deadline:
+                process.terminate()
+                return {"error": f"No result within {timeout:.0f}s"}
+
+
+def run_campaign(params, work_dir, timeout: float = DEFAULT_TIMEOUT):
+    attachment_paths = make_attachments(
+        work_dir, params["attachments"], params["attachment_size"]
+    )
+    # A fresh interpreter keeps peak RSS per run honest
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=_measure, args=(params, attachment_paths, results)
+    )
+    process.start()
+    metrics = _collect(process, results, timeout)
+    process.join()
+    return metrics
+
+
+def previous_run(runs_path, params):
+    """Most recent saved run with the same campaign parameters, if any."""
+    if not os.path.exists(runs_path):
+        return None
+    match = None
+    with open(runs_path) as f:
+        for line in f:
+            run = json.loads(line)
+            if run["params"] == params:
+                match = run
+    return match
+
+
+def compare(metrics, previous, threshold):
+    """Returns regression messages for metrics worse than previous by threshold."""
+    if previous is None:
+        return []
+    regressions = []
+    for metric in ("messages_per_s", "recipients_per_s", "mb_per_s"):
+        # Higher is better; runs saved before recipients_per_s lack it
+        before = previous["metrics"].get(metric)
+        if before and metrics[metric] < before * (1 - threshold):
+            regressions.append(f"{metric} {(metrics[metric] / before - 1) * 100:.0f}%")
+    for metric in ("p50_ms", "p99_ms", "peak_rss_kb"):  # Lower is better
+        before, after = previous["metrics"][metric], metrics[metric]
+        if before and after is not None and after > before * (1 + threshold):
+            regressions.append(f"{metric} +{(after / before - 1) * 100:.0f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--attachments", type=int, default=1)
+    parser.add_argument(
+        "--size", type=parse_size, default="1M", help="Bytes per attachment (K/M/G)"
+    )
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument(
+        "--rate", type=float, default=1e6, help="Recipients per second limit"
+    )
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--personalized", action="store_true")
+    parser.add_argument("--work-dir", help="Keep the synthetic attachments here")
+    parser.add_argument("--runs", default=DEFAULT_RUNS, help="Run history (JSONL)")
+    parser.add_argument("--label", help="Note stored with the run, e.g. a commit")
+    parser.add_argument("--no-save", dest="save", action="store_false")
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds per run"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)"
+    )
+    args = parser.parse_args()
+
+    params = {
+        "recipients": args.recipients,
+        "attachments": args.attachments,
+        "attachment_size": args.size,
+        "connections": args.connections,
+        "rate": args.rate,
+        "batch_size": args.batch_size,
+        "personalized": args.personalized,
+    }
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bulk_mail_bench_")
+    os.makedirs(work_dir, exist_ok=True)
+
+    metrics = run_campaign(params, work_dir, args.timeout)
+    if "error" in metrics:
+        print(f"Benchmark failed: {metrics['error']}")
+        return 1
+
+    previous = previous_run(args.runs, params)
+    regressions = compare(metrics, previous, args.threshold)
+    if metrics["p50_ms"] is None:
+        latency = "no latency samples"
+    else:
+        latency = f"p50 {metrics['p50_ms']:.2f} ms, p99 {metrics['p99_ms']:.2f} ms"
+    print(
+        f"{metrics['messages']} messages in {metrics['elapsed_s']:.2f}s: "
+        f"{metrics['messages_per_s']:.1f} msgs/s, "
+        f"{metrics['recipients_per_s']:.1f} recipients/s, "
+        f"{metrics['mb_per_s']:.2f} MB/s, "
+        f"{latency}, peak RSS {metrics['peak_rss_kb'] / 1024:.1f} MB"
+    )
+    if previous is not None:
+        print(f"vs run of {previous['timestamp']}: {', '.join(regressions) or 'ok'}")
+
+    if args.save:
+        run = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "label": args.label,
+            "params": params,
+            "metrics": metrics,
+        }
+        with open(args.runs, "a") as f:
+            f.write(json.dumps(run, sort_keys=True) + "\n")
+        print(f"Run saved to {args.runs}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,12 @@
 import os
 import webbrowser
-from src.bulk_mail import send_bulk_emails, get_recipients, get_email_body
+from src.bulk_mail import (
+    send_bulk_emails,
+    get_recipients,
+    get_email_body,
+    get_recipient_fields,
+)
+from src.render import check_fields, compile_template
 
 if __name__ == "__main__":
     # Configuration
@@ -18,9 +24,16 @@ if __name__ == "__main__":
     )  # Specify the content file path
     body_file = os.path.join(email_folder, body)
 
-    # Generate the email body content
+    # Generate the email body content (cached, so the send reuses it)
     email_body = get_email_body(body_file, content_path=content_path)
 
+    # Preview a personalized body as the first recipient will see it
+    recipient_fields = get_recipient_fields(recipients_file)
+    if recipient_fields:
+        template = compile_template(email_body, escape_html=body.endswith(".html"))
+        check_fields(template, recipient_fields)  # As the send would
+        email_body = template.render(next(iter(recipient_fields.values())))
+
     # Save the HTML preview to a temporary file
     preview_file_path = os.path.join(email_folder, "email_preview.html")
     with open(preview_file_path, "w") as preview_file:
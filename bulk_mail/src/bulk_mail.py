@@ -1,19 +1,23 @@
 import os
 import re
-import smtplib
 import time
-from email.mime.application import MIMEApplication
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email import encoders
 
-import fitz  # PyMuPDF for PDFs
-from docx import Document  # python-docx for Word files
-from dotenv import load_dotenv
+from src.journal import SendJournal
+from src.message import PreparedMessage, batch_recipients
+from src.render import (
+    ContentCache,
+    check_fields,
+    compile_template,
+    read_recipients_csv,
+)
+from src.rate_limit import SECONDS_PER_DAY
+from src.sender import account_limiter, send_messages, send_sharded
 
 
 # Load email account details from environment variables
 def load_accounts():
+    from dotenv import load_dotenv
+
     accounts = {}
     load_dotenv()
     account_names = eval(os.getenv("EMAIL_ACCOUNTS"))
@@ -25,6 +29,10 @@ def load_accounts():
         smtp_server = os.getenv(f"{name.upper()}_SMTP_SERVER")
         smtp_port = os.getenv(f"{name.upper()}_SMTP_PORT")
         smtp_ssl = os.getenv(f"{name.upper()}_SMTP_SSL", "True") == "True"
+        smtp_starttls = os.getenv(f"{name.upper()}_SMTP_STARTTLS", "True") == "True"
+        connections = os.getenv(f"{name.upper()}_CONNECTIONS")
+        rate_per_second = os.getenv(f"{name.upper()}_RATE_PER_SECOND")
+        rate_per_day = os.getenv(f"{name.upper()}_RATE_PER_DAY")
         accounts[name] = {
             "name": name,
             "email": email,
@@ -32,12 +40,20 @@ def load_accounts():
             "smtp_server": smtp_server,
             "smtp_port": int(smtp_port) if smtp_port else None,
             "smtp_ssl": smtp_ssl,
+            "smtp_starttls": smtp_starttls,
+            "connections": int(connections) if connections else None,
+            "rate_per_second": float(rate_per_second) if rate_per_second else None,
+            "rate_per_day": int(rate_per_day) if rate_per_day else None,
         }
     return accounts
 
 
 # Load recipients from a file
 def get_recipients(file_path):
+    # A CSV carries per-recipient fields as well (see get_recipient_fields)
+    if file_path.lower().endswith(".csv"):
+        return list(read_recipients_csv(file_path))
+
     with open(file_path, "r") as file:
         data = file.read()
         recipients = [
@@ -45,7 +61,18 @@ def get_recipients(file_path):
             for email in data.replace("\n", ",").replace(";", ",").split(",")
             if email.strip()
         ]
-    return recipients
+    # Drop duplicates (addresses are compared case-insensitively), keeping order
+    unique = {}
+    for email in recipients:
+        unique.setdefault(email.lower(), email)
+    return list(unique.values())
+
+
+# Load per-recipient fields (name, company, ...) for personalized bodies
+def get_recipient_fields(file_path):
+    if file_path.lower().endswith(".csv"):
+        return read_recipients_csv(file_path)
+    return {}
 
 
 # Load email body content from a file
@@ -55,20 +82,20 @@ def get_email_body(body_path, content_path=None):
         "CWT.html",
         "WTM.html",
     ]:
-        with open(body_path, "r") as file:
-            return file.read()
+        return content_cache.get(body_path)
 
     # If content_path is provided and it's a specific template, replace the placeholder with content
     if content_path and os.path.basename(body_path) in ["CWT.html", "WTM.html"]:
-        with open(body_path, "r") as template_file:
-            html_template = template_file.read()
-        main_content = read_file_content(content_path)
+        html_template = compile_template(content_cache.get(body_path))
+        main_content = content_cache.get(content_path)
 
-        # Replace the placeholder in the template with the content
-        final_body = html_template.replace("{{ main_content }}", main_content)
+        # Fill in the content; per-recipient fields are left for the send
+        final_body = html_template.render(
+            {"main_content": main_content}, keep_missing=True
+        )
     else:
         # For non-HTML files or templates that don't require additional content, handle as normal
-        final_body = read_file_content(body_path)
+        final_body = content_cache.get(body_path)
 
     return final_body if final_body else ""
 
@@ -86,6 +113,8 @@ def read_file_content(file_path):
         )
 
     elif file_extension == ".pdf":
+        import fitz  # PyMuPDF, only needed for PDF bodies
+
         # Extract text from PDF
         content = ""
         with fitz.open(file_path) as pdf:
@@ -94,6 +123,8 @@ def read_file_content(file_path):
         return content
 
     elif file_extension == ".docx":
+        from docx import Document  # python-docx, only needed for Word bodies
+
         # Extract text from Word document
         content = ""
         doc = Document(file_path)
@@ -117,121 +148,293 @@ def read_file_content(file_path):
         )
 
 
+def _load_content(file_path):
+    if file_path.lower().endswith(".html"):
+        with open(file_path, "r") as file:
+            return file.read()
+    return read_file_content(file_path)
+
+
+# Extracted bodies and templates, shared by the preview and the send
+content_cache = ContentCache(_load_content)
+
+
 # Get file paths for any attachments
 def get_attachment_paths(folder_path):
     if os.path.exists(folder_path):
         return [
             os.path.join(folder_path, filename)
-            for filename in os.listdir(folder_path)
+            for filename in sorted(os.listdir(folder_path))
             if os.path.isfile(os.path.join(folder_path, filename))
         ]
     return []
 
 
-# New send_emails_smtp function using smtplib and MIMEText
-def send_emails_smtp(account, recipients, subject, body, attachment_paths, format_html):
-    try:
-        # Set up the SMTP server
-        if "gmail" in account["email"].lower():
-            smtp_server = "smtp.gmail.com"
-            smtp_port = 587
-            smtp_ssl = False
-        else:
-            smtp_server = account["smtp_server"]
-            smtp_port = account["smtp_port"]
-            smtp_ssl = account["smtp_ssl"]
-
-        if smtp_ssl:
-            server = smtplib.SMTP_SSL(smtp_server, smtp_port)
-        else:
-            server = smtplib.SMTP(smtp_server, smtp_port)
-            server.starttls()
-
-        server.login(account["email"], account["password"])
-
-        # Define custom display names for each account
-        display_names = {
-            "CWT": "Kasim Janci (CWT)",
-            "WTM": "Kasim Janci (WTM)",
-            "TRISTOKORUN": "流沙奶黄包粉丝",
-            "TUAN": "Tuan Nguyen",
-            # Add other accounts and display names as needed
+def recipient_outcomes(outcome):
+    """
+    (recipient, error) pairs for a "sent"/"failed" event or a send_messages
+    result. A batch job covers several recipients, some of which the server
+    may have refused.
+    """
+    job = outcome["job"]
+    pairs = []
+    for recipient in job if isinstance(job, tuple) else (job,):
+        error = outcome["error"]
+        if recipient in outcome["refused"]:
+            code, reply = outcome["refused"][recipient]
+            if isinstance(reply, bytes):
+                reply = reply.decode("utf-8", "replace")
+            error = f"Refused ({code}): {reply}"
+        pairs.append((recipient, error))
+    return pairs
+
+
+def print_progress(event):
+    """Default progress reporter for send_emails_smtp."""
+    if event["event"] in ("sent", "failed"):
+        outcomes = recipient_outcomes(event)
+        # index counts recipients up to the last one of this job
+        first = event["index"] - len(outcomes) + 1
+        for index, (recipient, error) in enumerate(outcomes, first):
+            if error is None:
+                print(
+                    f"{index}/{event['total']} High-importance email sent to "
+                    f"{recipient}"
+                )
+            else:
+                print(
+                    f"{index}/{event['total']} Failed to send email to "
+                    f"{recipient}: {error}"
+                )
+    elif event["event"] == "account_disabled":
+        print(f"Account {event['account']} taken out of rotation: {event['error']}")
+    elif event["event"] == "finished":
+        print(
+            f"Sent {event['sent']}/{event['total']} emails in "
+            f"{event['elapsed']:.1f}s ({event['failed']} failed)"
+        )
+        if len(event["accounts"]) > 1:
+            for name, counts in event["accounts"].items():
+                line = f"  {name}: {counts['sent']} sent, {counts['failed']} failed"
+                if counts["disabled"]:
+                    line += f" (disabled: {counts['disabled']})"
+                print(line)
+
+
+def get_from_address(account):
+    # Define custom display names for each account
+    display_names = {
+        "CWT": "Kasim Janci (CWT)",
+        "WTM": "Kasim Janci (WTM)",
+        "TRISTOKORUN": "流沙奶黄包粉丝",
+        "TUAN": "Tuan Nguyen",
+        # Add other accounts and display names as needed
+    }
+
+    # Determine the display name, or default to the email address if no display name is found
+    from_name = display_names.get(account["name"], account["email"])
+    return f"{from_name} <{account['email']}>"
+
+
+# Send emails over concurrent SMTP connections, rate limited per account
+def send_emails_smtp(
+    account,
+    recipients,
+    subject,
+    body,
+    attachment_paths,
+    format_html,
+    connections=None,
+    limiter=None,
+    on_event=print_progress,
+    journal=None,
+    batch_size=None,
+    recipient_fields=None,
+):
+    """
+    Sends the message to every recipient. Throughput is governed by the
+    account's rate limits (rate_per_second, rate_per_day) rather than a fixed
+    pause, and several connections send in parallel within those limits.
+    Transient failures (4xx replies, dropped connections) are retried with
+    backoff.
+
+    :param account: An account from load_accounts, or a list of accounts to
+                    shard the recipients across (see sender.send_sharded)
+    :param limiter: RateLimiter overriding the account's limits; only for a
+                    single account, as every account has its own limits
+    :param journal: Optional SendJournal; recipients it lists as delivered for
+                    this exact message are skipped and every outcome is
+                    recorded in it as soon as it is known. Deliveries it
+                    recorded in the past day count against rate_per_day
+    :param batch_size: When above 1, recipients of the same domain share one
+                       transaction (one copy of the message, up to batch_size
+                       RCPT TO commands) and the To header reads
+                       "undisclosed-recipients:;"
+    :param recipient_fields: {recipient: {field: value}} (see
+                             get_recipient_fields) for bodies with
+                             {{ field }} placeholders such as {{ name }};
+                             without them the body is sent as is
+    :return: List of dicts with job (the recipient), account, success and
+             error, one per recipient
+    """
+    accounts = account if isinstance(account, list) else [account]
+    if limiter is not None and len(accounts) > 1:
+        raise ValueError("A limiter can only be given for a single account")
+
+    # Placeholders are only filled in from a recipients CSV; without one, text
+    # that merely looks like {{ field }} (e.g. in an extracted PDF) is kept
+    recipient_fields = recipient_fields or {}
+    if recipient_fields:
+        check_fields(compile_template(body), recipient_fields)
+
+    # Encode the body and attachments once for the whole campaign; only From,
+    # To and Message-ID vary between recipients and sending accounts
+    message = PreparedMessage(
+        get_from_address(accounts[0]),
+        subject,
+        body,
+        attachment_paths,
+        format_html,
+        headers={
+            "X-Priority": "1",  # Highest priority
+            "Importance": "high",  # Mark as important
+            "X-MSMail-Priority": "High",  # Microsoft-specific header
+        },
+        personalized=bool(recipient_fields),
+    )
+    from_addresses = {
+        account["name"]: get_from_address(account) for account in accounts
+    }
+    personalized = message.template is not None
+    # The same for every sender, so a campaign can resume on another account
+    content_hash = message.content_hash
+    # A personalized message differs per recipient, and so does its hash
+    content_hashes = {}
+    if personalized:
+        content_hashes = {
+            recipient: message.recipient_hash(recipient_fields.get(recipient))
+            for recipient in recipients
         }
 
-        # Determine the display name, or default to the email address if no display name is found
-        from_name = display_names.get(account["name"], account["email"])
-        from_address = f"{from_name} <{account['email']}>"
-
-        total_recipients = len(recipients)
-        for index, recipient in enumerate(recipients, start=1):
-            # Set up the MIME message structure
-            msg = MIMEMultipart("alternative")
-            msg["From"] = from_address
-            msg["To"] = recipient
-            msg["Subject"] = subject
-
-            # Set high-importance headers
-            msg["X-Priority"] = "1"  # Highest priority
-            msg["Importance"] = "high"  # Mark as important
-            msg["X-MSMail-Priority"] = "High"  # Microsoft-specific header
-
-            # Attach the HTML or plain text content
-            if format_html:
-                html_part = MIMEText(body, "html")
-                msg.attach(html_part)
-            else:
-                text_part = MIMEText(body, "plain")
-                msg.attach(text_part)
-
-            # Attach any files
-            if attachment_paths:
-                for attachment_path in attachment_paths:
-                    with open(attachment_path, "rb") as f:
-                        # Create a MIMEApplication object for the attachment
-                        part = MIMEApplication(
-                            f.read(), Name=os.path.basename(attachment_path)
-                        )
-                    # Add headers for the attachment
-                    part["Content-Disposition"] = (
-                        f'attachment; filename="{os.path.basename(attachment_path)}"'
-                    )
-                    msg.attach(part)
+    def deliver(server, account, job):
+        from_address = from_addresses[account["name"]]
+        if isinstance(job, tuple):
+            return message.send_batch(server, account["email"], job, from_address)
+        fields = recipient_fields.get(job)
+        return message.send(server, account["email"], job, fields, from_address)
+
+    report = on_event
+    limiters = {}
+    if journal is not None:
+        if personalized:
+            delivered = journal.delivered_each(content_hashes)
+        else:
+            delivered = journal.delivered(content_hash)
+        skipped = [
+            recipient for recipient in recipients if recipient.lower() in delivered
+        ]
+        if skipped:
+            print(f"Skipping {len(skipped)} recipients who already received this email")
+        recipients = [
+            recipient for recipient in recipients if recipient.lower() not in delivered
+        ]
 
-            # Send the email
-            server.sendmail(account["email"], recipient, msg.as_string())
-            print(
-                f"{index}/{total_recipients} High-importance email sent to {recipient}"
+        # What earlier runs sent in the past day counts against daily quotas
+        since = time.time() - SECONDS_PER_DAY
+        limiters = {
+            account["name"]: account_limiter(
+                account, journal.sent_since(account["name"], since)
             )
+            for account in accounts
+            if account.get("rate_per_day")
+        }
 
-            # Wait 1 second before sending the next email
-            if index < total_recipients:
-                time.sleep(1)
+        def report(event):
+            if event["event"] in ("sent", "failed"):
+                for recipient, error in recipient_outcomes(event):
+                    journal.record(
+                        recipient,
+                        content_hashes.get(recipient, content_hash),
+                        error,
+                        event["account"],
+                    )
+            if on_event:
+                on_event(event)
 
-        # Close the server connection
-        server.quit()
+    jobs = recipients
+    if batch_size and batch_size > 1:
+        if personalized:
+            print("The body is personalized, so every recipient gets their own copy")
+        else:
+            jobs = batch_recipients(recipients, batch_size)
 
-    except Exception as e:
-        print(f"Failed to send email: {e}")
+    try:
+        if len(accounts) == 1:
+            results = send_messages(
+                accounts[0],
+                jobs,
+                lambda server, job: deliver(server, accounts[0], job),
+                connections=connections,
+                limiter=limiter or limiters.get(accounts[0]["name"]),
+                on_event=report,
+            )
+        else:
+            if connections:
+                accounts = [
+                    dict(account, connections=connections) for account in accounts
+                ]
+            results = send_sharded(
+                accounts, jobs, deliver, limiters=limiters, on_event=report
+            )
+    finally:
+        message.close()
+
+    return [
+        {
+            "job": recipient,
+            "account": result["account"],
+            "success": error is None,
+            "error": error,
+        }
+        for result in results
+        for recipient, error in recipient_outcomes(result)
+    ]
 
 
 # Main function to initiate the bulk email sending process
 def send_bulk_emails(
-    account_name, recipients_filename, subject, body_filename, content_path=None
+    account_name,
+    recipients_filename,
+    subject,
+    body_filename,
+    content_path=None,
+    batch_size=None,
 ):
+    """
+    :param account_name: Account to send from, or a list of account names to
+                         spread the recipients across (sharded dispatch)
+    :param batch_size: Send one copy per batch of up to this many recipients of
+                       the same domain (see send_emails_smtp)
+    """
+    account_names = account_name if isinstance(account_name, list) else [account_name]
+
     # Check if body_filename requires specific account_name
-    if body_filename == "CWT.html" and account_name != "CWT":
+    if body_filename == "CWT.html" and set(account_names) != {"CWT"}:
         print("Error: When using CWT.html as body, the email_sender must be 'CWT'.")
         return
-    elif body_filename == "WTM.html" and account_name != "WTM":
+    elif body_filename == "WTM.html" and set(account_names) != {"WTM"}:
         print("Error: When using WTM.html as body, the email_sender must be 'WTM'.")
         return
 
     # Load accounts
     accounts = load_accounts()
-    if account_name not in accounts:
-        print(f"Account '{account_name}' not found.")
-        return
-    account = accounts[account_name]
+    for name in account_names:
+        if name not in accounts:
+            print(f"Account '{name}' not found.")
+            return
+    account = [accounts[name] for name in account_names]
+    if len(account) == 1:
+        account = account[0]
 
     # Define file paths for data
     data_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../email")
@@ -246,8 +449,23 @@ def send_bulk_emails(
     format_html = body_filename.endswith(".html")
 
     recipients = get_recipients(recipients_file)
+    recipient_fields = get_recipient_fields(recipients_file)
     body = get_email_body(body_file, content_path=content_path)
     attachment_paths = get_attachment_paths(attachments_folder)
 
-    # Call send_emails_smtp to send emails
-    send_emails_smtp(account, recipients, subject, body, attachment_paths, format_html)
+    # Recipients who already got this exact email are skipped on a re-run
+    journal = SendJournal(os.path.join(data_folder, ".send_journal.db"))
+    try:
+        return send_emails_smtp(
+            account,
+            recipients,
+            subject,
+            body,
+            attachment_paths,
+            format_html,
+            journal=journal,
+            batch_size=batch_size,
+            recipient_fields=recipient_fields,
+        )
+    finally:
+        journal.close()
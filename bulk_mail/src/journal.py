@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+import time
+
+
+def _key(recipient: str) -> str:
+    return recipient.strip().lower()
+
+
+class SendJournal:
+    """
+    Persistent record of who already received a campaign, backed by SQLite.
+    Entries are keyed by recipient and the campaign's content hash, so a
+    resumed send skips delivered recipients while a changed message (new
+    subject, body or attachments) counts as a new campaign. Addresses are
+    compared case-insensitively, as when recipients are deduplicated.
+    """
+
+    def __init__(self, db_path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            db_path, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS deliveries (
+                recipient TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                account TEXT,
+                PRIMARY KEY (recipient, content_hash)
+            )
+            """
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(deliveries)")}
+        if "account" not in columns:
+            # Journals from before sends were attributed to an account
+            self._db.execute("ALTER TABLE deliveries ADD COLUMN account TEXT")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_by_account "
+            "ON deliveries (account, updated_at)"
+        )
+
+    def delivered(self, content_hash: str) -> set:
+        """Lowercased addresses that were sent this campaign."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT recipient FROM deliveries "
+                "WHERE content_hash = ? AND status = 'sent'",
+                (content_hash,),
+            )
+            # Journals from before keys were normalised hold addresses as given
+            return {_key(row[0]) for row in rows}
+
+    def delivered_each(self, content_hashes: dict) -> set:
+        """
+        Like delivered, for a campaign whose message differs per recipient
+        (e.g. a personalized body): content_hashes maps each address to the
+        hash of its own message.
+        """
+        with self._lock:
+            self._db.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS wanted "
+                "(recipient TEXT NOT NULL, content_hash TEXT NOT NULL)"
+            )
+            self._db.execute("DELETE FROM wanted")
+            self._db.executemany(
+                "INSERT INTO wanted VALUES (?, ?)",
+                ((_key(recipient), key) for recipient, key in content_hashes.items()),
+            )
+            rows = self._db.execute(
+                "SELECT deliveries.recipient FROM wanted JOIN deliveries "
+                "ON deliveries.recipient = wanted.recipient "
+                "AND deliveries.content_hash = wanted.content_hash "
+                "WHERE deliveries.status = 'sent'"
+            )
+            return {row[0] for row in rows}
+
+    def record(
+        self, recipient: str, content_hash: str, error: str = None, account=None
+    ):
+        """
+        Stores the outcome of one delivery as soon as it is known.
+
+        :param account: Name of the sending account, for sent_since
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO deliveries "
+                "(recipient, content_hash, status, error, updated_at, account) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (recipient, content_hash) DO UPDATE SET "
+                "status = excluded.status, error = excluded.error, "
+                "attempts = attempts + 1, updated_at = excluded.updated_at, "
+                "account = excluded.account",
+                (
+                    _key(recipient),
+                    content_hash,
+                    "sent" if error is None else "failed",
+                    error,
+                    time.time(),
+                    account,
+                ),
+            )
+
+    def sent_since(self, account: str, since: float) -> int:
+        """
+        Deliveries the account made since the given time.time(), across all
+        campaigns, e.g. to carry a daily quota over to the next run.
+        """
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM deliveries "
+                "WHERE account = ? AND status = 'sent' AND updated_at >= ?",
+                (account, since),
+            ).fetchone()[0]
+
+    def counts(self, content_hash: str) -> dict:
+        with self._lock:
+            return dict(
+                self._db.execute(
+                    "SELECT status, COUNT(*) FROM deliveries "
+                    "WHERE content_hash = ? GROUP BY status",
+                    (content_hash,),
+                )
+            )
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,324 @@
+import base64
+import hashlib
+import os
+import re
+import smtplib
+import tempfile
+import threading
+import uuid
+from email import policy
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import make_msgid
+
+from src.render import compile_template
+
+CRLF = b"\r\n"
+BASE64_CHUNK = 57 * 1024  # Multiple of 57 bytes, i.e. whole 76-character lines
+SPOOL_SIZE = 8 * 1024 * 1024  # Encoded payload kept in memory up to this size
+SEND_CHUNK = 64 * 1024
+UNDISCLOSED_RECIPIENTS = "undisclosed-recipients:;"
+_LEADING_DOT = re.compile(rb"(?m)^\.")
+
+
+def dot_stuff(data: bytes) -> bytes:
+    """Escapes lines starting with "." for the SMTP DATA command (RFC 5321)."""
+    return _LEADING_DOT.sub(b"..", data)
+
+
+def build_message(
+    from_address, subject, body, attachment_names=(), format_html=True, headers=None
+):
+    """
+    MIME message without the per-recipient headers (To, Message-ID, and From
+    when from_address is None), using the SMTP policy so it serializes with
+    CRLF line endings. Attachment parts only carry a placeholder payload, and
+    so does the body when it is None (i.e. rendered per recipient). Returns
+    (message, body placeholder or None, attachment placeholders) so the
+    encoded content can go in their place.
+    """
+    msg = MIMEMultipart("alternative", policy=policy.SMTP)
+    if from_address:
+        msg["From"] = from_address
+    msg["Subject"] = subject
+    for name, value in (headers or {}).items():
+        msg[name] = value
+
+    # Attach the HTML or plain text content
+    subtype = "html" if format_html else "plain"
+    body_placeholder = None
+    if body is None:
+        part = MIMEBase("text", subtype, charset="utf-8", policy=policy.SMTP)
+        part["Content-Transfer-Encoding"] = "base64"
+        body_placeholder = f"@@body-{uuid.uuid4().hex}@@"
+        part.set_payload(body_placeholder)
+        body_placeholder = body_placeholder.encode()
+        msg.attach(part)
+    else:
+        msg.attach(MIMEText(body, subtype, policy=policy.SMTP))
+
+    # Attach any files
+    placeholders = []
+    for index, name in enumerate(attachment_names):
+        part = MIMEBase("application", "octet-stream", Name=name, policy=policy.SMTP)
+        part["Content-Transfer-Encoding"] = "base64"
+        part["Content-Disposition"] = f'attachment; filename="{name}"'
+        placeholder = f"@@attachment-{index}-{uuid.uuid4().hex}@@"
+        part.set_payload(placeholder)
+        placeholders.append(placeholder.encode())
+        msg.attach(part)
+    return msg, body_placeholder, placeholders
+
+
+def write_base64(source, destination, chunk_size: int = BASE64_CHUNK):
+    """
+    Base64-encodes a file into 76-character CRLF lines without loading it, the
+    same layout the email package produces. No line break follows the last
+    line.
+    """
+    chunk = source.read(chunk_size)
+    while chunk:
+        next_chunk = source.read(chunk_size)
+        encoded = base64.encodebytes(chunk).replace(b"\n", CRLF)
+        destination.write(encoded if next_chunk else encoded[: -len(CRLF)])
+        chunk = next_chunk
+
+
+def send_segments(server, from_addr, to_addrs, segments):
+    """
+    Runs one SMTP transaction whose DATA is the concatenation of segments
+    (any iterable of bytes, written as they come). The data must already be
+    dot-stuffed and end with CRLF. Behaves like SMTP.sendmail otherwise: returns
+    the refused recipients and raises if all of them were refused.
+    """
+    server.ehlo_or_helo_if_needed()
+    code, response = server.mail(from_addr)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, response, from_addr)
+
+    refused = {}
+    for to_addr in to_addrs:
+        code, response = server.rcpt(to_addr)
+        if code not in (250, 251):
+            refused[to_addr] = (code, response)
+    if len(refused) == len(to_addrs):
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, response = server.docmd("data")
+    if code != 354:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
+    # Coalesce small segments: separate tiny writes stall on Nagle/delayed ACK
+    buffer = bytearray()
+    for segment in segments:
+        buffer += segment
+        if len(buffer) >= SEND_CHUNK:
+            server.send(bytes(buffer))
+            buffer.clear()
+    buffer += b"." + CRLF
+    server.send(bytes(buffer))
+    code, response = server.getreply()
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, response)
+    return refused
+
+
+def batch_recipients(recipients, batch_size: int):
+    """
+    Groups recipients by domain into tuples of at most batch_size, so each
+    batch can go out as one multi-recipient transaction.
+    """
+    by_domain = {}
+    for recipient in recipients:
+        domain = recipient.rpartition("@")[2].lower()
+        by_domain.setdefault(domain, []).append(recipient)
+    return [
+        tuple(group[start : start + batch_size])
+        for group in by_domain.values()
+        for start in range(0, len(group), batch_size)
+    ]
+
+
+def content_hash(
+    subject,
+    body,
+    attachment_paths=(),
+    format_html=True,
+    headers=None,
+    personalized=False,
+):
+    digest = hashlib.sha256()
+    headers = repr(sorted((headers or {}).items()))
+    for part in (subject, body, str(format_html), headers, str(personalized)):
+        digest.update(part.encode() + b"\0")
+    for attachment_path in attachment_paths or ():
+        name = os.path.basename(attachment_path)
+        size = os.path.getsize(attachment_path)
+        digest.update(f"{name}:{size}".encode() + b"\0")
+        with open(attachment_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PreparedMessage:
+    """
+    A campaign message serialized once. The body and attachments are encoded
+    and dot-stuffed up front, so sending it to another recipient only costs
+    formatting the From, To and Message-ID headers; the encoded payload is
+    written to the connection as is.
+
+    The payload is streamed into a spooled temporary file (kept in memory up
+    to spool_size bytes, on disk beyond) and sent in send_chunk pieces, so
+    each message in flight only holds one chunk, whatever the attachment size.
+
+    A personalized body has {{ field }} placeholders; it is compiled once and
+    rendered per recipient, and only that part is encoded per message, the
+    rest of the payload is still shared. Any other body is sent as is, braces
+    and all.
+
+    As From is written per message, one PreparedMessage serves every sending
+    account of a campaign: from_address is only the default, which send and
+    send_batch can override.
+
+    content_hash identifies the campaign content (subject, body, headers,
+    attachments and whether the body is personalized, but not the sender)
+    across runs, e.g. for SendJournal; recipient_hash adds the fields a
+    personalized body was rendered with.
+    """
+
+    def __init__(
+        self,
+        from_address,
+        subject,
+        body,
+        attachment_paths=(),
+        format_html=True,
+        headers=None,
+        spool_size: int = SPOOL_SIZE,
+        send_chunk: int = SEND_CHUNK,
+        personalized: bool = False,
+    ):
+        attachment_paths = list(attachment_paths or ())
+        self.template = None
+        if personalized:
+            template = compile_template(body, escape_html=format_html)
+            self.template = template if template.fields else None
+        msg, body_placeholder, placeholders = build_message(
+            None,
+            subject,
+            None if self.template else body,
+            [os.path.basename(path) for path in attachment_paths],
+            format_html,
+            headers,
+        )
+        skeleton = msg.as_bytes()
+        if not skeleton.endswith(CRLF):
+            skeleton += CRLF
+
+        # Base64 lines never start with ".", so only the MIME structure and
+        # the text part between the attachments need dot-stuffing
+        self._payload = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self._body_offset = None
+        if body_placeholder:
+            before, skeleton = skeleton.split(body_placeholder, 1)
+            self._payload.write(dot_stuff(before))
+            self._body_offset = self._payload.tell()
+        for placeholder, attachment_path in zip(placeholders, attachment_paths):
+            before, skeleton = skeleton.split(placeholder, 1)
+            self._payload.write(dot_stuff(before))
+            with open(attachment_path, "rb") as f:
+                write_base64(f, self._payload)
+        self._payload.write(dot_stuff(skeleton))
+        self.size = self._payload.tell()
+        self._send_chunk = send_chunk
+        self._lock = threading.Lock()
+
+        self.from_address = from_address
+        self.content_hash = content_hash(
+            subject, body, attachment_paths, format_html, headers, personalized
+        )
+
+    def _read_at(self, offset: int, size: int) -> bytes:
+        # Connections share one spool, so seek and read together
+        with self._lock:
+            self._payload.seek(offset)
+            return self._payload.read(size)
+
+    def recipient_hash(self, fields: dict = None) -> str:
+        """
+        content_hash of the message as rendered with fields, so a recipient
+        whose fields changed counts as not having received it yet.
+        """
+        if self.template is None:
+            return self.content_hash
+        values = {name: str((fields or {}).get(name)) for name in self.template.fields}
+        digest = hashlib.sha256(self.content_hash.encode() + b"\0")
+        digest.update(repr(sorted(values.items())).encode())
+        return digest.hexdigest()
+
+    def recipient_headers(self, recipient=None, from_address=None) -> bytes:
+        # A batch shares one copy, so no recipient is named in the headers
+        to = recipient or UNDISCLOSED_RECIPIENTS
+        from_address = from_address or self.from_address
+        domain = from_address.rpartition("@")[2].strip(">") or None
+        headers = b"".join(
+            policy.SMTP.fold_binary(name, policy.SMTP.header_factory(name, value))
+            for name, value in (
+                ("From", from_address),
+                ("To", to),
+                ("Message-ID", make_msgid(domain=domain)),
+            )
+        )
+        return dot_stuff(headers)
+
+    def render_body(self, fields: dict) -> bytes:
+        """The personalized body part, base64-encoded like write_base64."""
+        text = self.template.render(fields or {})
+        return base64.encodebytes(text.encode()).replace(b"\n", CRLF)[: -len(CRLF)]
+
+    def _chunks(self, start: int, end: int):
+        for offset in range(start, end, self._send_chunk):
+            yield self._read_at(offset, min(self._send_chunk, end - offset))
+
+    def segments(self, recipient=None, fields: dict = None, from_address=None):
+        """Yields the dot-stuffed DATA for one recipient, chunk by chunk."""
+        yield self.recipient_headers(recipient, from_address)
+        if self.template is None:
+            yield from self._chunks(0, self.size)
+            return
+        yield from self._chunks(0, self._body_offset)
+        yield self.render_body(fields)
+        yield from self._chunks(self._body_offset, self.size)
+
+    def send(
+        self, server, from_addr, recipient, fields: dict = None, from_address=None
+    ):
+        """
+        Sends the message to one recipient on an open SMTP connection, with
+        fields (e.g. name, company) filled into a personalized body.
+
+        :param from_address: From header, if not the one the message was
+                             prepared with (e.g. per sending account)
+        """
+        segments = self.segments(recipient, fields, from_address)
+        return send_segments(server, from_addr, [recipient], segments)
+
+    def send_batch(self, server, from_addr, recipients, from_address=None):
+        """
+        Sends one copy to several recipients in a single transaction (one RCPT
+        TO each). Returns the recipients the server refused, as
+        {recipient: (code, reply)}; raises SMTPRecipientsRefused if it refused
+        all of them.
+        """
+        if self.template is not None:
+            raise ValueError("A personalized body cannot be sent in batches")
+        segments = self.segments(from_address=from_address)
+        return send_segments(server, from_addr, list(recipients), segments)
+
+    def close(self):
+        self._payload.close()
@@ -0,0 +1,116 @@
+import threading
+import time
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at `rate`
+    tokens per second. Not thread-safe on its own; RateLimiter locks around it.
+    """
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        refilled = self.tokens + (now - self._updated) * self.rate
+        self.tokens = min(self.capacity, refilled)
+        self._updated = now
+
+    def wait_time(self, tokens: float = 1) -> float:
+        """Seconds until `tokens` are available (0 if they are now)."""
+        self._refill()
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    def take(self, tokens: float = 1):
+        self.tokens -= tokens
+
+
+class RateLimiter:
+    """
+    Per-account send limit shared by all connections of that account: at most
+    per_second messages per second (with bursts up to `burst`) and, optionally,
+    per_day messages per rolling day. A message to several recipients counts
+    once per recipient, as providers count their quotas.
+    """
+
+    def __init__(
+        self,
+        per_second: float = 1.0,
+        per_day: int = None,
+        burst=None,
+        sent_last_day: int = 0,
+    ):
+        """
+        :param sent_last_day: Messages already sent in the past day, e.g. by
+                              an earlier run (see SendJournal.sent_since); the
+                              daily bucket starts with that much less
+        """
+        self.per_second = per_second
+        self.per_day = per_day
+        self._buckets = [TokenBucket(per_second, burst)]
+        if per_day:
+            daily = TokenBucket(per_day / SECONDS_PER_DAY, per_day)
+            daily.tokens = max(0, per_day - sent_last_day)
+            self._buckets.append(daily)
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        with self._lock:
+            return max(bucket.wait_time() for bucket in self._buckets)
+
+    def try_acquire(self, tokens: int = 1) -> float:
+        """
+        Takes `tokens` send slots (one per recipient) if they are free;
+        otherwise returns the seconds to wait. More tokens than the per-second
+        burst are granted once the bucket is full, and the overdraft delays
+        the sends after them.
+        """
+        with self._lock:
+            per_second, *daily = self._buckets
+            wait = per_second.wait_time(min(tokens, per_second.capacity))
+            for bucket in daily:
+                wait = max(wait, bucket.wait_time(tokens))
+            if wait == 0:
+                for bucket in self._buckets:
+                    bucket.take(tokens)
+            return wait
+
+    def quota_left(self):
+        """Whole messages the daily quota allows right now (None without one)."""
+        if not self.per_day:
+            return None
+        with self._lock:
+            daily = self._buckets[1]
+            daily.wait_time()  # Refills
+            return int(daily.tokens)
+
+    def quota_wait(self, tokens: int = 1) -> float:
+        """Seconds until the daily quota allows `tokens` messages (0 without one)."""
+        if not self.per_day:
+            return 0.0
+        with self._lock:
+            return self._buckets[1].wait_time(tokens)
+
+    def acquire(self, max_wait: float = None, tokens: int = 1) -> bool:
+        """
+        Blocks until `tokens` send slots are free and takes them. Returns False
+        without waiting when the daily quota would not refill within max_wait
+        seconds; the per-second limit is waited for however long it takes.
+        Never more than per_day tokens can be acquired at once.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if max_wait is not None and self.quota_wait(tokens) > max_wait:
+                return False
+            time.sleep(wait)
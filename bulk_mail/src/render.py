@@ -0,0 +1,118 @@
+import csv
+import functools
+import html
+import os
+import re
+import threading
+
+FIELD = re.compile(r"{{\s*(\w+)\s*}}")
+
+
+class ContentCache:
+    """
+    Caches extracted body content (e.g. PDF or DOCX converted to HTML) by file
+    path, modification time and size, so previewing and sending a campaign
+    extract each file once and an edited file is picked up again.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._entries = {}  # path -> ((mtime_ns, size), content)
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> str:
+        path = os.path.abspath(path)
+        stats = os.stat(path)
+        version = (stats.st_mtime_ns, stats.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        content = self._loader(path)
+        with self._lock:
+            self._entries[path] = (version, content)
+        return content
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Template:
+    """
+    A body split once into literal text and {{ field }} placeholders, so
+    rendering it for a recipient is a single join.
+
+    :param escape: Applied to field values, e.g. html.escape for HTML bodies
+    """
+
+    def __init__(self, text: str, escape=None):
+        self._parts = FIELD.split(text)
+        self._escape = escape
+        # Odd positions hold field names
+        self.fields = frozenset(self._parts[1::2])
+
+    def render(self, values: dict, keep_missing: bool = False) -> str:
+        """
+        Fills in the fields from values. A field without a value raises
+        KeyError, or is left as a placeholder with keep_missing (for rendering
+        in stages).
+        """
+        parts = list(self._parts)
+        for index in range(1, len(parts), 2):
+            name = parts[index]
+            if name in values:
+                value = str(values[name])
+                parts[index] = self._escape(value) if self._escape else value
+            elif keep_missing:
+                parts[index] = "{{ %s }}" % name
+            else:
+                raise KeyError(f"No value for the {{{{ {name} }}}} field")
+        return "".join(parts)
+
+
+@functools.lru_cache(maxsize=64)
+def compile_template(text: str, escape_html: bool = False) -> Template:
+    """Compiles a body once; repeated calls with the same text reuse it."""
+    return Template(text, escape=html.escape if escape_html else None)
+
+
+def check_fields(template: Template, recipient_fields: dict):
+    """
+    Makes sure every field of the template has a column in the recipients
+    file, before anything is rendered or sent.
+
+    :param recipient_fields: {recipient: {field: value}}, as read by
+                             read_recipients_csv
+    :raises ValueError: Naming the fields without a column
+    """
+    columns = set().union(*recipient_fields.values())
+    unknown = template.fields - columns
+    if unknown:
+        raise ValueError(
+            "The body uses fields the recipients file has no column for: "
+            + ", ".join(sorted(unknown))
+        )
+
+
+def read_recipients_csv(file_path: str) -> dict:
+    """
+    Reads a recipients CSV with an "email" column and any number of field
+    columns (e.g. name, company). Returns {email: {field: value}} in file
+    order; later rows for the same address (compared case-insensitively) are
+    dropped.
+    """
+    recipients = {}
+    seen = set()
+    with open(file_path, newline="", encoding="utf-8-sig") as file:
+        for row in csv.DictReader(file):
+            row = {
+                key.strip().lower(): (value or "").strip()
+                for key, value in row.items()
+                if key
+            }
+            email = row.get("email", "")
+            if email and email.lower() not in seen:
+                seen.add(email.lower())
+                recipients[email] = row
+    return recipients
@@ -0,0 +1,429 @@
+import queue
+import smtplib
+import threading
+import time
+
+from src.rate_limit import RateLimiter
+
+DEFAULT_CONNECTIONS = 3
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0  # Seconds before the first retry; doubles every attempt
+DEFAULT_QUOTA_WAIT = 60.0  # Longest wait for the daily quota before failing over
+
+# Provider replies that mean the account, not the recipient, hit a limit
+QUOTA_MARKERS = (
+    "sending quota",
+    "sending limit",
+    "daily limit",
+    "rate limit",
+    "too many messages",
+    "5.4.5",
+)
+
+# The connection is gone after these; it is re-opened for the next attempt
+_DISCONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def smtp_settings(account):
+    """Returns (server, port, ssl, starttls) for an account."""
+    if "gmail" in account["email"].lower():
+        return "smtp.gmail.com", 587, False, True
+    return (
+        account["smtp_server"],
+        account["smtp_port"],
+        account["smtp_ssl"],
+        account.get("smtp_starttls", True),
+    )
+
+
+def connect_smtp(account, timeout: float = 60):
+    """Opens and logs in an SMTP connection for an account from load_accounts."""
+    smtp_server, smtp_port, smtp_ssl, smtp_starttls = smtp_settings(account)
+    if smtp_ssl:
+        server = smtplib.SMTP_SSL(smtp_server, smtp_port, timeout=timeout)
+    else:
+        server = smtplib.SMTP(smtp_server, smtp_port, timeout=timeout)
+        if smtp_starttls:
+            server.starttls()
+    if account.get("password"):
+        server.login(account["email"], account["password"])
+    return server
+
+
+def account_limiter(account, sent_last_day: int = 0) -> RateLimiter:
+    """
+    RateLimiter from the account's rate_per_second/rate_per_day settings.
+
+    :param sent_last_day: Messages the account already sent in the past day,
+                          which count against rate_per_day
+    """
+    return RateLimiter(
+        per_second=account.get("rate_per_second") or 1.0,
+        per_day=account.get("rate_per_day"),
+        sent_last_day=sent_last_day,
+    )
+
+
+def is_transient(error) -> bool:
+    """True for failures worth retrying: dropped connections and 4xx replies."""
+    if isinstance(error, _DISCONNECT_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+def is_account_error(error) -> bool:
+    """True for failures that rule out the account: auth or quota refusals."""
+    if isinstance(error, smtplib.SMTPAuthenticationError):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        replies = [response for _, response in error.recipients.values()]
+    elif isinstance(error, smtplib.SMTPResponseException):
+        replies = [error.smtp_error]
+    else:
+        return False
+    for reply in replies:
+        if isinstance(reply, bytes):
+            reply = reply.decode("utf-8", "replace")
+        if any(marker in reply.lower() for marker in QUOTA_MARKERS):
+            return True
+    return False
+
+
+def _recipient_count(job) -> int:
+    # A batch job (tuple) covers several recipients
+    return len(job) if isinstance(job, tuple) else 1
+
+
+def _close(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def send_messages(
+    account,
+    jobs,
+    deliver,
+    connections: int = None,
+    limiter: RateLimiter = None,
+    on_event=None,
+    connect=connect_smtp,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+):
+    """
+    Delivers jobs for one account over several concurrent SMTP connections.
+    All connections share the account's RateLimiter, so adding connections
+    hides network and server latency without exceeding the provider's limits.
+
+    :param jobs: Work items, e.g. recipient addresses, or tuples of them for
+                 batches sent in one transaction
+    :param deliver: Callable deliver(server, job) that performs the SMTP
+                    transaction for one job on an open connection
+    :param connections: Concurrent connections (default: the account's
+                        "connections" setting, else DEFAULT_CONNECTIONS)
+    :param limiter: Shared RateLimiter (default: from the account settings)
+    :param on_event: Called with a dict per progress event; "event" is one of
+                     "connected", "sent", "retry", "failed", "account_disabled"
+                     or "finished". "sent"/"failed" events carry the duration
+                     of the last SMTP attempt in seconds; their index/total
+                     and the "finished" counts are in recipients
+    :param retries: Attempts after a transient failure (see is_transient),
+                    waiting backoff, 2 * backoff, ... seconds in between. The
+                    recipients of a batch that got a temporary (4xx) refusal
+                    are retried the same way, as a job of their own
+    :return: List of dicts with job, account, success, error and refused
+             (recipient -> (code, reply)), in job order; jobs split off a
+             batch for a retry or the daily quota come last
+    """
+    if connections:
+        account = dict(account, connections=connections)
+    return send_sharded(
+        [account],
+        jobs,
+        lambda server, account, job: deliver(server, job),
+        limiters={account["name"]: limiter} if limiter else None,
+        on_event=on_event,
+        connect=connect,
+        retries=retries,
+        backoff=backoff,
+        quota_wait=None,  # A single account waits for its quota to refill
+    )
+
+
+def send_sharded(
+    accounts,
+    jobs,
+    deliver,
+    limiters: dict = None,
+    on_event=None,
+    connect=connect_smtp,
+    retries: int = DEFAULT_RETRIES,
+    backoff: float = DEFAULT_BACKOFF,
+    quota_wait: float = DEFAULT_QUOTA_WAIT,
+):
+    """
+    Spreads jobs over a pool of accounts. Every connection of every account
+    pulls from one shared queue as fast as its account's RateLimiter allows,
+    so each account's share of the campaign follows its configured rate.
+
+    An account that fails authentication, is refused for quota reasons (see
+    is_account_error) or whose daily quota would not refill within
+    quota_wait seconds is taken out of rotation at once, for all of its
+    connections; its jobs go back to the queue for the remaining accounts.
+    The per-second rate is always waited for, however slow.
+
+    :param deliver: Callable deliver(server, account, job); it may return the
+                    recipients the server refused, as SMTP.sendmail does
+    :param limiters: Optional account name -> RateLimiter overrides
+    :return: List of dicts with job, account, success, error and refused
+             (recipient -> (code, reply)), in job order; jobs split off a
+             batch come last (see send_messages)
+    """
+    jobs = list(jobs)
+    limiters = {
+        account["name"]: (limiters or {}).get(account["name"])
+        or account_limiter(account)
+        for account in accounts
+    }
+    on_event = on_event or (lambda event: None)
+
+    pending = queue.Queue()
+    for position, job in enumerate(jobs):
+        pending.put((position, job))
+    results = [None] * len(jobs)
+    lock = threading.Lock()
+    disabled = {}  # account name -> reason
+    stats = {account["name"]: {"sent": 0, "failed": 0} for account in accounts}
+    total = sum(_recipient_count(job) for job in jobs)
+    done = 0  # Recipients, as a batch job may be split up for retries
+    sent = 0
+    start = time.perf_counter()
+
+    def emit(event):
+        with lock:
+            on_event(event)
+
+    def finish(
+        account, position, job, connection, error=None, refused=None, duration=None
+    ):
+        nonlocal done, sent
+        with lock:
+            count = _recipient_count(job)
+            failed = count if error is not None else len(refused or {})
+            done += count
+            sent += count - failed
+            name = account["name"] if account else None
+            results[position] = {
+                "job": job,
+                "account": name,
+                "success": error is None,
+                "error": error,
+                "refused": refused or {},
+            }
+            if name:
+                stats[name]["sent"] += count - failed
+                stats[name]["failed"] += failed
+            on_event(
+                {
+                    "event": "sent" if error is None else "failed",
+                    "account": name,
+                    "connection": connection,
+                    "job": job,
+                    "error": error,
+                    "refused": refused or {},
+                    "duration": duration,
+                    "index": done,
+                    "total": total,
+                    "elapsed": time.perf_counter() - start,
+                }
+            )
+
+    def disable(account, reason):
+        with lock:
+            if account["name"] in disabled:
+                return
+            disabled[account["name"]] = reason
+            on_event(
+                {
+                    "event": "account_disabled",
+                    "account": account["name"],
+                    "error": reason,
+                }
+            )
+
+    def worker(account, connection):
+        server = None
+        limiter = limiters[account["name"]]
+        while account["name"] not in disabled:
+            with lock:
+                if done == total:
+                    break
+            try:
+                # Jobs can return to the queue while others are in flight
+                position, job = pending.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            settled = False  # Finished, or handed back to the queue
+            error = "Send aborted"
+            try:
+                attempt = 0
+                while True:
+                    if account["name"] in disabled:
+                        # Another connection hit an account error (e.g. a
+                        # failed login); do not try it again for every job
+                        settled = True
+                        pending.put((position, job))
+                        break
+                    left = limiter.quota_left()
+                    if left and _recipient_count(job) > left:
+                        # Send what the daily quota still allows and queue
+                        # the rest of the batch as a job of its own
+                        job, rest = job[:left], job[left:]
+                        with lock:
+                            pending.put((len(results), rest))
+                            results.append(None)
+                    if not limiter.acquire(
+                        max_wait=quota_wait, tokens=_recipient_count(job)
+                    ):
+                        disable(account, "Daily sending quota used up")
+                        settled = True
+                        pending.put((position, job))
+                        break
+                    attempt_start = time.perf_counter()
+                    try:
+                        if server is None:
+                            server = connect(account)
+                            emit(
+                                {
+                                    "event": "connected",
+                                    "account": account["name"],
+                                    "connection": connection,
+                                }
+                            )
+                        refused = deliver(server, account, job)
+                    except (smtplib.SMTPException, OSError) as e:
+                        if isinstance(e, _DISCONNECT_ERRORS) and server is not None:
+                            server.close()
+                            server = None
+                        error = f"{type(e).__name__}: {e}"
+                        if is_account_error(e):
+                            disable(account, error)
+                            settled = True
+                            pending.put((position, job))
+                            break
+                        if attempt < retries and is_transient(e):
+                            delay = backoff * 2**attempt
+                            attempt += 1
+                            emit(
+                                {
+                                    "event": "retry",
+                                    "account": account["name"],
+                                    "connection": connection,
+                                    "job": job,
+                                    "error": error,
+                                    "attempt": attempt,
+                                    "delay": delay,
+                                }
+                            )
+                            time.sleep(delay)
+                            continue
+                        refused = getattr(e, "recipients", None)  # All were refused
+                    else:
+                        error = None
+                    duration = time.perf_counter() - attempt_start
+                    deferred = tuple(
+                        recipient
+                        for recipient, (code, _) in (refused or {}).items()
+                        if 400 <= code < 500
+                    )
+                    if error is None and deferred and attempt < retries:
+                        # Settle the rest of the batch and retry the recipients
+                        # the server refused for now, like a single send
+                        finish(
+                            account,
+                            position,
+                            tuple(r for r in job if r not in deferred),
+                            connection,
+                            refused={
+                                recipient: reply
+                                for recipient, reply in refused.items()
+                                if recipient not in deferred
+                            },
+                            duration=duration,
+                        )
+                        with lock:
+                            position = len(results)
+                            results.append(None)
+                        job = deferred
+                        delay = backoff * 2**attempt
+                        attempt += 1
+                        emit(
+                            {
+                                "event": "retry",
+                                "account": account["name"],
+                                "connection": connection,
+                                "job": job,
+                                "error": f"{len(job)} recipients refused for now",
+                                "attempt": attempt,
+                                "delay": delay,
+                            }
+                        )
+                        time.sleep(delay)
+                        continue
+                    settled = True
+                    finish(account, position, job, connection, error, refused, duration)
+                    break
+            except Exception as e:
+                # Anything else deliver raises (e.g. an address smtplib cannot
+                # encode) fails this job only; the transaction was left halfway
+                error = f"{type(e).__name__}: {e}"
+                if server is not None:
+                    server.close()
+                    server = None
+            finally:
+                # Other workers wait until every job is accounted for
+                if not settled:
+                    finish(account, position, job, connection, error)
+        if server is not None:
+            _close(server)
+
+    threads = []
+    for account in accounts:
+        connections = account.get("connections") or DEFAULT_CONNECTIONS
+        for connection in range(max(1, min(connections, len(jobs)))):
+            threads.append(
+                threading.Thread(target=worker, args=(account, connection), daemon=True)
+            )
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every account was taken out of rotation before the queue was drained
+    reasons = "; ".join(f"{name}: {reason}" for name, reason in disabled.items())
+    while not pending.empty():
+        position, job = pending.get()
+        finish(None, position, job, None, f"No sending account available ({reasons})")
+
+    on_event(
+        {
+            "event": "finished",
+            "sent": sent,
+            "failed": total - sent,
+            "total": total,
+            "elapsed": time.perf_counter() - start,
+            "accounts": {
+                name: dict(counts, disabled=disabled.get(name))
+                for name, counts in stats.items()
+            },
+        }
+    )
+    return results
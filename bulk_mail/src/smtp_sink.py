@@ -0,0 +1,192 @@
+import socketserver
+import threading
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 smtp-sink ready")
+        mail_from = None
+        rcpt_tos = []
+        while True:
+            line = self.rfile.readline(65537)
+            if not line:
+                return
+            line = line.decode("utf-8", "replace").strip()
+            command, _, argument = line.partition(" ")
+            command = command.upper()
+
+            if command in ("EHLO", "HELO"):
+                if command == "EHLO":
+                    self.reply("250-smtp-sink")
+                    self.reply("250-8BITMIME")
+                    self.reply("250 AUTH PLAIN LOGIN")
+                else:
+                    self.reply("250 smtp-sink")
+            elif command == "AUTH":
+                mechanism = argument.split(" ")[0].upper()
+                if mechanism == "LOGIN":
+                    for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                        self.reply(f"334 {prompt}")
+                        self.rfile.readline(65537)
+                elif mechanism == "PLAIN" and " " not in argument:
+                    self.reply("334 ")
+                    self.rfile.readline(65537)
+                if sink.reject_auth:
+                    self.reply("535 5.7.8 Authentication credentials invalid")
+                else:
+                    self.reply("235 Authentication successful")
+            elif command == "MAIL":
+                if sink.quota is not None and sink.message_count >= sink.quota:
+                    self.reply("550 5.4.5 Daily user sending quota exceeded")
+                    continue
+                mail_from = argument[5:].strip("<> ")
+                rcpt_tos = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                recipient = argument[3:].strip("<> ")
+                if recipient in sink.refuse:
+                    self.reply(f"550 No such user {recipient}")
+                elif sink.defer_once(recipient):
+                    self.reply(f"451 Try again later {recipient}")
+                else:
+                    rcpt_tos.append(recipient)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                if mail_from is None or not rcpt_tos:
+                    self.reply("503 Need MAIL and RCPT first")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data(sink.keep_messages)
+                if data is None:
+                    return
+                sink.record(mail_from, rcpt_tos, data)
+                mail_from, rcpt_tos = None, []
+                self.reply("250 OK queued")
+            elif command == "RSET":
+                mail_from, rcpt_tos = None, []
+                self.reply("250 OK")
+            elif command == "NOOP":
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply(f"502 Command {command} not implemented")
+
+    def _read_data(self, keep: bool):
+        """Reads a DATA payload; returns its bytes, or only its size if not kept."""
+        chunks = []
+        size = 0
+        while True:
+            line = self.rfile.readline(65537)
+            if not line:
+                return None
+            if line == b".\r\n":
+                return b"".join(chunks) if keep else size
+            if line.startswith(b"."):
+                line = line[1:]  # Undo dot-stuffing
+            size += len(line)
+            if keep:
+                chunks.append(line)
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """
+    Minimal in-process SMTP server that accepts every message, for tests and
+    benchmarks that must not reach a real provider. Any login is accepted;
+    recipients listed in `refuse` are rejected with 550, and those listed in
+    `defer` get a temporary 451 on their first attempt. reject_auth and quota
+    (messages accepted before MAIL is refused) simulate account-level errors.
+
+    :param keep_messages: Keep message bodies in `messages`; when False only
+                          counts and byte totals are recorded
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        keep_messages: bool = True,
+        refuse=(),
+        defer=(),
+        reject_auth: bool = False,
+        quota: int = None,
+    ):
+        self.keep_messages = keep_messages
+        self.refuse = set(refuse)
+        self.defer = set(defer)
+        self.reject_auth = reject_auth
+        self.quota = quota
+        self.messages = []  # dicts with mail_from, rcpt_tos and data
+        self.message_count = 0
+        self.recipient_count = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _SinkHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def account(self, email: str = "sender@example.com", **settings) -> dict:
+        """Account dict (as returned by load_accounts) that sends to this sink."""
+        host, port = self.address
+        account = {
+            "name": "SINK",
+            "email": email,
+            "password": None,
+            "smtp_server": host,
+            "smtp_port": port,
+            "smtp_ssl": False,
+            "smtp_starttls": False,
+        }
+        account.update(settings)
+        return account
+
+    def defer_once(self, recipient: str) -> bool:
+        with self._lock:
+            if recipient in self.defer:
+                self.defer.discard(recipient)
+                return True
+            return False
+
+    def record(self, mail_from: str, rcpt_tos, data):
+        with self._lock:
+            self.message_count += 1
+            self.recipient_count += len(rcpt_tos)
+            if self.keep_messages:
+                self.bytes_received += len(data)
+                self.messages.append(
+                    {"mail_from": mail_from, "rcpt_tos": list(rcpt_tos), "data": data}
+                )
+            else:
+                self.bytes_received += data
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="smtp-sink", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,63 @@
+# tests/test_bulk_mail.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.bulk_mail import send_emails_smtp
+from src.journal import SendJournal
+from src.smtp_sink import SMTPSink
+
+
+class TestSendEmailsSmtp(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.journal = SendJournal(os.path.join(self.work_dir, "journal.db"))
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.work_dir)
+
+    def send(self, account, recipients, fields):
+        return send_emails_smtp(
+            account,
+            recipients,
+            "Hello",
+            "<p>Dear {{ name }}</p>",
+            [],
+            True,
+            on_event=None,
+            journal=self.journal,
+            recipient_fields=fields,
+        )
+
+    def test_sharded_accounts_send_under_their_own_address(self):
+        recipients = [f"user{index}@example.com" for index in range(6)]
+        fields = {recipient: {"name": "Ann"} for recipient in recipients}
+        with SMTPSink() as first, SMTPSink() as second:
+            accounts = [
+                first.account("a@example.com", name="A", rate_per_second=1000),
+                second.account("b@example.com", name="B", rate_per_second=1000),
+            ]
+            results = self.send(accounts, recipients, fields)
+        self.assertTrue(all(result["success"] for result in results))
+        for sink, address in ((first, b"a@example.com"), (second, b"b@example.com")):
+            for message in sink.messages:
+                self.assertIn(b"From: " + address, message["data"])
+                self.assertEqual(message["data"].count(b"From: "), 1)
+
+    def test_recipient_whose_fields_changed_is_sent_again(self):
+        recipients = ["a@example.com", "b@example.com"]
+        fields = {recipient: {"name": "Ann"} for recipient in recipients}
+        with SMTPSink() as sink:
+            account = sink.account(rate_per_second=1000)
+            self.send(account, recipients, fields)
+            fields["b@example.com"] = {"name": "Bob"}
+            results = self.send(account, recipients, fields)
+        self.assertEqual([result["job"] for result in results], ["b@example.com"])
+        self.assertEqual(sink.message_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
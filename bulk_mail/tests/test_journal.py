@@ -0,0 +1,77 @@
+# tests/test_journal.py
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.journal import SendJournal
+
+
+class TestSendJournal(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, "journal.db")
+        self.journal = SendJournal(self.db_path)
+
+    def tearDown(self):
+        self.journal.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_only_sent_recipients_count_as_delivered(self):
+        self.journal.record("a@example.com", "campaign")
+        self.journal.record("b@example.com", "campaign", "Refused (550): No such user")
+        self.assertEqual(self.journal.delivered("campaign"), {"a@example.com"})
+        self.assertEqual(self.journal.counts("campaign"), {"sent": 1, "failed": 1})
+
+    def test_addresses_are_case_insensitive(self):
+        self.journal.record("Ann@Example.com", "campaign", "451 Try again later")
+        self.journal.record("ann@example.com", "campaign")
+        self.assertEqual(self.journal.delivered("campaign"), {"ann@example.com"})
+        self.assertEqual(self.journal.counts("campaign"), {"sent": 1})
+
+    def test_campaigns_are_separate(self):
+        self.journal.record("a@example.com", "campaign")
+        self.assertEqual(self.journal.delivered("edited campaign"), set())
+
+    def test_delivered_each_matches_every_recipient_to_its_own_hash(self):
+        self.journal.record("a@example.com", "campaign-a")
+        self.journal.record("b@example.com", "campaign-b")
+        self.journal.record("c@example.com", "campaign-c", "451 Try again later")
+        delivered = self.journal.delivered_each(
+            {
+                "A@example.com": "campaign-a",
+                "b@example.com": "edited campaign-b",
+                "c@example.com": "campaign-c",
+            }
+        )
+        self.assertEqual(delivered, {"a@example.com"})
+
+    def test_retry_updates_the_outcome(self):
+        self.journal.record("a@example.com", "campaign", "451 Try again later")
+        self.journal.record("a@example.com", "campaign")
+        self.assertEqual(self.journal.counts("campaign"), {"sent": 1})
+        attempts = self.journal._db.execute(
+            "SELECT attempts FROM deliveries WHERE recipient = ?", ("a@example.com",)
+        ).fetchone()[0]
+        self.assertEqual(attempts, 2)
+
+    def test_survives_a_restart(self):
+        self.journal.record("a@example.com", "campaign")
+        self.journal.close()
+        self.journal = SendJournal(self.db_path)
+        self.assertEqual(self.journal.delivered("campaign"), {"a@example.com"})
+
+    def test_sent_since_counts_an_accounts_recent_deliveries(self):
+        start = time.time()
+        self.journal.record("a@example.com", "campaign", account="MAIN")
+        self.journal.record("b@example.com", "other campaign", account="MAIN")
+        self.journal.record("c@example.com", "campaign", "Refused", account="MAIN")
+        self.journal.record("d@example.com", "campaign", account="SPARE")
+        self.assertEqual(self.journal.sent_since("MAIN", start), 2)
+        self.assertEqual(self.journal.sent_since("MAIN", time.time() + 1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# tests/test_message.py
+
+import base64
+import email
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from email import policy
+
+from src.message import BASE64_CHUNK, PreparedMessage, write_base64
+from src.sender import send_messages
+from src.smtp_sink import SMTPSink
+
+
+class TestWriteBase64(unittest.TestCase):
+    def test_matches_the_email_package_layout(self):
+        data = random.Random(0).randbytes(3 * BASE64_CHUNK + 11)
+        destination = io.BytesIO()
+        write_base64(io.BytesIO(data), destination)
+        expected = base64.encodebytes(data).replace(b"\n", b"\r\n")[:-2]
+        self.assertEqual(destination.getvalue(), expected)
+
+
+class TestPreparedMessagePayload(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.attachments = {}
+        for name, size in (("report.pdf", 200_000), ("notes.txt", 1)):
+            path = os.path.join(self.work_dir, name)
+            data = random.Random(size).randbytes(size)
+            with open(path, "wb") as f:
+                f.write(data)
+            self.attachments[path] = data
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def assert_attachments_decode(self, data):
+        msg = email.message_from_bytes(data, policy=policy.SMTP)
+        decoded = {
+            part.get_filename(): part.get_payload(decode=True)
+            for part in msg.walk()
+            if part.get_filename()
+        }
+        expected = {
+            os.path.basename(path): data for path, data in self.attachments.items()
+        }
+        self.assertEqual(decoded, expected)
+
+    def test_payload_decodes_to_the_attachment_bytes(self):
+        # A small spool and send chunk put the payload on disk and split it
+        message = PreparedMessage(
+            "sender@example.com",
+            "Report",
+            "<p>Attached</p>",
+            list(self.attachments),
+            spool_size=1024,
+            send_chunk=4096,
+        )
+        try:
+            data = b"".join(message.segments("a@example.com"))
+        finally:
+            message.close()
+        # Undo the dot-stuffing the SMTP server would remove
+        self.assert_attachments_decode(data.replace(b"\r\n..", b"\r\n."))
+
+    def test_sent_message_decodes_to_the_attachment_bytes(self):
+        message = PreparedMessage(
+            "sender@example.com", "Report", "<p>Attached</p>", list(self.attachments)
+        )
+        try:
+            with SMTPSink() as sink:
+                send_messages(
+                    sink.account(rate_per_second=1000),
+                    ["a@example.com"],
+                    lambda server, recipient: message.send(
+                        server, "sender@example.com", recipient
+                    ),
+                )
+        finally:
+            message.close()
+        self.assert_attachments_decode(sink.messages[0]["data"])
+
+
+if __name__ == "__main__":
+    unittest.main()
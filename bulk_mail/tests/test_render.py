@@ -0,0 +1,74 @@
+# tests/test_render.py
+
+import unittest
+
+from src.message import PreparedMessage
+from src.render import Template, check_fields
+
+
+class TestTemplate(unittest.TestCase):
+    def test_fills_in_and_escapes_fields(self):
+        template = Template(
+            "<p>Dear {{ name }}</p>", escape=lambda value: value.upper()
+        )
+        self.assertEqual(template.fields, {"name"})
+        self.assertEqual(template.render({"name": "ann"}), "<p>Dear ANN</p>")
+
+    def test_unknown_field_raises(self):
+        with self.assertRaises(KeyError):
+            Template("Dear {{ nmae }}").render({"name": "Ann"})
+
+    def test_keep_missing_leaves_the_placeholder(self):
+        template = Template("{{ main_content }} for {{ name }}")
+        self.assertEqual(
+            template.render({"main_content": "News"}, keep_missing=True),
+            "News for {{ name }}",
+        )
+
+    def test_check_fields_names_fields_without_a_column(self):
+        fields = {"a@example.com": {"email": "a@example.com", "name": "Ann"}}
+        check_fields(Template("Dear {{ name }}"), fields)
+        with self.assertRaisesRegex(ValueError, "nmae"):
+            check_fields(Template("Dear {{ nmae }}"), fields)
+
+
+class TestPreparedMessageFields(unittest.TestCase):
+    def test_body_is_sent_as_is_unless_personalized(self):
+        body = "Use {{ variable }} in your templates"
+        message = PreparedMessage("sender@example.com", "Hi", body, format_html=False)
+        try:
+            self.assertIsNone(message.template)
+            data = b"".join(message.segments("a@example.com"))
+        finally:
+            message.close()
+        self.assertIn(b"{{ variable }}", data)
+
+    def test_personalized_body_is_rendered_per_recipient(self):
+        message = PreparedMessage(
+            "sender@example.com", "Hi", "Dear {{ name }}", personalized=True
+        )
+        try:
+            self.assertEqual(message.template.fields, {"name"})
+            with self.assertRaises(KeyError):
+                b"".join(message.segments("a@example.com", {}))
+        finally:
+            message.close()
+
+    def test_hashes_cover_personalization_and_fields(self):
+        plain = PreparedMessage("sender@example.com", "Hi", "Dear {{ name }}")
+        message = PreparedMessage(
+            "sender@example.com", "Hi", "Dear {{ name }}", personalized=True
+        )
+        try:
+            self.assertNotEqual(plain.content_hash, message.content_hash)
+            self.assertEqual(plain.recipient_hash({"name": "Ann"}), plain.content_hash)
+            ann = message.recipient_hash({"name": "Ann", "company": "A"})
+            self.assertEqual(ann, message.recipient_hash({"name": "Ann"}))
+            self.assertNotEqual(ann, message.recipient_hash({"name": "Anne"}))
+        finally:
+            plain.close()
+            message.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,244 @@
+# tests/test_sender.py
+
+import time
+import unittest
+
+from src.message import PreparedMessage
+from src.rate_limit import RateLimiter, TokenBucket
+from src.sender import connect_smtp, send_messages, send_sharded
+from src.smtp_sink import SMTPSink
+
+
+def deliver(server, recipient):
+    msg = f"To: {recipient}\r\nSubject: Test\r\n\r\nHello\r\n"
+    return server.sendmail("sender@example.com", [recipient], msg)
+
+
+def deliver_batch(server, batch):
+    msg = "To: undisclosed-recipients:;\r\nSubject: Test\r\n\r\nHello\r\n"
+    return server.sendmail("sender@example.com", list(batch), msg)
+
+
+def recipients(count):
+    return [f"user{index}@example.com" for index in range(count)]
+
+
+class TestSendMessages(unittest.TestCase):
+    def test_delivers_every_job_over_several_connections(self):
+        events = []
+        with SMTPSink() as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000),
+                recipients(20),
+                deliver,
+                connections=4,
+                on_event=events.append,
+            )
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual([result["job"] for result in results], recipients(20))
+        self.assertEqual(sink.message_count, 20)
+        connected = [event for event in events if event["event"] == "connected"]
+        self.assertEqual(len(connected), 4)
+        self.assertEqual(events[-1]["event"], "finished")
+        self.assertEqual(events[-1]["sent"], 20)
+
+    def test_prepared_message_end_to_end(self):
+        message = PreparedMessage(
+            "sender@example.com", "Hello", "<p>Dear {{ name }}</p>", personalized=True
+        )
+        try:
+            with SMTPSink() as sink:
+                results = send_messages(
+                    sink.account(rate_per_second=1000),
+                    ["a@example.com"],
+                    lambda server, recipient: message.send(
+                        server, "sender@example.com", recipient, {"name": "Ann"}
+                    ),
+                )
+        finally:
+            message.close()
+        self.assertTrue(results[0]["success"])
+        data = sink.messages[0]["data"]
+        self.assertIn(b"To: a@example.com", data)
+        self.assertIn(b"Subject: Hello", data)
+
+    def test_refused_recipient_fails_without_retry(self):
+        events = []
+        with SMTPSink(refuse={"user1@example.com"}) as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000),
+                recipients(3),
+                deliver,
+                on_event=events.append,
+                backoff=0,
+            )
+        self.assertEqual([result["success"] for result in results], [True, False, True])
+        self.assertIn(550, results[1]["refused"]["user1@example.com"])
+        self.assertFalse([event for event in events if event["event"] == "retry"])
+
+    def test_deferred_recipient_is_retried(self):
+        events = []
+        with SMTPSink(defer={"user1@example.com"}) as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000),
+                recipients(3),
+                deliver,
+                on_event=events.append,
+                backoff=0,
+            )
+        self.assertTrue(all(result["success"] for result in results))
+        retries = [event for event in events if event["event"] == "retry"]
+        self.assertEqual([event["job"] for event in retries], ["user1@example.com"])
+        self.assertEqual(sink.message_count, 3)
+
+    def test_deferred_recipients_of_a_batch_are_retried(self):
+        events = []
+        batches = [tuple(recipients(4)[:2]), tuple(recipients(4)[2:])]
+        with SMTPSink(
+            refuse={"user0@example.com"}, defer={"user3@example.com"}
+        ) as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000),
+                batches,
+                deliver_batch,
+                connections=1,
+                on_event=events.append,
+                backoff=0,
+            )
+        jobs = [(result["job"], sorted(result["refused"])) for result in results]
+        self.assertEqual(
+            jobs,
+            [
+                (("user0@example.com", "user1@example.com"), ["user0@example.com"]),
+                (("user2@example.com",), []),
+                (("user3@example.com",), []),
+            ],
+        )
+        self.assertEqual(sink.recipient_count, 3)
+        # Progress is counted in recipients, not batches
+        done = [event for event in events if event["event"] in ("sent", "failed")]
+        self.assertEqual([event["index"] for event in done], [2, 3, 4])
+        self.assertTrue(all(event["total"] == 4 for event in done))
+        self.assertEqual(
+            {key: events[-1][key] for key in ("sent", "failed", "total")},
+            {"sent": 3, "failed": 1, "total": 4},
+        )
+
+    def test_unencodable_recipient_fails_only_its_job(self):
+        with SMTPSink() as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000),
+                ["a@example.com", "jörg@exämple.com", "b@example.com"],
+                deliver,
+                connections=1,
+            )
+        self.assertEqual([result["success"] for result in results], [True, False, True])
+        self.assertEqual(sink.message_count, 2)
+
+
+class TestAccountErrors(unittest.TestCase):
+    def test_failed_login_disables_the_account_once(self):
+        attempts = []
+
+        def connect(account):
+            attempts.append(account["name"])
+            return connect_smtp(account)
+
+        events = []
+        with SMTPSink(reject_auth=True) as sink:
+            results = send_messages(
+                sink.account(rate_per_second=1000, password="wrong"),
+                recipients(30),
+                deliver,
+                connections=3,
+                on_event=events.append,
+                connect=connect,
+            )
+        self.assertFalse(any(result["success"] for result in results))
+        self.assertIn("No sending account available", results[-1]["error"])
+        # One login attempt per connection at most, not one per job
+        self.assertLessEqual(len(attempts), 3)
+        disabled = [event for event in events if event["event"] == "account_disabled"]
+        self.assertEqual(len(disabled), 1)
+
+    def test_quota_fails_over_to_the_next_account(self):
+        with SMTPSink(quota=2) as limited, SMTPSink() as spare:
+            accounts = [
+                limited.account(name="LIMITED", rate_per_second=1000, connections=1),
+                spare.account(name="SPARE", rate_per_second=1000, connections=1),
+            ]
+            results = send_sharded(
+                accounts,
+                recipients(10),
+                lambda server, account, recipient: deliver(server, recipient),
+            )
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual(limited.message_count, 2)
+        self.assertEqual(spare.message_count, 8)
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_token_bucket_refills_at_its_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(2, capacity=2, clock=lambda: now[0])
+        bucket.take(2)
+        self.assertAlmostEqual(bucket.wait_time(), 0.5)
+        now[0] = 0.5
+        self.assertEqual(bucket.wait_time(), 0)
+
+    def test_limiter_spaces_out_sends(self):
+        limiter = RateLimiter(per_second=20, burst=1)
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def test_daily_quota_is_not_waited_for(self):
+        limiter = RateLimiter(per_second=1000, per_day=2)
+        self.assertTrue(limiter.acquire(max_wait=60))
+        self.assertTrue(limiter.acquire(max_wait=60))
+        self.assertFalse(limiter.acquire(max_wait=60))
+
+    def test_earlier_sends_count_against_the_daily_quota(self):
+        limiter = RateLimiter(per_second=1000, per_day=3, sent_last_day=2)
+        self.assertTrue(limiter.acquire(max_wait=60))
+        self.assertFalse(limiter.acquire(max_wait=60))
+
+    def test_used_up_daily_quota_disables_the_account(self):
+        with SMTPSink() as sink:
+            account = sink.account(name="DAILY", rate_per_second=1000)
+            results = send_sharded(
+                [account],
+                recipients(4),
+                lambda server, account, recipient: deliver(server, recipient),
+                limiters={"DAILY": RateLimiter(per_second=1000, per_day=3)},
+            )
+        self.assertEqual(sum(result["success"] for result in results), 3)
+        self.assertEqual(sink.message_count, 3)
+
+    def test_batch_takes_one_token_per_recipient(self):
+        limiter = RateLimiter(per_second=1000, per_day=5)
+        self.assertTrue(limiter.acquire(max_wait=60, tokens=3))
+        self.assertEqual(limiter.quota_left(), 2)
+        self.assertFalse(limiter.acquire(max_wait=60, tokens=3))
+
+    def test_batch_larger_than_the_daily_quota_is_cut_down(self):
+        batches = [tuple(recipients(12)[:10]), tuple(recipients(12)[10:])]
+        with SMTPSink() as sink:
+            account = sink.account(name="DAILY", rate_per_second=1000)
+            results = send_sharded(
+                [account],
+                batches,
+                lambda server, account, batch: deliver_batch(server, batch),
+                limiters={"DAILY": RateLimiter(per_second=1000, per_day=5)},
+            )
+        self.assertEqual(sink.recipient_count, 5)
+        sent = [result["job"] for result in results if result["success"]]
+        self.assertEqual(sent, [tuple(recipients(5))])
+        self.assertEqual(
+            sum(len(result["job"]) for result in results if not result["success"]), 7
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+"""
+Benchmarks conversion types on synthetic inputs and compares the results with
+stored baselines, so regressions are visible.
+
+Every repetition runs in a fresh interpreter and output folder and reports
+latency, CPU time, throughput (input MB per second) and peak RSS, including
+ffmpeg/soffice child processes. The strategy column shows how a backend
+converted, e.g. "remux" for videos copied without re-encoding.
+
+Usage (from the converter folder):
+    python benchmarks/conversions.py                    # run and compare
+    python benchmarks/conversions.py -t wav_to_mp3 -t mov_to_mp4_encode --repeat 5
+    python benchmarks/conversions.py --scale 2 --save-baseline
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+CONVERTER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, CONVERTER_DIR)
+
+from benchmarks import fixtures  # noqa: E402
+
+DEFAULT_BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+DEFAULT_TIMEOUT = 600.0  # Seconds per repetition before it counts as hung
+
+
+def benchmark_cases(scale: float):
+    """
+    case name -> (conversion type, fixture file name, factory, factory params,
+    kwargs). The case name is the conversion type unless one type has
+    several cases.
+    """
+    image = {"width": int(2000 * scale), "height": int(1500 * scale)}
+    audio = {"seconds": 60 * scale}
+    video = {"seconds": 10 * scale}
+    return {
+        "jpg_to_png": (
+            "jpg_to_png",
+            "photo.jpg",
+            fixtures.make_image,
+            image,
+            {"transparent_color": (255, 255, 255), "tolerance": 8},
+        ),
+        "png_to_jpg": ("png_to_jpg", "photo.png", fixtures.make_image, image, {}),
+        "wav_to_mp3": ("wav_to_mp3", "tone.wav", fixtures.make_wav, audio, {}),
+        "mp3_to_wav": ("mp3_to_wav", "tone.mp3", fixtures.make_audio, audio, {}),
+        "m4a_to_mp3": ("m4a_to_mp3", "tone.m4a", fixtures.make_audio, audio, {}),
+        "m4a_to_wav": ("m4a_to_wav", "tone.m4a", fixtures.make_audio, audio, {}),
+        # H.264/AAC fits MP4 as is, so this measures the remux path
+        "mov_to_mp4": ("mov_to_mp4", "clip.mov", fixtures.make_video, video, {}),
+        "mov_to_mp4_encode": (
+            "mov_to_mp4",
+            "clip.mov",
+            fixtures.make_video,
+            dict(video, codec="prores"),
+            {},
+        ),
+        "mp4_to_mov": ("mp4_to_mov", "clip.mp4", fixtures.make_video, video, {}),
+        "video_to_gif": ("video_to_gif", "clip.mp4", fixtures.make_video, video, {}),
+        "gif_to_video": ("gif_to_video", "clip.gif", fixtures.make_video, video, {}),
+        "pdf_to_docx": (
+            "pdf_to_docx",
+            "document.pdf",
+            fixtures.make_pdf,
+            {"pages": int(20 * scale)},
+            {},
+        ),
+        "docx_to_pdf": (
+            "docx_to_pdf",
+            "document.docx",
+            fixtures.make_docx,
+            {"paragraphs": int(500 * scale)},
+            {},
+        ),
+    }
+
+
+def _peak_rss_kb():
+    # ru_maxrss is in KB on Linux; RUSAGE_CHILDREN covers ffmpeg and soffice
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def _measure(
+    conversion_type, input_folder, input_file, output_folder, kwargs, results
+):
+    os.chdir(CONVERTER_DIR)
+    try:
+        from main import run_conversion
+
+        start_times = os.times()
+        start = time.perf_counter()
+        result = run_conversion(
+            input_file, output_folder, conversion_type, input_folder, **kwargs
+        )
+        latency = time.perf_counter() - start
+        end_times = os.times()
+    except Exception as e:
+        results.put({"error": f"{type(e).__name__}: {e}"})
+        return
+
+    cpu_time = sum(end_times[:4]) - sum(start_times[:4])  # Self and children
+    results.put(
+        {
+            "latency": latency,
+            "cpu_time": cpu_time,
+            "peak_rss_kb": _peak_rss_kb(),
+            "strategy": result["strategy"],
+        }
+    )
+
+
+def _collect(process, results, timeout: float):
+    """Waits for the sample of a benchmark process, or for it to die or hang."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not process.is_alive():
+                return {"error": f"Benchmark process exited with {process.exitcode}"}
+            if time.monotonic() > deadline:
+                process.terminate()
+                return {"error": f"No result within {timeout:.0f}s"}
+
+
+def run_case(case_name, case, work_dir, repeat, timeout: float = DEFAULT_TIMEOUT):
+    conversion_type, file_name, factory, params, kwargs = case
+    input_folder = os.path.join(work_dir, "input")
+    input_path = fixtures.ensure_fixture(input_folder, file_name, factory, **params)
+
+    # A fresh interpreter per repetition keeps peak RSS per conversion honest,
+    # and a fresh output folder keeps earlier outputs from being overwritten
+    context = multiprocessing.get_context("spawn")
+    samples = []
+    for repetition in range(repeat):
+        output_folder = os.path.join(work_dir, "output", case_name, str(repetition))
+        shutil.rmtree(output_folder, ignore_errors=True)
+        os.makedirs(output_folder)
+        results = context.Queue()
+        process = context.Process(
+            target=_measure,
+            args=(
+                conversion_type,
+                input_folder,
+                os.path.basename(input_path),
+                output_folder,
+                kwargs,
+                results,
+            ),
+        )
+        process.start()
+        sample = _collect(process, results, timeout)
+        process.join()
+        if "error" in sample:
+            return {"error": sample["error"]}
+        samples.append(sample)
+
+    latency = statistics.median(sample["latency"] for sample in samples)
+    input_mb = os.path.getsize(input_path) / 1024**2
+    return {
+        "params": params,
+        "input_mb": round(input_mb, 3),
+        "latency_s": round(latency, 4),
+        "cpu_s": round(statistics.median(s["cpu_time"] for s in samples), 4),
+        "throughput_mb_s": round(input_mb / latency, 3),
+        "peak_rss_kb": max(sample["peak_rss_kb"] for sample in samples),
+        "strategy": samples[-1]["strategy"],
+    }
+
+
+def compare(result, baseline, threshold):
+    """Returns regression messages for metrics worse than baseline by threshold."""
+    if not baseline or baseline.get("params") != result["params"]:
+        return []  # No comparable baseline for this input size
+    regressions = []
+    for metric in ("latency_s", "cpu_s", "peak_rss_kb"):
+        if baseline[metric] and result[metric] > baseline[metric] * (1 + threshold):
+            change = (result[metric] / baseline[metric] - 1) * 100
+            regressions.append(f"{metric} +{change:.0f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "-t", "--type", dest="types", action="append", help="Case name (repeatable)"
+    )
+    parser.add_argument("--scale", type=float, default=1.0, help="Input size factor")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--work-dir", help="Keep fixtures and outputs here")
+    parser.add_argument("--baselines", default=DEFAULT_BASELINES)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="Seconds per repetition",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.10, help="Allowed slowdown (0.10 = 10%%)"
+    )
+    args = parser.parse_args()
+
+    cases = benchmark_cases(args.scale)
+    selected = args.types or list(cases)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="converter_bench_")
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    print(
+        f"{'case':<19}{'strategy':<12}{'latency s':>10}{'cpu s':>8}{'MB/s':>9}"
+        f"{'peak RSS MB':>13}  vs baseline"
+    )
+    results = {}
+    regressed = False
+    for case_name in selected:
+        case = cases[case_name]
+        result = run_case(case_name, case, work_dir, args.repeat, args.timeout)
+        if "error" in result:
+            print(f"{case_name:<19}failed: {result['error']}")
+            continue
+        results[case_name] = result
+        regressions = compare(result, baselines.get(case_name), args.threshold)
+        regressed = regressed or bool(regressions)
+        print(
+            f"{case_name:<19}{result['strategy'] or '-':<12}"
+            f"{result['latency_s']:>10.3f}{result['cpu_s']:>8.2f}"
+            f"{result['throughput_mb_s']:>9.2f}{result['peak_rss_kb'] / 1024:>13.1f}  "
+            f"{', '.join(regressions) or 'ok'}"
+        )
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print(f"Baselines saved to {args.baselines}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
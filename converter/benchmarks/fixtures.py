@@ -0,0 +1,190 @@
+"""
+Synthetic benchmark inputs generated locally, so benchmarks do not depend on
+binary fixtures checked into the repo. Every generator is deterministic for a
+given set of parameters.
+"""
+
+import array
+import math
+import os
+import zipfile
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua."
+)
+
+
+def make_image(path: str, width: int = 4000, height: int = 3000):
+    """Noisy gradient photo stand-in; the extension picks JPEG or PNG."""
+    from PIL import Image
+
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    mirrored = gradient.transpose(Image.FLIP_LEFT_RIGHT)
+    image = Image.merge("RGB", (gradient, noise, mirrored))
+    if path.lower().endswith(".png"):
+        image.save(path, "PNG")
+    else:
+        image.save(path, "JPEG", quality=95)
+
+
+def make_wav(path: str, seconds: float = 60, sample_rate=44100, frequency=440):
+    """16-bit stereo sine wave, written in one-second chunks."""
+    import wave
+
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        step = 2 * math.pi * frequency / sample_rate
+        written = 0
+        total = int(seconds * sample_rate)
+        while written < total:
+            count = min(sample_rate, total - written)
+            samples = array.array("h")
+            for n in range(written, written + count):
+                value = int(12000 * math.sin(step * n))
+                samples.extend((value, value))
+            wav.writeframes(samples.tobytes())
+            written += count
+
+
+def make_audio(path: str, seconds: float = 60, frequency=440):
+    """Sine-wave audio in any format ffmpeg can encode (e.g. .mp3, .m4a)."""
+    import ffmpeg
+
+    ffmpeg.input(
+        f"sine=frequency={frequency}:sample_rate=44100:duration={seconds}", f="lavfi"
+    ).output(path).run(overwrite_output=True, quiet=True)
+
+
+def make_video(
+    path: str,
+    seconds: float = 30,
+    size: str = "1280x720",
+    fps: int = 30,
+    codec: str = "h264",
+):
+    """
+    testsrc2 pattern with a sine-wave soundtrack, encoded as H.264/AAC, or as
+    ProRes/PCM with codec="prores" (which MP4 cannot hold, so converting it to
+    MP4 always re-encodes).
+    """
+    import ffmpeg
+
+    video = ffmpeg.input(
+        f"testsrc2=size={size}:rate={fps}:duration={seconds}", f="lavfi"
+    )
+    if path.lower().endswith(".gif"):
+        ffmpeg.output(video, path).run(overwrite_output=True, quiet=True)
+        return
+    if codec == "prores":
+        output_kwargs = {
+            "vcodec": "prores_ks",
+            "pix_fmt": "yuv422p10le",
+            "acodec": "pcm_s16le",
+        }
+    else:
+        output_kwargs = {
+            "vcodec": "libx264",
+            "pix_fmt": "yuv420p",
+            "preset": "veryfast",
+            "acodec": "aac",
+        }
+    audio = ffmpeg.input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+    ffmpeg.output(video, audio, path, **output_kwargs).run(
+        overwrite_output=True, quiet=True
+    )
+
+
+def make_pdf(path: str, pages: int = 20, lines_per_page: int = 40):
+    """Multi-page text PDF written directly, without any PDF library."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, filled in once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"BT /F1 16 Tf 72 760 Td (Page {page + 1}) Tj ET"]
+        for line in range(lines_per_page):
+            y = 730 - line * 16
+            lines.append(f"BT /F1 10 Tf 72 {y} Td ({line + 1}. {LOREM}) Tj ET")
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref_offset)
+        )
+
+
+def make_docx(path: str, paragraphs: int = 500):
+    """Minimal WordprocessingML package with plain paragraphs."""
+    body = "".join(
+        f"<w:p><w:r><w:t>{index + 1}. {LOREM}</w:t></w:r></w:p>"
+        for index in range(paragraphs)
+    )
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as docx:
+        docx.writestr(
+            "[Content_Types].xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            "</Types>",
+        )
+        docx.writestr(
+            "_rels/.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+            'relationships"><Relationship Id="rId1" Type="http://schemas.'
+            "openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+            '" Target="word/document.xml"/></Relationships>',
+        )
+        docx.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            f'wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>',
+        )
+
+
+def ensure_fixture(folder: str, name: str, factory, **params) -> str:
+    """
+    Creates a fixture once per folder and parameter set and returns its path.
+    The parameters are part of the file name (e.g. clip_seconds-20.mp4), so a
+    run at another --scale never reuses inputs of the wrong size.
+    """
+    stem, extension = os.path.splitext(name)
+    suffix = "".join(f"_{key}-{value}" for key, value in sorted(params.items()))
+    path = os.path.join(folder, f"{stem}{suffix}{extension}")
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        factory(path, **params)
+    return path
@@ -0,0 +1,62 @@
+"""
+Measures converter start-up time in fresh interpreters: importing main.py with
+its lazy backend registry versus loading every backend up front, which is what
+main.py used to do at import time.
+
+Usage (from the converter folder):
+    python benchmarks/startup.py --runs 20
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CONVERTER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SCENARIOS = {
+    "import main (lazy)": "import main",
+    "wav_to_mp3 backend only": "import main; main.get_converter('wav_to_mp3')",
+    "all backends (eager)": (
+        "import main\n"
+        "for conversion_type in main.CONVERSIONS:\n"
+        "    main.get_converter(conversion_type)"
+    ),
+}
+
+
+def time_snippet(code: str, runs: int):
+    """Returns wall-clock start-up times in milliseconds, or None on failure."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=CONVERTER_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if result.returncode != 0:
+            return None  # A backend dependency is not installed
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':<28}{'min ms':>10}{'median ms':>12}")
+    for name, code in SCENARIOS.items():
+        timings = time_snippet(code, args.runs)
+        if timings is None:
+            print(f"{name:<28}{'failed (missing dependency)':>22}")
+            continue
+        print(f"{name:<28}{min(timings):>10.1f}{statistics.median(timings):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,124 @@
+import argparse
 import glob
+import importlib
+import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from src.audio_converter import wav_to_mp3, mp3_to_wav, m4a_to_mp3, m4a_to_wav
-from src.image_converter import heic_to_jpg, jpg_to_png, png_to_jpg
-from src.pdf_converter import pdf_to_docx, docx_to_pdf
-from src.video_converter import (
-    mov_to_mp4,
-    mp4_to_mov,
-    video_to_gif,
-    gif_to_video,
-    live_photo_to_gif,
-    live_photo_to_video,
-)
+from src.metrics import ConversionMetrics, emit_metrics
+from src.result_cache import ResultCache
+
+GIF_OPTIONS = ("fps", "max_width", "dedup", "target_size")
+# Strategy the GIF backends report when the output misses --target-size
+GIF_OVER_TARGET = "gif_over_target_size"
+PDF_OPTIONS = ("start", "end", "pages", "workers")
+
+# Backends are imported on first use, so a WAV -> MP3 call never loads
+# Pillow, pyheif or pdf2docx. "options" lists the kwargs forwarded to the
+# backend function when they are given.
+CONVERSIONS = {
+    "pdf_to_docx": {
+        "module": "src.pdf_converter",
+        "function": "pdf_to_docx",
+        "extension": "docx",
+        "options": PDF_OPTIONS,
+    },
+    "docx_to_pdf": {
+        "module": "src.pdf_converter",
+        "function": "docx_to_pdf",
+        "extension": "pdf",
+        "options": (),
+    },
+    "heic_to_jpg": {
+        "module": "src.image_converter",
+        "function": "heic_to_jpg",
+        "extension": "jpg",
+        "options": ("quality",),
+    },
+    "jpg_to_png": {
+        "module": "src.image_converter",
+        "function": "jpg_to_png",
+        "extension": "png",
+        "options": ("transparent_color", "tolerance"),
+    },
+    "png_to_jpg": {
+        "module": "src.image_converter",
+        "function": "png_to_jpg",
+        "extension": "jpg",
+        "options": ("quality",),
+    },
+    "mov_to_mp4": {
+        "module": "src.video_converter",
+        "function": "mov_to_mp4",
+        "extension": "mp4",
+        "options": ("chunked",),
+    },
+    "mp4_to_mov": {
+        "module": "src.video_converter",
+        "function": "mp4_to_mov",
+        "extension": "mov",
+        "options": ("chunked",),
+    },
+    "wav_to_mp3": {
+        "module": "src.audio_converter",
+        "function": "wav_to_mp3",
+        "extension": "mp3",
+        "options": (),
+    },
+    "mp3_to_wav": {
+        "module": "src.audio_converter",
+        "function": "mp3_to_wav",
+        "extension": "wav",
+        "options": (),
+    },
+    "m4a_to_mp3": {
+        "module": "src.audio_converter",
+        "function": "m4a_to_mp3",
+        "extension": "mp3",
+        "options": (),
+    },
+    "m4a_to_wav": {
+        "module": "src.audio_converter",
+        "function": "m4a_to_wav",
+        "extension": "wav",
+        "options": (),
+    },
+    "video_to_gif": {
+        "module": "src.video_converter",
+        "function": "video_to_gif",
+        "extension": "gif",
+        "options": GIF_OPTIONS,
+    },
+    "gif_to_video": {
+        "module": "src.video_converter",
+        "function": "gif_to_video",
+        "extension": "mp4",
+        "options": (),
+    },
+    "live_photo_to_gif": {
+        "module": "src.video_converter",
+        "function": "live_photo_to_gif",
+        "extension": "gif",
+        "options": GIF_OPTIONS,
+    },
+    "live_photo_to_video": {
+        "module": "src.video_converter",
+        "function": "live_photo_to_video",
+        "extension": "mp4",
+        "options": ("chunked",),
+    },
+}
+
+
+def get_converter(conversion_type: str):
+    """Imports the backend for a conversion type and returns its function."""
+    backend = CONVERSIONS[conversion_type]
+    module = importlib.import_module(backend["module"])
+    return getattr(module, backend["function"])
 
 
 def get_file_stats(file_path):
@@ -33,66 +137,508 @@ def batch_convert_files(
     files = glob.glob(os.path.join(input_folder, f"*.{file_extension}"))
     for input_file in files:
         input_filename = os.path.basename(input_file)
-        convert_file(input_filename, output_folder, conversion_type, **kwargs)
-
-
-def convert_file(input_file: str, output_folder: str, conversion_type: str, **kwargs):
-    input_path = os.path.join("input", input_file)
-    output_path = os.path.join(output_folder, f"{os.path.splitext(input_file)[0]}")
-
-    conversions = {
-        "pdf_to_docx": lambda: pdf_to_docx(input_path, f"{output_path}.docx"),
-        "docx_to_pdf": lambda: docx_to_pdf(input_path, f"{output_path}.pdf"),
-        "heic_to_jpg": lambda: heic_to_jpg(input_path, f"{output_path}.jpg"),
-        "jpg_to_png": lambda: jpg_to_png(
-            input_path,
-            f"{output_path}.png",
-            transparent_color=kwargs.get("transparent_color"),
-        ),
-        "png_to_jpg": lambda: png_to_jpg(input_path, f"{output_path}.jpg"),
-        "mov_to_mp4": lambda: mov_to_mp4(input_path, f"{output_path}.mp4"),
-        "mp4_to_mov": lambda: mp4_to_mov(input_path, f"{output_path}.mov"),
-        "wav_to_mp3": lambda: wav_to_mp3(input_path, f"{output_path}.mp3"),
-        "mp3_to_wav": lambda: mp3_to_wav(input_path, f"{output_path}.wav"),
-        "m4a_to_mp3": lambda: m4a_to_mp3(input_path, f"{output_path}.mp3"),
-        "m4a_to_wav": lambda: m4a_to_wav(input_path, f"{output_path}.wav"),
-        "video_to_gif": lambda: video_to_gif(input_path, f"{output_path}.gif"),
-        "gif_to_video": lambda: gif_to_video(input_path, f"{output_path}.mp4"),
-        "live_photo_to_gif": lambda: live_photo_to_gif(
-            input_path, f"{output_path}.gif"
-        ),
-        "live_photo_to_video": lambda: live_photo_to_video(
-            input_path, f"{output_path}.mp4"
-        ),
+        convert_file(
+            input_filename,
+            output_folder,
+            conversion_type,
+            input_folder=input_folder,
+            **kwargs,
+        )
+
+
+def batch_convert_files_parallel(
+    input_folder: str,
+    output_folder: str,
+    conversion_type: str,
+    file_extension: str,
+    max_workers: int = None,
+    optimize: dict = None,
+    **kwargs,
+):
+    """
+    Converts every matching file in input_folder using a pool of worker processes.
+
+    :param max_workers: Number of worker processes (defaults to the CPU count)
+    :param optimize: When given, successful PNG/JPEG outputs are optimized
+                     afterwards; the dict is passed to optimize_files (e.g.
+                     {"quality": 80, "max_bytes": 500_000})
+    :return: List of per-file result dicts, in input order, with the keys
+             input_file, output_path, success, error, duration (seconds),
+             original_size, new_size, size_delta (all sizes in KB), strategy
+             and, with optimize, bytes_saved
+    :raises ValueError: If on_metrics is given; callbacks cannot reach the
+                        worker processes, use metrics_sink instead
+    """
+    if kwargs.get("on_metrics") is not None:
+        raise ValueError(
+            "on_metrics only works in-process; use metrics_sink with worker processes."
+        )
+    files = sorted(glob.glob(os.path.join(input_folder, f"*.{file_extension}")))
+    os.makedirs(output_folder, exist_ok=True)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                _convert_worker,
+                os.path.basename(input_file),
+                output_folder,
+                conversion_type,
+                input_folder,
+                kwargs,
+            )
+            for input_file in files
+        ]
+        for input_file, future in zip(files, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker process itself died (e.g. a crash inside a codec)
+                results.append(
+                    _failed_result(os.path.basename(input_file), e, duration=0.0)
+                )
+
+    if optimize is not None:
+        from src.optimizer import optimize_files
+
+        optimizable = [
+            result
+            for result in results
+            if result["success"]
+            and result["output_path"].lower().endswith((".png", ".jpg", ".jpeg"))
+        ]
+        reports = optimize_files(
+            [result["output_path"] for result in optimizable],
+            max_workers=max_workers,
+            **optimize,
+        )
+        for result, report in zip(optimizable, reports):
+            result["bytes_saved"] = report["bytes_saved"]
+            if not report["success"]:
+                result["error"] = report["error"]
+    return results
+
+
+def _failed_result(input_file, error, duration):
+    return {
+        "input_file": input_file,
+        "output_path": None,
+        "success": False,
+        "error": f"{type(error).__name__}: {error}",
+        "duration": duration,
+        "original_size": None,
+        "new_size": None,
+        "size_delta": None,
+        "strategy": None,
     }
 
-    if conversion_type in conversions:
-        original_size = get_file_stats(input_path)
-        conversions[conversion_type]()
-        new_size = get_file_stats(f"{output_path}.{conversion_type.split('_')[-1]}")
 
-        print(f"Conversion {conversion_type} completed.")
-        print(f"Original size: {original_size:.2f} KB")
-        print(f"New size: {new_size:.2f} KB")
-        print(f"Size change: {((new_size - original_size) / original_size) * 100:.2f}%")
+def _convert_worker(input_file, output_folder, conversion_type, input_folder, kwargs):
+    start = time.perf_counter()
+    try:
+        stats = run_conversion(
+            input_file, output_folder, conversion_type, input_folder, **kwargs
+        )
+    except Exception as e:
+        return _failed_result(input_file, e, duration=time.perf_counter() - start)
 
-        # Additional detailed stats can be added here
-    else:
-        print(f"Conversion type {conversion_type} not supported.")
+    return {
+        "input_file": input_file,
+        "output_path": stats["output_path"],
+        "success": True,
+        "error": None,
+        "duration": time.perf_counter() - start,
+        "original_size": stats["original_size"],
+        "new_size": stats["new_size"],
+        "size_delta": stats["new_size"] - stats["original_size"],
+        "strategy": stats["strategy"],
+    }
+
+
+def convert_file(
+    input_file: str,
+    output_folder: str,
+    conversion_type: str,
+    input_folder: str = "input",
+    **kwargs,
+):
+    try:
+        stats = run_conversion(
+            input_file, output_folder, conversion_type, input_folder, **kwargs
+        )
+    except ValueError as e:
+        print(e)
+        return None
+
+    original_size = stats["original_size"]
+    new_size = stats["new_size"]
+    print(f"Conversion {conversion_type} completed.")
+    if stats["strategy"]:
+        print(f"Strategy: {stats['strategy']}")
+    if stats["strategy"] == GIF_OVER_TARGET:
+        print("Warning: the output is still larger than the target size.")
+    print(f"Original size: {original_size:.2f} KB")
+    print(f"New size: {new_size:.2f} KB")
+    print(f"Size change: {((new_size - original_size) / original_size) * 100:.2f}%")
+
+    # Additional detailed stats can be added here
+    return stats
+
+
+def convert_file_multi(
+    input_file: str,
+    output_folder: str,
+    conversion_types,
+    input_folder: str = "input",
+    **kwargs,
+):
+    """
+    Converts one input to several targets, e.g. MOV -> MP4 and GIF. Targets
+    served by the same backend go through its fan_out function, which decodes
+    the input once and feeds every encoder. Backends without one run each
+    target separately.
+
+    :return: Dict of conversion type -> dict with output_path, original_size,
+             new_size (sizes in KB) and strategy (as reported by the backend)
+    """
+    input_path = os.path.join(input_folder, input_file)
+    original_size = get_file_stats(input_path)
+
+    targets_by_module = {}
+    for conversion_type in conversion_types:
+        if conversion_type not in CONVERSIONS:
+            raise ValueError(f"Conversion type {conversion_type} not supported.")
+        backend = CONVERSIONS[conversion_type]
+        output_name = f"{os.path.splitext(input_file)[0]}.{backend['extension']}"
+        options = {
+            option: kwargs[option] for option in backend["options"] if option in kwargs
+        }
+        targets_by_module.setdefault(backend["module"], []).append(
+            (conversion_type, os.path.join(output_folder, output_name), options)
+        )
+
+    results = {}
+    for module_name, targets in targets_by_module.items():
+        module = importlib.import_module(module_name)
+        if len(targets) > 1 and hasattr(module, "fan_out"):
+            strategies = module.fan_out(input_path, targets)
+        else:
+            strategies = {
+                output_path: get_converter(conversion_type)(
+                    input_path, output_path, **options
+                )
+                for conversion_type, output_path, options in targets
+            }
+
+        for conversion_type, output_path, _ in targets:
+            results[conversion_type] = {
+                "output_path": output_path,
+                "original_size": original_size,
+                "new_size": get_file_stats(output_path),
+                "strategy": strategies.get(output_path),
+            }
+    return results
+
+
+def run_conversion(
+    input_file: str,
+    output_folder: str,
+    conversion_type: str,
+    input_folder: str = "input",
+    cache: ResultCache = None,
+    metrics_sink: str = None,
+    on_metrics=None,
+    **kwargs,
+):
+    """
+    Runs a single conversion without printing anything.
+
+    :param cache: Optional ResultCache; unchanged inputs are served from it
+                  instead of being converted again
+    :param metrics_sink: Optional JSONL file; one metrics record is appended
+                         per conversion, including failed ones
+    :param on_metrics: Optional callable that receives each metrics record,
+                       in this process (batch_convert_files_parallel rejects it)
+    :return: Dict with output_path, original_size, new_size (sizes in KB),
+             cache_hit, strategy (the path a backend took, if it reports one)
+             and metrics (see src.metrics.ConversionMetrics)
+    :raises ValueError: If the conversion type is not supported
+    """
+    if conversion_type not in CONVERSIONS:
+        raise ValueError(f"Conversion type {conversion_type} not supported.")
+
+    backend = CONVERSIONS[conversion_type]
+    input_path = os.path.join(input_folder, input_file)
+    output_name = f"{os.path.splitext(input_file)[0]}.{backend['extension']}"
+    converted_path = os.path.join(output_folder, output_name)
+    options = {
+        option: kwargs[option] for option in backend["options"] if option in kwargs
+    }
+
+    strategy = None
+    cache_hit = False
+    metrics = ConversionMetrics(
+        conversion_type,
+        input_path,
+        converted_path,
+        f"{backend['module']}.{backend['function']}",
+    )
+    try:
+        with metrics:
+            # Inside the block, so a missing input is recorded as a failure too
+            original_size = get_file_stats(input_path)
+            if cache is not None:
+                cache_key = cache.make_key(input_path, conversion_type, kwargs)
+                cache_hit = cache.fetch(cache_key, converted_path)
+
+            if not cache_hit:
+                # An earlier hit may have hardlinked the output to a cache
+                # entry; backends write in place, so never write through it
+                if os.path.lexists(converted_path):
+                    os.remove(converted_path)
+                # Backends may report how they converted, e.g. "remux" or "transcode"
+                strategy = get_converter(conversion_type)(
+                    input_path, converted_path, **options
+                )
+                if cache is not None:
+                    cache.store(cache_key, converted_path)
+            new_size = get_file_stats(converted_path)
+    finally:
+        metrics.record["cache_hit"] = cache_hit
+        metrics.record["strategy"] = strategy
+        emit_metrics(metrics.record, metrics_sink, on_metrics)
+
+    return {
+        "output_path": converted_path,
+        "original_size": original_size,
+        "new_size": new_size,
+        "cache_hit": cache_hit,
+        "strategy": strategy,
+        "metrics": metrics.record,
+    }
+
+
+def parse_color(value: str):
+    return tuple(int(channel) for channel in value.split(","))
+
+
+def parse_pages(value: str):
+    return [int(page) for page in value.split(",")]
+
+
+def parse_box(value: str):
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Convert documents, images, audio and video files.",
+        epilog="examples:\n"
+        "  python main.py convert github.jpeg -t jpg_to_png "
+        "--transparent-color 255,255,255\n"
+        "  python main.py batch -t heic_to_jpg -e HEIC --workers 8\n"
+        "  python main.py fan-out IMG_2144.mov -t mov_to_mp4 -t video_to_gif\n"
+        "  python main.py watch --input-folder incoming --workers 4\n"
+        "  python main.py ingest -e HEIC -e jpg --size 1920x1080\n"
+        "  python main.py list",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # Options shared by all conversion commands
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--input-folder", default="input")
+    common.add_argument("--output-folder", default="output")
+    common.add_argument("--cache-dir", help="Reuse results of unchanged inputs")
+    common.add_argument(
+        "--metrics", dest="metrics_sink", help="Append per-conversion metrics (JSONL)"
+    )
+    options = common.add_argument_group("conversion options")
+    options.add_argument("--transparent-color", type=parse_color, metavar="R,G,B")
+    options.add_argument("--tolerance", type=int)
+    options.add_argument("--quality", type=int, help="JPEG quality (default 100)")
+    options.add_argument("--chunked", action="store_true", default=None)
+    options.add_argument("--fps", type=int)
+    options.add_argument("--max-width", type=int)
+    options.add_argument("--target-size", type=int, metavar="BYTES")
+    options.add_argument("--no-dedup", dest="dedup", action="store_false", default=None)
+    options.add_argument("--start", type=int)
+    options.add_argument("--end", type=int)
+    options.add_argument("--pages", type=parse_pages, metavar="N,N,...")
+    options.add_argument("--pdf-workers", dest="workers", type=int)
+
+    convert = subparsers.add_parser(
+        "convert", parents=[common], help="Convert one or more files"
+    )
+    convert.add_argument("-t", "--type", required=True, choices=sorted(CONVERSIONS))
+    convert.add_argument("files", nargs="+", help="File names in the input folder")
+
+    fan_out = subparsers.add_parser(
+        "fan-out",
+        parents=[common],
+        help="Convert one file to several targets, decoding it once",
+    )
+    fan_out.add_argument(
+        "-t",
+        "--type",
+        dest="types",
+        action="append",
+        required=True,
+        choices=sorted(CONVERSIONS),
+    )
+    fan_out.add_argument("file", help="File name in the input folder")
+
+    batch = subparsers.add_parser(
+        "batch", parents=[common], help="Convert every file with an extension"
+    )
+    batch.add_argument("-t", "--type", required=True, choices=sorted(CONVERSIONS))
+    batch.add_argument("-e", "--extension", required=True)
+    batch.add_argument("--workers", dest="max_workers", type=int)
+    batch.add_argument(
+        "--optimize", action="store_true", help="Optimize PNG/JPEG outputs"
+    )
+    batch.add_argument("--optimize-quality", type=int, metavar="0-100")
+    batch.add_argument("--max-bytes", type=int, help="Per-file size budget")
+
+    watch = subparsers.add_parser(
+        "watch",
+        parents=[common],
+        help="Convert files as they are dropped into the input folder",
+    )
+    watch.add_argument(
+        "--rules", help='JSON file mapping patterns to types, e.g. {"*.heic": ...}'
+    )
+    watch.add_argument("--workers", dest="max_workers", type=int)
+    watch.add_argument("--queue", help="Job queue database (default in output)")
+    watch.add_argument(
+        "--settle", type=float, default=2.0, help="Seconds a file must be unchanged"
+    )
+
+    ingest = subparsers.add_parser(
+        "ingest", help="Convert a batch of HEIC/JPEG photos to JPEG, optionally resized"
+    )
+    ingest.add_argument("--input-folder", default="input")
+    ingest.add_argument("--output-folder", default="output")
+    ingest.add_argument(
+        "-e", "--extension", dest="extensions", action="append", required=True
+    )
+    ingest.add_argument(
+        "--size", type=parse_box, metavar="WxH", help="Downscale to fit this box"
+    )
+    ingest.add_argument("--quality", type=int, default=100)
+    ingest.add_argument(
+        "--all-images", action="store_true", help="Also write secondary HEIC images"
+    )
+    ingest.add_argument("--workers", dest="max_workers", type=int)
+
+    subparsers.add_parser("list", help="List supported conversion types")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if args.command == "list":
+        for conversion_type in sorted(CONVERSIONS):
+            print(conversion_type)
+        return 0
+
+    if args.command == "ingest":
+        from src.image_converter import ingest_images
+
+        input_paths = sorted(
+            {
+                path
+                for extension in args.extensions
+                for path in glob.glob(os.path.join(args.input_folder, f"*.{extension}"))
+            }
+        )
+        results = ingest_images(
+            input_paths,
+            args.output_folder,
+            size=args.size,
+            quality=args.quality,
+            all_images=args.all_images,
+            max_workers=args.max_workers,
+        )
+        print(json.dumps(results, indent=2))
+        return 0 if all(result["success"] for result in results) else 1
+
+    option_names = {
+        option for backend in CONVERSIONS.values() for option in backend["options"]
+    }
+    kwargs = {
+        name: getattr(args, name)
+        for name in option_names
+        if getattr(args, name, None) is not None
+    }
+    if args.cache_dir:
+        kwargs["cache"] = ResultCache(args.cache_dir)
+    if args.metrics_sink:
+        kwargs["metrics_sink"] = args.metrics_sink
+
+    if args.command == "convert":
+        os.makedirs(args.output_folder, exist_ok=True)
+        for input_file in args.files:
+            convert_file(
+                input_file,
+                args.output_folder,
+                args.type,
+                input_folder=args.input_folder,
+                **kwargs,
+            )
+        return 0
+
+    if args.command == "watch":
+        from src.watcher import watch_folder
+
+        rules = None
+        if args.rules:
+            with open(args.rules) as f:
+                rules = json.load(f)
+        watch_folder(
+            args.input_folder,
+            args.output_folder,
+            _convert_worker,
+            rules=rules,
+            queue_path=args.queue,
+            max_workers=args.max_workers,
+            settle_seconds=args.settle,
+            options=kwargs,
+        )
+        return 0
+
+    if args.command == "fan-out":
+        # Fan-out conversions are not cached or measured
+        kwargs.pop("cache", None)
+        kwargs.pop("metrics_sink", None)
+        os.makedirs(args.output_folder, exist_ok=True)
+        results = convert_file_multi(
+            args.file,
+            args.output_folder,
+            args.types,
+            input_folder=args.input_folder,
+            **kwargs,
+        )
+        print(json.dumps(results, indent=2))
+        return 0
+
+    optimize = None
+    if args.optimize:
+        optimize = {"quality": args.optimize_quality, "max_bytes": args.max_bytes}
+    results = batch_convert_files_parallel(
+        args.input_folder,
+        args.output_folder,
+        args.type,
+        args.extension,
+        max_workers=args.max_workers,
+        optimize=optimize,
+        **kwargs,
+    )
+    print(json.dumps(results, indent=2))
+    return 0 if all(result["success"] for result in results) else 1
 
 
 if __name__ == "__main__":
-    # convert_file("test.pdf", "output", "pdf_to_docx")
-    # convert_file("test.docx", "output", "docx_to_pdf")
-    # convert_file("IMG_7440.HEIC", "output", "heic_to_jpg")
-    convert_file(
-        "github.jpeg", "output", "jpg_to_png", transparent_color=(255, 255, 255)
-    )
-    # convert_file("github.png", "output", "png_to_jpg")
-    # convert_file("poizzi.mov", "output", "mov_to_mp4")
-    # convert_file("poizzi.mp4", "output", "mp4_to_mov")
-    # convert_file("recording.wav", "output", "wav_to_mp3")
-    # convert_file("recording.mp3", "output", "mp3_to_wav")
-
-    # convert_file("IMG_2144.mov", "output", "mov_to_mp4")
-    # batch_convert_files("input", "output", "jpg_to_png", "jpeg")
+    sys.exit(main())
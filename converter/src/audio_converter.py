@@ -1,23 +1,79 @@
-from pydub import AudioSegment
+import os
 
+import ffmpeg
 
-def wav_to_mp3(input_path: str, output_path: str):
-    sound = AudioSegment.from_wav(input_path)
-    sound.export(output_path, format="mp3", bitrate="320k")  # High-quality MP3
+# Default encoder settings shared by both engines
+MP3_BITRATE = "320k"  # High-quality MP3
+WAV_SAMPLE_RATE = 44100  # CD-quality WAV
 
+# ffmpeg output settings per target extension
+ENCODER_SETTINGS = {
+    "mp3": {"acodec": "libmp3lame", "audio_bitrate": MP3_BITRATE},
+    "wav": {"acodec": "pcm_s16le", "ar": WAV_SAMPLE_RATE},
+}
 
-def mp3_to_wav(input_path: str, output_path: str):
-    sound = AudioSegment.from_mp3(input_path)
-    sound.export(
-        output_path, format="wav", parameters=["-ar", "44100"]
-    )  # CD-quality WAV
 
+def stream_convert(input_path: str, output_path: str, **output_kwargs):
+    """
+    Transcodes input_path to output_path in a single ffmpeg process. The audio
+    is streamed from decoder to encoder inside ffmpeg, so memory use does not
+    grow with the duration of the recording.
+    """
+    ffmpeg.input(input_path).output(output_path, vn=None, **output_kwargs).run(
+        overwrite_output=True
+    )
 
-def m4a_to_mp3(input_path: str, output_path: str):
-    sound = AudioSegment.from_file(input_path, format="m4a")
-    sound.export(output_path, format="mp3", bitrate="320k")
 
+def fan_out(input_path: str, targets):
+    """
+    Encodes one input to several outputs in a single ffmpeg process, so the
+    source is decoded once and the decoded audio feeds every encoder.
 
-def m4a_to_wav(input_path: str, output_path: str):
-    sound = AudioSegment.from_file(input_path, format="m4a")
-    sound.export(output_path, format="wav", parameters=["-ar", "44100"])
+    :param targets: (conversion_type, output_path, options) tuples
+    """
+    source = ffmpeg.input(input_path)
+    outputs = [
+        source.audio.output(
+            output_path, **ENCODER_SETTINGS[os.path.splitext(output_path)[1][1:]]
+        )
+        for _, output_path, _ in targets
+    ]
+    ffmpeg.merge_outputs(*outputs).run(overwrite_output=True)
+
+
+def _to_mp3(input_path: str, output_path: str, input_format: str, engine: str):
+    if engine == "pydub":
+        from pydub import AudioSegment
+
+        sound = AudioSegment.from_file(input_path, format=input_format)
+        sound.export(output_path, format="mp3", bitrate=MP3_BITRATE)
+    else:
+        stream_convert(input_path, output_path, **ENCODER_SETTINGS["mp3"])
+
+
+def _to_wav(input_path: str, output_path: str, input_format: str, engine: str):
+    if engine == "pydub":
+        from pydub import AudioSegment
+
+        sound = AudioSegment.from_file(input_path, format=input_format)
+        sound.export(
+            output_path, format="wav", parameters=["-ar", str(WAV_SAMPLE_RATE)]
+        )
+    else:
+        stream_convert(input_path, output_path, **ENCODER_SETTINGS["wav"])
+
+
+def wav_to_mp3(input_path: str, output_path: str, engine: str = "ffmpeg"):
+    _to_mp3(input_path, output_path, "wav", engine)
+
+
+def mp3_to_wav(input_path: str, output_path: str, engine: str = "ffmpeg"):
+    _to_wav(input_path, output_path, "mp3", engine)
+
+
+def m4a_to_mp3(input_path: str, output_path: str, engine: str = "ffmpeg"):
+    _to_mp3(input_path, output_path, "m4a", engine)
+
+
+def m4a_to_wav(input_path: str, output_path: str, engine: str = "ffmpeg"):
+    _to_wav(input_path, output_path, "m4a", engine)
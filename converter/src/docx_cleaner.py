@@ -1,18 +1,58 @@
-from docx import Document
-from docx.shared import RGBColor
-from docx.oxml.ns import nsdecls
-from docx.oxml import parse_xml
 import os
+import re
+import shutil
+import zipfile
+from xml.sax import make_parser
+from xml.sax.handler import ContentHandler
+from xml.sax.saxutils import XMLGenerator
 
+W_NAMESPACE = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
 
-def clean_up_docx(input_file, output_folder):
+# Parts rewritten by the XML engine
+CLEANED_PARTS = re.compile(r"^word/(document|header\d*|footer\d*)\.xml$")
+
+# Child order required by the WordprocessingML schema (CT_RPr and CT_TcPr)
+RUN_PROPERTY_ORDER = [
+    "rStyle", "rFonts", "b", "bCs", "i", "iCs", "caps", "smallCaps", "strike",
+    "dstrike", "outline", "shadow", "emboss", "imprint", "noProof", "snapToGrid",
+    "vanish", "webHidden", "color", "spacing", "w", "kern", "position", "sz",
+    "szCs", "highlight", "u", "effect", "bdr", "shd", "fitText", "vertAlign",
+    "rtl", "cs", "em", "lang", "eastAsianLayout", "specVanish", "oMath",
+    "rPrChange",
+]  # fmt: skip
+CELL_PROPERTY_ORDER = [
+    "cnfStyle", "tcW", "gridSpan", "hMerge", "vMerge", "tcBorders", "shd",
+    "noWrap", "tcMar", "textDirection", "tcFitText", "vAlign", "hideMark",
+    "headers", "cellIns", "cellDel", "cellMerge", "tcPrChange",
+]  # fmt: skip
+
+
+def clean_up_docx(input_file, output_folder, engine="xml"):
     """
     Cleans up a DOCX file by removing background colors, setting text color to black,
     and standardizing the font. Saves the cleaned DOCX to the specified output folder.
 
     :param input_file: Path to the DOCX file to clean up
     :param output_folder: Path to the folder where cleaned DOCX will be saved
+    :param engine: "xml" streams the document, header and footer parts through a
+                   SAX rewriter; "docx" uses the python-docx object model
     """
+    # Prepare the output path
+    output_file = os.path.join(output_folder, f"cleaned_{os.path.basename(input_file)}")
+
+    if engine == "xml":
+        clean_docx_xml(input_file, output_file)
+    else:
+        _clean_up_docx_object_model(input_file, output_file)
+    print(f"Cleaned document saved as: {output_file}")
+
+
+def _clean_up_docx_object_model(input_file, output_file):
+    from docx import Document
+    from docx.shared import RGBColor
+    from docx.oxml.ns import nsdecls
+    from docx.oxml import parse_xml
+
     # Load the DOCX document
     doc = Document(input_file)
 
@@ -33,12 +73,184 @@ def clean_up_docx(input_file, output_folder):
                     parse_xml(r'<w:shd {} w:fill="FFFFFF"/>'.format(nsdecls("w")))
                 )
 
-    # Prepare the output path
-    output_file = os.path.join(output_folder, f"cleaned_{os.path.basename(input_file)}")
-
     # Save the cleaned DOCX document
     doc.save(output_file)
-    print(f"Cleaned document saved as: {output_file}")
+
+
+def clean_docx_xml(source, destination):
+    """
+    Cleans a DOCX by rewriting its XML parts inside the zip with a streaming
+    SAX parser, without building an object model. Runs get black text, Arial
+    and no highlight or explicit size; table cells get a white fill that
+    replaces any existing shading instead of being appended to it.
+
+    :param source: Path or binary file object of the DOCX to clean
+    :param destination: Path or binary file object to write the cleaned DOCX to
+    """
+    with zipfile.ZipFile(source) as zin, zipfile.ZipFile(
+        destination, "w", zipfile.ZIP_DEFLATED
+    ) as zout:
+        for item in zin.infolist():
+            info = zipfile.ZipInfo(item.filename, item.date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = item.external_attr
+            with zin.open(item) as src, zout.open(info, "w") as dst:
+                if CLEANED_PARTS.match(item.filename):
+                    parser = make_parser()
+                    parser.setContentHandler(_DocxCleanHandler(dst))
+                    parser.parse(src)
+                else:
+                    shutil.copyfileobj(src, dst)
+
+
+def _insert_ordered(children, node, order):
+    """Inserts node before the first sibling that the schema puts after it."""
+    position = order.index(node[0].split(":")[-1])
+    for index, child in enumerate(children):
+        if isinstance(child, list):
+            name = child[0].split(":")[-1]
+            if name not in order or order.index(name) > position:
+                children.insert(index, node)
+                return
+    children.append(node)
+
+
+class _DocxCleanHandler(ContentHandler):
+    """
+    SAX filter that copies a WordprocessingML part to an XMLGenerator while
+    rewriting run (w:r/w:rPr) and table cell (w:tc/w:tcPr) properties.
+
+    Property elements are small, so each one is buffered as a
+    [name, attrs, children] tree, rewritten and then written out. Runs and cells
+    without a property element get one synthesized before their first child.
+    """
+
+    def __init__(self, out):
+        super().__init__()
+        self._out = XMLGenerator(out, encoding="utf-8", short_empty_elements=True)
+        self._w = "w"
+        self._stack = []
+        self._capture = None  # Stack of open nodes while buffering properties
+        self._pending = None  # Property element expected as next child
+
+    def _q(self, name):
+        return f"{self._w}:{name}"
+
+    def startDocument(self):
+        self._out.startDocument()
+
+    def endDocument(self):
+        self._out.endDocument()
+
+    def processingInstruction(self, target, data):
+        self._out.processingInstruction(target, data)
+
+    def startElement(self, name, attrs):
+        attrs = dict(attrs)
+        if not self._stack:
+            # Use whatever prefix this part binds to the WordprocessingML namespace
+            for key, value in attrs.items():
+                if key.startswith("xmlns:") and value == W_NAMESPACE:
+                    self._w = key[len("xmlns:") :]
+
+        if self._capture is not None:
+            node = [name, attrs, []]
+            self._capture[-1][2].append(node)
+            self._capture.append(node)
+            self._stack.append(name)
+            return
+
+        if self._pending is not None:
+            property_name = self._pending
+            self._pending = None
+            if name == property_name:
+                self._capture = [[name, attrs, []]]
+                self._stack.append(name)
+                return
+            self._emit(self._rewrite([property_name, {}, []]))
+
+        if name == self._q("r"):
+            self._pending = self._q("rPr")
+        elif name == self._q("tc"):
+            self._pending = self._q("tcPr")
+
+        self._stack.append(name)
+        self._out.startElement(name, attrs)
+
+    def endElement(self, name):
+        self._stack.pop()
+        if self._capture is not None:
+            node = self._capture.pop()
+            if not self._capture:
+                self._capture = None
+                self._emit(self._rewrite(node))
+            return
+
+        # An empty run or cell needs no properties
+        self._pending = None
+        self._out.endElement(name)
+
+    def characters(self, content):
+        if self._capture is not None:
+            self._capture[-1][2].append(content)
+        else:
+            self._out.characters(content)
+
+    def ignorableWhitespace(self, content):
+        self.characters(content)
+
+    def _emit(self, node):
+        name, attrs, children = node
+        self._out.startElement(name, attrs)
+        for child in children:
+            if isinstance(child, list):
+                self._emit(child)
+            else:
+                self._out.characters(child)
+        self._out.endElement(name)
+
+    def _rewrite(self, node):
+        name, attrs, children = node
+        if name == self._q("rPr"):
+            return [name, attrs, self._rewrite_run_properties(children)]
+        return [name, attrs, self._rewrite_cell_properties(children)]
+
+    def _rewrite_run_properties(self, children):
+        w = self._w
+        removed = {self._q(name) for name in ("highlight", "color", "sz")}
+        fonts = {}
+        kept = []
+        for child in children:
+            if not isinstance(child, list):
+                continue  # Formatting whitespace
+            if child[0] == self._q("rFonts"):
+                fonts = child[1]
+            elif child[0] not in removed:
+                kept.append(child)
+
+        # Theme fonts take precedence over explicit ones, so drop them
+        fonts = {
+            key: value
+            for key, value in fonts.items()
+            if key not in (f"{w}:asciiTheme", f"{w}:hAnsiTheme")
+        }
+        fonts.update({f"{w}:ascii": "Arial", f"{w}:hAnsi": "Arial"})
+        _insert_ordered(kept, [self._q("rFonts"), fonts, []], RUN_PROPERTY_ORDER)
+        _insert_ordered(
+            kept, [self._q("color"), {f"{w}:val": "000000"}, []], RUN_PROPERTY_ORDER
+        )
+        return kept
+
+    def _rewrite_cell_properties(self, children):
+        w = self._w
+        kept = [
+            child
+            for child in children
+            if isinstance(child, list) and child[0] != self._q("shd")
+        ]
+        shading = {f"{w}:val": "clear", f"{w}:color": "auto", f"{w}:fill": "FFFFFF"}
+        _insert_ordered(kept, [self._q("shd"), shading, []], CELL_PROPERTY_ORDER)
+        return kept
 
 
 if __name__ == "__main__":
@@ -1,35 +1,178 @@
-from PIL import Image
-import pyheif
+import os
+from concurrent.futures import ThreadPoolExecutor
 
+from PIL import Image, ImageChops
 
-def heic_to_jpg(input_path: str, output_path: str):
-    heif_file = pyheif.read(input_path)
-    image = Image.frombytes(
-        heif_file.mode,
-        heif_file.size,
-        heif_file.data,
+HEIC_EXTENSIONS = (".heic", ".heif")
+
+
+def _wrap_heif(heif_image):
+    # frombuffer wraps libheif's pixel buffer instead of copying it first;
+    # Pillow shares the memory outright for RGBA and unpacks RGB only once
+    image = Image.frombuffer(
+        heif_image.mode,
+        heif_image.size,
+        heif_image.data,
         "raw",
-        heif_file.mode,
-        heif_file.stride,
+        heif_image.mode,
+        heif_image.stride,
+        1,
+    )
+    image.heif_source = heif_image  # Keep the shared buffer's owner alive
+    return image
+
+
+def read_heic(input_path: str):
+    import pyheif  # Only HEIC conversions need libheif
+
+    return _wrap_heif(pyheif.read(input_path))
+
+
+def read_heic_images(input_path: str):
+    """Decodes every top-level image of a HEIC container, primary image first."""
+    import pyheif
+
+    container = pyheif.open_container(input_path)
+    top_level_images = sorted(
+        container.top_level_images, key=lambda top_level: not top_level.is_primary
     )
-    image.save(output_path, "JPEG", quality=100)  # Set quality to maximum
+    return [_wrap_heif(top_level.image.load()) for top_level in top_level_images]
+
+
+def open_image(input_path: str):
+    """Decodes any supported input (HEIC included) into a loaded PIL image."""
+    if input_path.lower().endswith(HEIC_EXTENSIONS):
+        return read_heic(input_path)
+    image = Image.open(input_path)
+    image.load()
+    return image
+
 
+def save_jpg(image, output_path: str, quality: int = 100):
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(output_path, "JPEG", quality=quality)  # Maximum quality by default
 
-def jpg_to_png(input_path: str, output_path: str, transparent_color=None):
-    image = Image.open(input_path).convert("RGBA")
+
+def save_png(image, output_path: str, transparent_color=None, tolerance: int = 0):
+    image = image.convert("RGBA")
     if transparent_color:
-        datas = image.getdata()
-        new_data = []
-        for item in datas:
-            # Make specified color transparent
-            if item[:3] == transparent_color:
-                new_data.append((255, 255, 255, 0))  # to transparent
-            else:
-                new_data.append(item)
-        image.putdata(new_data)
+        # Make every pixel within `tolerance` of the specified color transparent
+        mask = color_key_mask(image, transparent_color, tolerance)
+        image.paste((255, 255, 255, 0), mask=mask)  # to transparent
     image.save(output_path, "PNG")
 
 
-def png_to_jpg(input_path: str, output_path: str):
-    image = Image.open(input_path).convert("RGB")
-    image.save(output_path, "JPEG", quality=100)  # Set quality to maximum
+def heic_to_jpg(input_path: str, output_path: str, quality: int = 100):
+    save_jpg(read_heic(input_path), output_path, quality)
+
+
+def jpg_to_png(
+    input_path: str, output_path: str, transparent_color=None, tolerance: int = 0
+):
+    save_png(Image.open(input_path), output_path, transparent_color, tolerance)
+
+
+def color_key_mask(image, color, tolerance: int = 0):
+    """
+    Builds an "L" mask that is 255 where every RGB channel of the image lies
+    within `tolerance` of `color` and 0 elsewhere. Works band by band with
+    lookup tables, so memory stays at a few single-channel buffers instead of
+    a Python tuple per pixel.
+    """
+    mask = None
+    for band, value in enumerate(color[:3]):
+        low, high = value - tolerance, value + tolerance
+        lut = [255 if low <= level <= high else 0 for level in range(256)]
+        band_mask = image.getchannel(band).point(lut)
+        mask = band_mask if mask is None else ImageChops.multiply(mask, band_mask)
+    return mask
+
+
+def png_to_jpg(input_path: str, output_path: str, quality: int = 100):
+    save_jpg(Image.open(input_path), output_path, quality)
+
+
+# Encode step of each conversion, applied to an already decoded image
+SAVERS = {
+    "heic_to_jpg": save_jpg,
+    "jpg_to_png": save_png,
+    "png_to_jpg": save_jpg,
+}
+
+
+def fan_out(input_path: str, targets):
+    """
+    Decodes the input once and saves it for every target conversion.
+
+    :param targets: (conversion_type, output_path, options) tuples
+    """
+    image = open_image(input_path)
+    for conversion_type, output_path, options in targets:
+        SAVERS[conversion_type](image, output_path, **options)
+
+
+def _decode_for_ingest(input_path: str, size, all_images: bool):
+    if input_path.lower().endswith(HEIC_EXTENSIONS):
+        images = read_heic_images(input_path) if all_images else [read_heic(input_path)]
+    else:
+        image = Image.open(input_path)
+        if size:
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when that is enough
+            image.draft("RGB", size)
+        images = [image]
+
+    if size:
+        for image in images:
+            # reducing_gap does a fast integer reduce before the final resample
+            image.thumbnail(size, Image.LANCZOS, reducing_gap=2.0)
+    return images
+
+
+def ingest_images(
+    input_paths,
+    output_folder: str,
+    size=None,
+    quality: int = 100,
+    all_images: bool = False,
+    max_workers: int = None,
+):
+    """
+    Converts a batch of HEIC/JPEG photos to JPEG with a thread pool (libheif,
+    libjpeg and Pillow's resampling release the GIL).
+
+    :param size: Optional (width, height) bounding box; JPEGs are then decoded
+                 at reduced resolution and every image is downscaled to fit
+    :param all_images: Also write the secondary images of HEIC containers, as
+                       <name>_1.jpg, <name>_2.jpg, ...
+    :return: List of per-file dicts with input_path, outputs, success and
+             error, in input order
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    def ingest(input_path):
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        try:
+            outputs = []
+            images = _decode_for_ingest(input_path, size, all_images)
+            for index, image in enumerate(images):
+                name = base_name if index == 0 else f"{base_name}_{index}"
+                output_path = os.path.join(output_folder, f"{name}.jpg")
+                save_jpg(image, output_path, quality)
+                outputs.append(output_path)
+        except Exception as e:
+            return {
+                "input_path": input_path,
+                "outputs": [],
+                "success": False,
+                "error": f"{type(e).__name__}: {e}",
+            }
+        return {
+            "input_path": input_path,
+            "outputs": outputs,
+            "success": True,
+            "error": None,
+        }
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(ingest, input_paths))
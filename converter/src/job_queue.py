@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import time
+
+
+class JobQueue:
+    """
+    Persistent conversion job queue backed by SQLite. A job is identified by
+    the input path, its size and mtime and the conversion type, so a file that
+    was already converted is not queued again after a restart, while a file
+    that was replaced with new content is.
+    """
+
+    def __init__(self, db_path: str, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(db_path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                input_path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                conversion_type TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (input_path, size, mtime_ns, conversion_type)
+            )
+            """
+        )
+
+    def recover(self):
+        """Requeues jobs that were running when the previous process stopped."""
+        self._db.execute(
+            "UPDATE jobs SET status = 'pending', updated_at = ? "
+            "WHERE status = 'running'",
+            (time.time(),),
+        )
+
+    def enqueue(self, input_path: str, conversion_type: str) -> bool:
+        """
+        Adds a job unless this exact file version is already known. Paths are
+        stored absolute, so the working directory of later runs does not matter.
+        """
+        input_path = os.path.abspath(input_path)
+        stats = os.stat(input_path)
+        cursor = self._db.execute(
+            "INSERT OR IGNORE INTO jobs "
+            "(input_path, size, mtime_ns, conversion_type, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                input_path,
+                stats.st_size,
+                stats.st_mtime_ns,
+                conversion_type,
+                time.time(),
+            ),
+        )
+        return cursor.rowcount == 1
+
+    def claim(self, limit: int):
+        """Marks up to `limit` pending jobs as running and returns them."""
+        if limit <= 0:
+            return []
+        rows = self._db.execute(
+            "SELECT id, input_path, conversion_type FROM jobs "
+            "WHERE status = 'pending' ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        self._db.executemany(
+            "UPDATE jobs SET status = 'running', attempts = attempts + 1, "
+            "updated_at = ? WHERE id = ?",
+            [(time.time(), row[0]) for row in rows],
+        )
+        return [
+            {"id": job_id, "input_path": input_path, "conversion_type": conversion_type}
+            for job_id, input_path, conversion_type in rows
+        ]
+
+    def requeue(self, job_id: int):
+        """Returns a claimed job that never started to the queue."""
+        self._db.execute(
+            "UPDATE jobs SET status = 'pending', attempts = attempts - 1, "
+            "updated_at = ? WHERE id = ? AND status = 'running'",
+            (time.time(), job_id),
+        )
+
+    def finish(self, job_id: int, error: str = None):
+        """Marks a job done, or requeues it after a failure until max_attempts."""
+        if error is None:
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', error = NULL, updated_at = ? "
+                "WHERE id = ?",
+                (time.time(), job_id),
+            )
+            return
+        self._db.execute(
+            "UPDATE jobs SET error = ?, updated_at = ?, status = CASE "
+            "WHEN attempts >= ? THEN 'failed' ELSE 'pending' END WHERE id = ?",
+            (error, time.time(), self.max_attempts, job_id),
+        )
+
+    def counts(self) -> dict:
+        return dict(
+            self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        )
+
+    def close(self):
+        self._db.close()
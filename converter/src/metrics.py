@@ -0,0 +1,109 @@
+import json
+import os
+import resource
+import time
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets this process' peak RSS (VmHWM) so the next reading covers only the
+    work done from now on. Linux-only; returns False where unsupported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_kb() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # Lifetime peak; ru_maxrss is in KB on Linux and bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def children_lifetime_peak_rss_kb() -> int:
+    """
+    Peak RSS of the largest child (e.g. ffmpeg) this process has waited for
+    since it started, not just during the current conversion: the kernel
+    keeps no per-child history and the value cannot be reset.
+    """
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+def _size(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class ConversionMetrics:
+    """
+    Context manager that measures one conversion and builds its metrics record:
+    wall and CPU time (including child processes such as ffmpeg), peak RSS,
+    bytes in/out, backend, strategy and cache hit/miss.
+
+    peak_rss_kb covers this conversion only where VmHWM can be reset (Linux).
+    children_lifetime_peak_rss_kb is the largest child of the whole process
+    so far, so in a long-lived worker it may come from an earlier conversion.
+    """
+
+    def __init__(
+        self, conversion_type: str, input_path: str, output_path: str, backend: str
+    ):
+        self.record = {
+            "conversion_type": conversion_type,
+            "input_path": input_path,
+            "output_path": output_path,
+            "backend": backend,
+            "strategy": None,
+            "cache_hit": False,
+        }
+
+    def __enter__(self):
+        reset_peak_rss()
+        self._start_times = os.times()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall_time = time.perf_counter() - self._start
+        end_times = os.times()
+        # user + system time of this process and its waited-for children
+        cpu_time = sum(end_times[:4]) - sum(self._start_times[:4])
+        self.record.update(
+            {
+                "timestamp": time.time(),
+                "success": exc is None,
+                "error": None if exc is None else f"{exc_type.__name__}: {exc}",
+                "wall_time_s": round(wall_time, 6),
+                "cpu_time_s": round(cpu_time, 6),
+                "peak_rss_kb": peak_rss_kb(),
+                "children_lifetime_peak_rss_kb": children_lifetime_peak_rss_kb(),
+                "bytes_in": _size(self.record["input_path"]),
+                "bytes_out": _size(self.record["output_path"]),
+            }
+        )
+        return False
+
+
+def emit_metrics(record: dict, sink_path: str = None, callback=None):
+    """
+    Appends the record as one JSON line to sink_path and/or passes it to
+    callback. Lines are written with a single append, so several worker
+    processes can share one sink.
+    """
+    if sink_path:
+        line = json.dumps(record, default=str) + "\n"
+        fd = os.open(sink_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+    if callback is not None:
+        callback(record)
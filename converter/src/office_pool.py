@@ -0,0 +1,301 @@
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONVERT_TIMEOUT = 300.0
+DEFAULT_HEALTH_TIMEOUT = 10.0
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _properties(**values):
+    from com.sun.star.beans import PropertyValue
+
+    properties = []
+    for name, value in values.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+class OfficeWorker:
+    """
+    A long-lived headless LibreOffice process driven over UNO. Each worker has
+    its own user profile, so several can run side by side.
+
+    Conversions and health checks that do not return within their timeout
+    kill the office process; the worker is started again before its next job.
+    """
+
+    def __init__(
+        self,
+        soffice: str = None,
+        startup_timeout: float = 30.0,
+        convert_timeout: float = DEFAULT_CONVERT_TIMEOUT,
+        health_timeout: float = DEFAULT_HEALTH_TIMEOUT,
+    ):
+        self.soffice = soffice or shutil.which("soffice") or "libreoffice"
+        self.startup_timeout = startup_timeout
+        self.convert_timeout = convert_timeout
+        self.health_timeout = health_timeout
+        self.process = None
+        self.profile_dir = None
+        self._desktop = None
+
+    def start(self):
+        import uno
+        from com.sun.star.connection import NoConnectException
+
+        port = _free_port()
+        connection = (
+            f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        )
+        self.profile_dir = tempfile.mkdtemp(prefix="office_worker_")
+        self.process = subprocess.Popen(
+            [
+                self.soffice,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                "--nolockcheck",
+                f"-env:UserInstallation={uno.systemPathToFileUrl(self.profile_dir)}",
+                f"--accept={connection}",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{connection}")
+                break
+            except NoConnectException:
+                if self.process.poll() is not None:
+                    raise RuntimeError("LibreOffice exited during startup")
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError("Timed out waiting for LibreOffice to start")
+                time.sleep(0.25)
+
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+
+    def _call(self, timeout: float, function, *args):
+        """
+        Runs a UNO call in a helper thread, as the bridge itself never times
+        out. A hung office is killed, which also releases the helper thread.
+        """
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = function(*args)
+            except BaseException as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if thread.is_alive():
+            self.kill()
+            raise TimeoutError(f"LibreOffice did not respond within {timeout}s")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome.get("result")
+
+    def is_healthy(self) -> bool:
+        if self.process is None or self.process.poll() is not None:
+            return False
+        try:
+            # Any round trip over the bridge proves the office is responsive
+            self._call(self.health_timeout, self._desktop.getComponents)
+            return True
+        except Exception:
+            return False
+
+    def _convert(self, input_path: str, output_path: str):
+        import uno
+
+        document = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            "_blank",
+            0,
+            _properties(Hidden=True, ReadOnly=True),
+        )
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(output_path)),
+                _properties(FilterName="writer_pdf_Export"),
+            )
+        finally:
+            document.close(True)
+
+    def convert(self, input_path: str, output_path: str):
+        """
+        :raises TimeoutError: If the conversion takes longer than
+                              convert_timeout (the office is killed)
+        """
+        self._call(self.convert_timeout, self._convert, input_path, output_path)
+
+    def stop(self):
+        desktop, self._desktop = self._desktop, None
+        if desktop is not None:
+            try:
+                # A hung office does not answer terminate either; _call kills it
+                self._call(self.health_timeout, desktop.terminate)
+            except Exception:
+                pass  # Already gone, or killed
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.profile_dir is not None:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def kill(self):
+        """Stops a hung office without asking it to terminate first."""
+        self._desktop = None
+        if self.process is not None:
+            self.process.kill()
+        self.stop()
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+class OfficePool:
+    """
+    A pool of OfficeWorker processes. The LibreOffice startup cost is paid
+    once per worker and shared by every conversion submitted to the pool.
+    Workers are health-checked before each job and restarted after a crash or
+    a timeout. A closed pool cannot be used again.
+
+    :param worker_options: Passed to every OfficeWorker, e.g. convert_timeout
+    """
+
+    def __init__(self, size: int = 1, soffice: str = None, **worker_options):
+        self.size = 0
+        self._soffice = soffice
+        self._worker_options = worker_options
+        self._workers = []
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.grow(size)
+
+    def _check_open(self):
+        if self._closed:
+            raise RuntimeError("The office pool is closed")
+
+    def grow(self, size: int):
+        """Starts more workers until the pool has at least size of them."""
+        with self._lock:
+            self._check_open()
+            while self.size < size:
+                worker = OfficeWorker(self._soffice, **self._worker_options)
+                worker.start()
+                self._workers.append(worker)
+                self._idle.put(worker)
+                self.size += 1
+
+    def convert(self, input_path: str, output_path: str, retries: int = 1):
+        """
+        :raises RuntimeError: If the pool is closed, also while waiting for a
+                              worker
+        """
+        self._check_open()
+        worker = self._idle.get()
+        if worker is None:
+            # close() wakes every waiting caller with this sentinel in turn
+            self._idle.put(None)
+            self._check_open()
+        try:
+            if not worker.is_healthy():
+                worker.restart()
+            for attempt in range(retries + 1):
+                try:
+                    worker.convert(input_path, output_path)
+                    return
+                except Exception:
+                    # A healthy worker means the document itself is the problem
+                    if worker.is_healthy() or attempt == retries:
+                        raise
+                    worker.restart()
+        finally:
+            self._idle.put(worker)
+
+    def convert_many(self, jobs):
+        """
+        Converts (input_path, output_path) pairs concurrently across the pool.
+
+        :return: List of per-job error messages (None on success), in job order
+        """
+
+        def run(job):
+            try:
+                self.convert(*job)
+                return None
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+
+        self._check_open()
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            return list(executor.map(run, jobs))
+
+    def close(self, timeout: float = None):
+        """
+        Stops every worker. Workers still busy with a conversion are waited
+        for up to timeout seconds (indefinitely if None) and then killed.
+        """
+        self._closed = True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        stopped = []
+        while len(stopped) < len(self._workers):
+            remaining = None
+            if deadline is not None:
+                remaining = max(0.0, deadline - time.monotonic())
+            try:
+                worker = self._idle.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if worker is None:
+                continue  # Closed twice
+            worker.stop()
+            stopped.append(worker)
+        for worker in self._workers:
+            if worker not in stopped:
+                worker.kill()
+        self._workers = []
+        self.size = 0
+        self._idle.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
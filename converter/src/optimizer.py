@@ -0,0 +1,182 @@
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+# pngquant exit codes that mean "kept the original" rather than failure
+PNGQUANT_SKIPPED = {98, 99}  # Result would be larger / quality not reachable
+MIN_PNG_QUALITY = 10  # Lowest upper bound tried when shrinking to max_bytes
+
+
+def _replace_if_smaller(path: str, candidate: str) -> bool:
+    # os.replace swaps the file, so hardlinked cache entries are left intact
+    if os.path.getsize(candidate) < os.path.getsize(path):
+        os.replace(candidate, path)
+        return True
+    os.remove(candidate)
+    return False
+
+
+def _temp_path(path: str) -> str:
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".opt-", suffix=os.path.splitext(path)[1], dir=os.path.dirname(path)
+    )
+    os.close(fd)
+    return tmp_path
+
+
+def _remove_leftovers(temp_paths):
+    for tmp_path in temp_paths:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def optimize_png(path: str, quality: int = 90, max_bytes: int = None):
+    """
+    Quantizes a PNG in place with pngquant. With max_bytes, lower quality
+    ranges are tried until the file fits the budget or MIN_PNG_QUALITY is
+    reached. The original is only replaced by a smaller, complete result.
+    """
+    floor = max(0, quality - 25)
+    while True:
+        tmp_path = _temp_path(path)
+        try:
+            result = subprocess.run(
+                [
+                    "pngquant",
+                    "--force",
+                    "--skip-if-larger",
+                    "--strip",
+                    f"--quality={floor}-{quality}",
+                    "--output",
+                    tmp_path,
+                    path,
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if result.returncode == 0:
+                _replace_if_smaller(path, tmp_path)
+            elif result.returncode not in PNGQUANT_SKIPPED:
+                raise RuntimeError(f"pngquant failed: {result.stderr.strip()}")
+        finally:
+            _remove_leftovers([tmp_path])
+
+        if (
+            not max_bytes
+            or os.path.getsize(path) <= max_bytes
+            or quality <= MIN_PNG_QUALITY
+        ):
+            return
+        quality = max(MIN_PNG_QUALITY, quality - 20)
+        floor = min(max(0, floor - 20), quality)
+
+
+def optimize_jpg(path: str, quality: int = 85, max_bytes: int = None):
+    """
+    Re-encodes a JPEG in place as an optimized progressive JPEG, keeping its
+    EXIF data and ICC profile. With max_bytes, the highest quality (down to
+    30) that fits the budget is chosen by binary search. The original is only
+    replaced by a smaller, complete result.
+    """
+    with Image.open(path) as image:
+        image.load()
+    metadata = {
+        key: image.info[key] for key in ("exif", "icc_profile") if image.info.get(key)
+    }
+    temp_paths = []
+
+    def encode(q):
+        tmp_path = _temp_path(path)
+        temp_paths.append(tmp_path)
+        image.save(
+            tmp_path, "JPEG", quality=q, optimize=True, progressive=True, **metadata
+        )
+        return tmp_path
+
+    try:
+        best = encode(quality)
+        if max_bytes and os.path.getsize(best) > max_bytes:
+            low, high = 30, quality - 1
+            while low <= high:
+                middle = (low + high) // 2
+                candidate = encode(middle)
+                if os.path.getsize(candidate) <= max_bytes:
+                    os.remove(best)
+                    best, low = candidate, middle + 1
+                else:
+                    # Keep the smallest attempt in case nothing fits
+                    if os.path.getsize(candidate) < os.path.getsize(best):
+                        os.remove(best)
+                        best = candidate
+                    else:
+                        os.remove(candidate)
+                    high = middle - 1
+        _replace_if_smaller(path, best)
+    finally:
+        # Whatever was not moved into place, including a failed attempt
+        _remove_leftovers(temp_paths)
+
+
+def optimize_file(path: str, quality: int = None, max_bytes: int = None):
+    """
+    Optimizes one PNG or JPEG in place.
+
+    :return: Dict with path, success, error, original_bytes, optimized_bytes
+             and bytes_saved
+    """
+    original_bytes = os.path.getsize(path)
+    options = {"max_bytes": max_bytes}
+    if quality is not None:
+        options["quality"] = quality
+    try:
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".png":
+            optimize_png(path, **options)
+        elif extension in (".jpg", ".jpeg"):
+            optimize_jpg(path, **options)
+        else:
+            raise ValueError(f"Cannot optimize {extension} files.")
+    except Exception as e:
+        return {
+            "path": path,
+            "success": False,
+            "error": f"{type(e).__name__}: {e}",
+            "original_bytes": original_bytes,
+            "optimized_bytes": original_bytes,
+            "bytes_saved": 0,
+        }
+
+    optimized_bytes = os.path.getsize(path)
+    return {
+        "path": path,
+        "success": True,
+        "error": None,
+        "original_bytes": original_bytes,
+        "optimized_bytes": optimized_bytes,
+        "bytes_saved": original_bytes - optimized_bytes,
+    }
+
+
+def optimize_files(
+    paths, quality: int = None, max_bytes: int = None, max_workers: int = None
+):
+    """
+    Optimizes many PNG/JPEG files in place using a pool of worker processes.
+
+    :param quality: Target quality (0-100); defaults to 90 for PNG, 85 for JPEG
+    :param max_bytes: Optional per-file size budget
+    :return: List of per-file result dicts from optimize_file, in input order
+    """
+    paths = list(paths)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                optimize_file,
+                paths,
+                [quality] * len(paths),
+                [max_bytes] * len(paths),
+            )
+        )
@@ -1,27 +1,136 @@
+import atexit
+import io
 import os
 import platform
+import subprocess
+import sys
+import tempfile
+import threading
 from subprocess import run
 
+from converter.src.docx_cleaner import clean_docx_xml
+
+output_folder = "output"
+
+_office_pool = None
+OFFICE_CLOSE_TIMEOUT = 10.0  # Seconds to let busy workers finish at exit
+_office_pool_lock = threading.Lock()
+
+# pdf2docx's multi-processing parse exchanges pages-<n>.json files through the
+# working directory, so it runs in a child process started in its own folder
+_MULTI_PROCESS_PARSE = """
+import sys
 from pdf2docx import Converter
 
-from converter.src.docx_cleaner import clean_up_docx
+input_path, output_path, start, end, workers = sys.argv[1:]
+cv = Converter(input_path)
+try:
+    cv.convert(
+        output_path,
+        start=int(start),
+        end=int(end) if end else None,
+        multi_processing=True,
+        cpu_count=int(workers),
+    )
+finally:
+    cv.close()
+"""
 
-output_folder = "output"
 
+def _parse_in_child(input_path, start, end, workers, work_dir) -> str:
+    """Runs the multi-process parse with work_dir as its working directory."""
+    raw_path = os.path.join(work_dir, "raw.docx")
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _MULTI_PROCESS_PARSE,
+            os.path.abspath(input_path),
+            raw_path,
+            str(start),
+            "" if end is None else str(end),
+            str(workers),
+        ],
+        cwd=work_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        message = result.stderr.strip().splitlines()
+        raise RuntimeError(
+            f"pdf2docx failed: {message[-1] if message else result.returncode}"
+        )
+    return raw_path
+
+
+def get_office_pool(size: int = 1):
+    """
+    Returns the process-wide LibreOffice pool used on Linux, starting it on
+    first use. A later call asking for more workers grows the pool; it never
+    shrinks.
+    """
+    global _office_pool
+    with _office_pool_lock:
+        if _office_pool is None:
+            from converter.src.office_pool import OfficePool
+
+            _office_pool = OfficePool(size=size)
+            # Do not hang the interpreter's exit on a conversion still running
+            atexit.register(_office_pool.close, timeout=OFFICE_CLOSE_TIMEOUT)
+        else:
+            _office_pool.grow(size)
+    return _office_pool
+
+
+def pdf_to_docx(
+    input_path: str,
+    output_path: str,
+    start: int = 0,
+    end: int = None,
+    pages: list = None,
+    workers: int = 1,
+):
+    """
+    Converts a PDF to a cleaned-up DOCX. In-process, the raw pdf2docx output
+    is kept in memory and cleaned on the way to disk, so the DOCX is written
+    only once.
 
-def pdf_to_docx(input_path: str, output_path: str):
+    :param start: First page to convert (zero-based)
+    :param end: Page to stop before (None converts to the last page)
+    :param pages: Explicit list of zero-based page numbers, instead of start/end
+    :param workers: With more than one worker, page ranges are parsed in
+                    separate processes (started from a child process with a
+                    working directory of its own) and merged into one
+                    document. Not combinable with pages, which always
+                    converts in-process.
+    """
     # Ensure output file has a single .docx extension
     if not output_path.endswith(".docx"):
         output_path += ".docx"
 
+    if workers > 1 and pages is None:
+        # This process's working directory is left alone, so other threads
+        # can keep using relative paths
+        with tempfile.TemporaryDirectory(prefix="pdf_to_docx_") as work_dir:
+            raw_path = _parse_in_child(input_path, start, end, workers, work_dir)
+            # Clean up the formatting while writing the final DOCX file
+            clean_docx_xml(raw_path, output_path)
+        return
+
+    # pdf2docx pulls in PyMuPDF and python-docx, so only load it when needed
+    from pdf2docx import Converter
+
     # Convert PDF to DOCX
+    docx_buffer = io.BytesIO()
     cv = Converter(input_path)
-    cv.convert(output_path)
-    cv.close()
+    try:
+        cv.convert(docx_buffer, start=start, end=end, pages=pages)
+    finally:
+        cv.close()
 
-    # Clean up the formatting in the generated DOCX file
-    output_folder = os.path.dirname(output_path)
-    clean_up_docx(output_path, output_folder)
+    # Clean up the formatting while writing the final DOCX file
+    docx_buffer.seek(0)
+    clean_docx_xml(docx_buffer, output_path)
 
 
 def docx_to_pdf(input_path: str, output_path: str):
@@ -58,3 +167,19 @@ def docx_to_pdf(input_path: str, output_path: str):
             print(f"Conversion to PDF completed: {output_path}")
         else:
             print("Error: PDF output not found after conversion.")
+    elif platform.system() == "Linux":
+        # Reuse a running headless LibreOffice instead of cold-starting soffice
+        get_office_pool().convert(input_path, output_path)
+        print(f"Conversion to PDF completed: {output_path}")
+
+
+def batch_docx_to_pdf(jobs, workers: int = None):
+    """
+    Converts many (input_path, output_path) pairs on Linux through a pool of
+    headless LibreOffice workers, so startup is paid once per worker.
+
+    :return: List of per-job error messages (None on success), in job order
+    """
+    jobs = list(jobs)
+    workers = workers or min(len(jobs), os.cpu_count()) or 1
+    return get_office_pool(size=workers).convert_many(jobs)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+EVICT_TO = 0.9  # Eviction frees space down to this share of max_bytes
+
+
+class ResultCache:
+    """
+    On-disk cache of conversion outputs keyed by the input content hash, the
+    conversion type and the conversion options. Entries are evicted least
+    recently used first once the cache grows beyond max_bytes.
+
+    The cache size is scanned once and then tracked as entries are stored, so
+    the directory is only walked again when the tracked size crosses
+    max_bytes. Every eviction rescans, which also picks up entries other
+    processes stored meanwhile.
+
+    Hits are hardlinked into place when possible, so outputs served from the
+    cache must be replaced (not modified in place) by later processing steps.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 5 * 1024**3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._size = None  # Bytes in the cache, scanned on first store
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, input_path: str, conversion_type: str, options: dict) -> str:
+        digest = hashlib.sha256()
+        with open(input_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        # Options such as transparent_color are part of the key; tuples and
+        # lists serialize identically so (255, 255, 255) == [255, 255, 255]
+        digest.update(conversion_type.encode())
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, output_path: str) -> str:
+        extension = os.path.splitext(output_path)[1]
+        return os.path.join(self.cache_dir, key[:2], f"{key}{extension}")
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Places a cached result at output_path. Returns False on a miss."""
+        entry = self._entry_path(key, output_path)
+        if not os.path.exists(entry):
+            return False
+
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            try:
+                os.link(entry, output_path)
+            except OSError:
+                # Different filesystem or no hardlink support (or the entry is
+                # gone, which the copy reports as well)
+                shutil.copy2(entry, output_path)
+            # Mark the entry as recently used
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted (e.g. by another worker) since the check above
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            return False
+        return True
+
+    def store(self, key: str, output_path: str):
+        entry = self._entry_path(key, output_path)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        # Copy to a temporary file first so concurrent workers never see a
+        # partially written entry
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(entry))
+        os.close(fd)
+        try:
+            shutil.copyfile(output_path, tmp_path)
+            added = os.path.getsize(tmp_path)
+            if os.path.exists(entry):
+                added -= os.path.getsize(entry)
+            os.replace(tmp_path, entry)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        if self._size is None:
+            self._size = self._scan()[1]
+        else:
+            self._size += added
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _scan(self):
+        """Returns the (mtime, size, path) of every entry and their total size."""
+        entries = []
+        total_size = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.startswith(".tmp-"):
+                    continue  # Entry still being written
+                path = os.path.join(root, filename)
+                try:
+                    stats = os.stat(path)
+                except FileNotFoundError:
+                    continue  # Evicted by another worker
+                entries.append((stats.st_mtime, stats.st_size, path))
+                total_size += stats.st_size
+        return entries, total_size
+
+    def evict(self):
+        """
+        Removes least recently used entries until the cache fits EVICT_TO of
+        max_bytes, leaving room for a few stores before the next eviction.
+        """
+        entries, total_size = self._scan()
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        self._size = total_size
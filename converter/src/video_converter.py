@@ -1,31 +1,517 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
 import ffmpeg
 
 
-def mov_to_mp4(input_path: str, output_path: str):
-    ffmpeg.input(input_path).output(
-        output_path, vcodec="libx264", preset="slow", crf=18, acodec="aac", threads=1
-    ).run()
+# Codecs that can be stream-copied into each container without re-encoding
+MP4_VIDEO_CODECS = {"h264", "hevc", "mpeg4", "av1"}
+MP4_AUDIO_CODECS = {"aac", "mp3", "alac", "ac3", "eac3"}
+MOV_VIDEO_CODECS = MP4_VIDEO_CODECS | {"prores", "mjpeg"}
+MOV_AUDIO_CODECS = MP4_AUDIO_CODECS | {"pcm_s16le", "pcm_s24le"}
+
+# (video, audio) encoder settings used when re-encoding
+ENCODER_SETTINGS = {
+    "mov_to_mp4": (
+        {"vcodec": "libx264", "preset": "slow", "crf": 18},
+        {"acodec": "aac"},
+    ),
+    "mp4_to_mov": ({"vcodec": "prores", "qscale": 0}, {}),
+    "gif_to_video": ({"vcodec": "libx264", "preset": "slow", "crf": 18}, {}),
+    "live_photo_to_video": ({"vcodec": "libx264"}, {}),
+}
+
+# Strategies reported by the GIF conversions
+GIF = "gif"
+GIF_OVER_TARGET = "gif_over_target_size"  # Kept, but larger than target_size
+
+
+def _probe_streams(input_path: str):
+    """Returns the probed video streams (without cover art) and audio streams."""
+    streams = ffmpeg.probe(input_path)["streams"]
+    video_streams = [
+        stream
+        for stream in streams
+        if stream["codec_type"] == "video"
+        # Skip embedded cover art
+        and not stream.get("disposition", {}).get("attached_pic")
+    ]
+    audio_streams = [stream for stream in streams if stream["codec_type"] == "audio"]
+    return video_streams, audio_streams
+
+
+def _can_remux(input_path: str, video_codecs_ok: set, audio_codecs_ok: set):
+    """Returns (compatible, the video stream's probe entry, audio codec names)."""
+    video_streams, audio_streams = _probe_streams(input_path)
+    audio_codecs = [stream["codec_name"] for stream in audio_streams]
+    compatible = (
+        len(video_streams) == 1
+        and video_streams[0]["codec_name"] in video_codecs_ok
+        and all(codec in audio_codecs_ok for codec in audio_codecs)
+    )
+    video_stream = video_streams[0] if video_streams else None
+    return compatible, video_stream, audio_codecs
+
+
+def _remux(
+    input_path: str,
+    output_path: str,
+    video_index: int,
+    audio_codecs: list,
+    **output_kwargs,
+):
+    # Map the probed video stream by index, so cover art (also a video stream)
+    # and iPhone timecode and metadata tracks are dropped
+    source = ffmpeg.input(input_path)
+    streams = [source[str(video_index)]] + ([source.audio] if audio_codecs else [])
+    ffmpeg.output(*streams, output_path, c="copy", **output_kwargs).run(
+        overwrite_output=True
+    )
+
+
+def _seconds(value) -> float:
+    return 0.0 if value in (None, "N/A") else float(value)
+
+
+def _video_timeline(input_path: str):
+    """
+    Reads the packets of the first video stream without decoding them.
+    Returns the file's start time and (pts, duration, keyframe) per packet in
+    presentation order, times in seconds.
+    """
+    probe = ffmpeg.probe(
+        input_path,
+        select_streams="v:0",
+        show_entries="packet=pts_time,duration_time,flags",
+    )
+    packets = sorted(
+        (
+            float(packet["pts_time"]),
+            _seconds(packet.get("duration_time")),
+            "K" in packet.get("flags", ""),
+        )
+        for packet in probe.get("packets", [])
+        if packet.get("pts_time", "N/A") != "N/A"
+    )
+    return _seconds(probe["format"].get("start_time")), packets
+
+
+def _span(packets) -> float:
+    last_pts, last_duration, _ = packets[-1]
+    return last_pts + last_duration - packets[0][0]
 
 
-def mp4_to_mov(input_path: str, output_path: str):
+def chunked_encode(
+    input_path: str,
+    output_path: str,
+    video_kwargs: dict,
+    audio_kwargs: dict = None,
+    segment_seconds: int = 60,
+    max_workers: int = None,
+    threads_per_worker: int = None,
+):
+    """
+    Encodes a long video in parallel: the video stream is split losslessly at
+    keyframes, the segments are encoded concurrently (each ffmpeg limited to
+    threads_per_worker threads) and joined with the concat demuxer without
+    re-encoding. Audio is encoded once from the original file while muxing, so
+    there are no encoder-priming gaps at the segment boundaries.
+
+    The cut points are the probed timestamps of the first keyframe after every
+    segment_seconds, and segments keep the source time base, so every source
+    frame lands in exactly one segment and the joined video lines up with the
+    original audio. The result is checked against the source afterwards.
+
+    :return: False (and does nothing) when the input is shorter than two
+             segments, True otherwise
+    :raises RuntimeError: If the output's frame count, duration or start
+                          offset differs from the source
+    """
+    start_time, packets = _video_timeline(input_path)
+    if not packets or _span(packets) < 2 * segment_seconds:
+        return False
+
+    # Cut halfway between each keyframe and the frame before it, so rounding
+    # in the printed timestamps cannot move the cut to another keyframe
+    first_pts = packets[0][0]
+    cuts = []
+    split_times = []
+    for index in range(1, len(packets)):
+        pts, _, keyframe = packets[index]
+        if keyframe and pts - first_pts >= segment_seconds * (len(cuts) + 1):
+            cuts.append(pts)
+            split_times.append((packets[index - 1][0] + pts) / 2)
+    if not cuts:
+        return False  # No keyframe after the first segment
+
+    max_workers = max_workers or os.cpu_count()
+    threads_per_worker = threads_per_worker or max(1, os.cpu_count() // max_workers)
+    source_extension = os.path.splitext(input_path)[1]
+    output_extension = os.path.splitext(output_path)[1]
+
+    with tempfile.TemporaryDirectory(prefix="chunked_encode_") as work_dir:
+        # Segments use the input and output containers, which keep the stream
+        # time base (Matroska would round timestamps to milliseconds)
+        source = ffmpeg.input(input_path)
+        ffmpeg.output(
+            source["v:0"],
+            os.path.join(work_dir, f"source_%05d{source_extension}"),
+            c="copy",
+            f="segment",
+            segment_times=",".join(f"{time:.6f}" for time in split_times),
+            reset_timestamps=1,
+        ).global_args("-copyts").run(quiet=True)
+        segments = sorted(
+            os.path.join(work_dir, name)
+            for name in os.listdir(work_dir)
+            if name.startswith("source_")
+        )
+        if len(segments) != len(cuts) + 1:
+            raise RuntimeError(
+                f"Splitting {input_path} gave {len(segments)} segments, "
+                f"expected {len(cuts) + 1}"
+            )
+
+        def encode_segment(segment):
+            encoded = os.path.join(
+                work_dir,
+                os.path.basename(os.path.splitext(segment)[0]).replace(
+                    "source_", "encoded_"
+                )
+                + output_extension,
+            )
+            ffmpeg.input(segment).output(
+                encoded, an=None, threads=threads_per_worker, **video_kwargs
+            ).run(quiet=True)
+            return encoded
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            encoded_segments = list(executor.map(encode_segment, segments))
+
+        # Exact segment durations from the source, so no file's rounded
+        # duration shifts the ones after it
+        bounds = [first_pts] + cuts
+        concat_list = os.path.join(work_dir, "segments.txt")
+        with open(concat_list, "w") as f:
+            for index, segment in enumerate(encoded_segments):
+                f.write(f"file '{segment}'\n")
+                if index + 1 < len(bounds):
+                    f.write(f"duration {bounds[index + 1] - bounds[index]:.6f}\n")
+
+        # The joined video starts at 0; delay it by as much as the source video
+        # starts after the audio
+        offset = first_pts - start_time
+        video = ffmpeg.input(
+            concat_list, f="concat", safe=0, **({"itsoffset": offset} if offset else {})
+        )
+        audio = ffmpeg.input(input_path)
+        ffmpeg.output(
+            video.video,
+            audio["a?"],
+            output_path,
+            vcodec="copy",
+            **(audio_kwargs or {}),
+        ).run(overwrite_output=True)
+
+    output_start, output_packets = _video_timeline(output_path)
+    frame_duration = _span(packets) / len(packets)
+    output_offset = output_packets[0][0] - output_start if output_packets else 0.0
+    if (
+        len(output_packets) != len(packets)
+        or abs(_span(output_packets) - _span(packets)) > frame_duration
+        or abs(output_offset - offset) > frame_duration
+    ):
+        raise RuntimeError(
+            f"Chunked encode of {input_path} does not match the source: "
+            f"{len(output_packets)} frames over "
+            f"{_span(output_packets) if output_packets else 0:.3f}s starting at "
+            f"{output_offset:.3f}s, expected {len(packets)} over "
+            f"{_span(packets):.3f}s starting at {offset:.3f}s"
+        )
+    return True
+
+
+def _encode(
+    input_path: str,
+    output_path: str,
+    video_kwargs: dict,
+    audio_kwargs: dict,
+    chunked: bool,
+    max_workers: int,
+):
+    if chunked and chunked_encode(
+        input_path, output_path, video_kwargs, audio_kwargs, max_workers=max_workers
+    ):
+        return "chunked_transcode"
+
     ffmpeg.input(input_path).output(
-        output_path, vcodec="prores", qscale=0, threads=1
-    ).run()
+        output_path, **video_kwargs, **audio_kwargs, threads=1
+    ).run(overwrite_output=True)
+    return "transcode"
+
+
+def mov_to_mp4(
+    input_path: str,
+    output_path: str,
+    remux: bool = True,
+    chunked: bool = False,
+    max_workers: int = None,
+):
+    """
+    Converts MOV to MP4. When the streams are already MP4-compatible (e.g.
+    H.264/AAC from an iPhone) they are copied losslessly instead of re-encoded.
 
+    :param chunked: Encode long inputs segment by segment in parallel
+    :return: "remux", "transcode" or "chunked_transcode"
+    """
+    if remux:
+        compatible, video_stream, audio_codecs = _can_remux(
+            input_path, MP4_VIDEO_CODECS, MP4_AUDIO_CODECS
+        )
+        if compatible:
+            extra = {"vtag": "hvc1"} if video_stream["codec_name"] == "hevc" else {}
+            _remux(
+                input_path,
+                output_path,
+                video_stream["index"],
+                audio_codecs,
+                movflags="+faststart",
+                **extra,
+            )
+            return "remux"
 
-def video_to_gif(input_path: str, output_path: str):
-    ffmpeg.input(input_path).filter("fps", fps=10).output(output_path, threads=1).run()
+    return _encode(
+        input_path, output_path, *ENCODER_SETTINGS["mov_to_mp4"], chunked, max_workers
+    )
+
+
+def mp4_to_mov(
+    input_path: str,
+    output_path: str,
+    remux: bool = True,
+    chunked: bool = False,
+    max_workers: int = None,
+):
+    """
+    Converts MP4 to MOV, copying the streams when MOV can hold them as-is and
+    otherwise re-encoding to ProRes. Pass remux=False to always get ProRes.
+
+    :param chunked: Encode long inputs segment by segment in parallel
+    :return: "remux", "transcode" or "chunked_transcode"
+    """
+    if remux:
+        compatible, video_stream, audio_codecs = _can_remux(
+            input_path, MOV_VIDEO_CODECS, MOV_AUDIO_CODECS
+        )
+        if compatible:
+            _remux(input_path, output_path, video_stream["index"], audio_codecs)
+            return "remux"
+
+    return _encode(
+        input_path, output_path, *ENCODER_SETTINGS["mp4_to_mov"], chunked, max_workers
+    )
+
+
+def _video_width(input_path: str) -> int:
+    video_streams, _ = _probe_streams(input_path)
+    if not video_streams:
+        raise ValueError(f"{input_path} has no video stream.")
+    return video_streams[0]["width"]
+
+
+def _gif_output(video, output_path, fps, width, source_width, dedup):
+    """Builds the fps/scale/dedup -> palettegen/paletteuse graph for a stream."""
+    video = video.filter("fps", fps=fps)
+    if width < source_width:
+        video = video.filter("scale", width, -1, flags="lanczos")
+    if dedup:
+        video = video.filter("mpdecimate")
+
+    split = video.split()
+    palette = split[0].filter("palettegen", stats_mode="diff")
+    return ffmpeg.filter(
+        [split[1], palette], "paletteuse", dither="bayer", diff_mode="rectangle"
+    ).output(output_path, threads=1)
+
+
+def make_gif(
+    input_path: str,
+    output_path: str,
+    fps: int = 10,
+    max_width: int = None,
+    dedup: bool = True,
+    target_size: int = None,
+    max_attempts: int = 5,
+):
+    """
+    Renders a GIF with a palette generated for this clip. Palette generation and
+    palette mapping run in one filter graph, so the input is decoded only once.
+
+    :param max_width: Downscale wider inputs to this width (keeps aspect ratio)
+    :param dedup: Drop frames that are near-identical to the previous frame
+    :param target_size: Size budget in bytes; when exceeded, the GIF is rendered
+                        again at 80% of the width (up to max_attempts times)
+    :return: False if the GIF is still larger than target_size after
+             max_attempts renders (it is kept), True otherwise
+    :raises ValueError: If the input has no video stream
+    """
+    source_width = _video_width(input_path)
+    width = min(max_width, source_width) if max_width else source_width
+
+    for _ in range(max_attempts):
+        video = ffmpeg.input(input_path).video
+        _gif_output(video, output_path, fps, width, source_width, dedup).run(
+            overwrite_output=True
+        )
+
+        size = os.path.getsize(output_path)
+        if not target_size or size <= target_size:
+            return True
+        width = int(width * 0.8)
+    return False
+
+
+def video_to_gif(
+    input_path: str,
+    output_path: str,
+    fps: int = 10,
+    max_width: int = None,
+    dedup: bool = True,
+    target_size: int = None,
+):
+    """:return: GIF, or GIF_OVER_TARGET if target_size could not be reached"""
+    fits = make_gif(input_path, output_path, fps, max_width, dedup, target_size)
+    return GIF if fits else GIF_OVER_TARGET
 
 
 def gif_to_video(input_path: str, output_path: str):
-    ffmpeg.input(input_path).output(
-        output_path, vcodec="libx264", preset="slow", crf=18, threads=1
-    ).run()
+    video_kwargs, _ = ENCODER_SETTINGS["gif_to_video"]
+    ffmpeg.input(input_path).output(output_path, **video_kwargs, threads=1).run(
+        overwrite_output=True
+    )
+
+
+def live_photo_to_gif(
+    input_path: str,
+    output_path: str,
+    fps: int = 10,
+    max_width: int = None,
+    dedup: bool = True,
+    target_size: int = None,
+):
+    """:return: GIF, or GIF_OVER_TARGET if target_size could not be reached"""
+    fits = make_gif(input_path, output_path, fps, max_width, dedup, target_size)
+    return GIF if fits else GIF_OVER_TARGET
+
+
+def live_photo_to_video(
+    input_path: str, output_path: str, chunked: bool = False, max_workers: int = None
+):
+    return _encode(
+        input_path,
+        output_path,
+        *ENCODER_SETTINGS["live_photo_to_video"],
+        chunked,
+        max_workers,
+    )
+
+
+# Options fan_out understands per kind of target
+GIF_FAN_OUT_OPTIONS = {"fps", "max_width", "dedup", "target_size", "max_attempts"}
+VIDEO_FAN_OUT_OPTIONS = {"remux", "chunked", "max_workers"}
+
+# Video targets fan_out can hand to their own function, and the codecs they copy
+VIDEO_TARGETS = {
+    "mov_to_mp4": (mov_to_mp4, MP4_VIDEO_CODECS, MP4_AUDIO_CODECS),
+    "mp4_to_mov": (mp4_to_mov, MOV_VIDEO_CODECS, MOV_AUDIO_CODECS),
+    "live_photo_to_video": (live_photo_to_video, None, None),
+    "gif_to_video": (gif_to_video, None, None),
+}
+
+
+def _runs_separately(input_path: str, conversion_type: str, options: dict) -> bool:
+    """True for video targets that a shared decode would only slow down."""
+    if options.get("chunked"):
+        return True
+    _, video_codecs_ok, audio_codecs_ok = VIDEO_TARGETS[conversion_type]
+    if video_codecs_ok is None or not options.get("remux", True):
+        return False
+    return _can_remux(input_path, video_codecs_ok, audio_codecs_ok)[0]
+
+
+def fan_out(input_path: str, targets):
+    """
+    Produces several outputs from one input in a single ffmpeg process. The
+    decoded video is split once and fed to every encoder or GIF palette graph;
+    audio is mapped straight from the input into the video targets.
+
+    Video targets that can be remuxed, or that ask for a chunked encode, need
+    no shared decode and run through their own function (e.g. mov_to_mp4)
+    instead. A GIF that misses its target_size is rendered again on its own
+    with make_gif.
+
+    :param targets: (conversion_type, output_path, options) tuples
+    :return: Dict of output_path -> strategy; targets of the shared decode
+             report "shared_decode", GIFs GIF or GIF_OVER_TARGET
+    :raises ValueError: If a target has options fan_out does not support
+    """
+    strategies = {}
+    shared = []
+    for conversion_type, output_path, options in targets:
+        is_gif = output_path.endswith(".gif")
+        supported = GIF_FAN_OUT_OPTIONS if is_gif else VIDEO_FAN_OUT_OPTIONS
+        unsupported = set(options) - supported
+        if unsupported:
+            raise ValueError(
+                f"Options {', '.join(sorted(unsupported))} are not supported for "
+                f"{conversion_type} in a fan-out."
+            )
+        if is_gif or not _runs_separately(input_path, conversion_type, options):
+            shared.append((conversion_type, output_path, options))
+            continue
+        function = VIDEO_TARGETS[conversion_type][0]
+        strategies[output_path] = function(input_path, output_path, **options)
 
+    if not shared:
+        return strategies
 
-def live_photo_to_gif(input_path: str, output_path: str):
-    ffmpeg.input(input_path).filter("fps", fps=10).output(output_path, threads=1).run()
+    source = ffmpeg.input(input_path)
+    source_width = _video_width(input_path)
+    video_streams = source.video.split()
 
+    outputs = []
+    for index, (conversion_type, output_path, options) in enumerate(shared):
+        video = video_streams[index]
+        if output_path.endswith(".gif"):
+            max_width = options.get("max_width")
+            width = min(max_width, source_width) if max_width else source_width
+            outputs.append(
+                _gif_output(
+                    video,
+                    output_path,
+                    options.get("fps", 10),
+                    width,
+                    source_width,
+                    options.get("dedup", True),
+                )
+            )
+        else:
+            video_kwargs, audio_kwargs = ENCODER_SETTINGS[conversion_type]
+            outputs.append(
+                ffmpeg.output(
+                    video, source["a?"], output_path, **video_kwargs, **audio_kwargs
+                )
+            )
+    ffmpeg.merge_outputs(*outputs).run(overwrite_output=True)
 
-def live_photo_to_video(input_path: str, output_path: str):
-    ffmpeg.input(input_path).output(output_path, vcodec="libx264", threads=1).run()
+    for conversion_type, output_path, options in shared:
+        if not output_path.endswith(".gif"):
+            strategies[output_path] = "shared_decode"
+            continue
+        strategies[output_path] = GIF
+        target_size = options.get("target_size")
+        if target_size and os.path.getsize(output_path) > target_size:
+            if not make_gif(input_path, output_path, **options):
+                strategies[output_path] = GIF_OVER_TARGET
+    return strategies
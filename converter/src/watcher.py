@@ -0,0 +1,318 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import signal
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from converter.src.job_queue import JobQueue
+
+# Extension pattern -> conversion type used when no rules are given
+DEFAULT_RULES = {
+    "*.heic": "heic_to_jpg",
+    "*.mov": "mov_to_mp4",
+    "*.wav": "wav_to_mp3",
+    "*.m4a": "m4a_to_mp3",
+    "*.pdf": "pdf_to_docx",
+    "*.docx": "docx_to_pdf",
+}
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_Q_OVERFLOW = 0x4000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def match_rule(path: str, rules: dict):
+    """Returns the conversion type of the first rule matching the file name."""
+    name = os.path.basename(path).lower()
+    for pattern, conversion_type in rules.items():
+        if fnmatch.fnmatch(name, pattern.lower()):
+            return conversion_type
+    return None
+
+
+def _is_candidate(name: str) -> bool:
+    # Hidden files include partial uploads (e.g. rsync temp files) and our queue
+    return not name.startswith(".")
+
+
+def _scan(folder: str):
+    return [
+        (os.path.join(folder, name), None)
+        for name in os.listdir(folder)
+        if _is_candidate(name)
+    ]
+
+
+class InotifyWatcher:
+    """
+    Reports files in a folder as they are created, written or moved in, as
+    (path, writing) pairs: writing is True after IN_CREATE/IN_MODIFY and
+    False once the file was closed (IN_CLOSE_WRITE) or moved in complete.
+    When the kernel's event queue overflowed, the whole folder is reported
+    with writing None, as events were lost.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(folder), mask) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"Cannot watch {folder}")
+
+    def read(self, timeout: float):
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return _scan(self.folder)
+            if name and _is_candidate(name):
+                writing = not mask & (IN_CLOSE_WRITE | IN_MOVED_TO)
+                events.append((os.path.join(self.folder, name), writing))
+        return events
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """
+    Fallback for platforms without inotify: lists the folder every read. It
+    cannot tell whether a file is still open, so writing is always None.
+    """
+
+    def __init__(self, folder: str):
+        self.folder = os.path.abspath(folder)
+
+    def read(self, timeout: float):
+        time.sleep(timeout)
+        return _scan(self.folder)
+
+    def close(self):
+        pass
+
+
+def open_watcher(folder: str):
+    try:
+        return InotifyWatcher(folder)
+    except (OSError, AttributeError):
+        return PollingWatcher(folder)
+
+
+def _signature(path: str):
+    try:
+        stats = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    return stats.st_size, stats.st_mtime_ns
+
+
+class Debouncer:
+    """
+    Holds back files until their size and mtime have not changed for
+    settle_seconds, so files that are still being written are not picked up.
+    A file the watcher saw being written is also held until it is closed.
+    """
+
+    def __init__(self, settle_seconds: float):
+        self.settle_seconds = settle_seconds
+        self._pending = {}  # path -> (signature, time it was last seen changing)
+        self._released = {}  # path -> signature already handed out
+        self._writing = set()  # paths open for writing, per the watcher
+
+    def touch(self, path: str, writing: bool = None):
+        """
+        :param writing: True while the file is open for writing, False once it
+                        was closed, None when the watcher cannot tell (the
+                        size/mtime settle time alone decides then)
+        """
+        path = os.path.abspath(path)
+        if writing:
+            self._writing.add(path)
+        else:
+            self._writing.discard(path)
+
+        signature = _signature(path)
+        if signature is None:
+            self._released.pop(path, None)
+            self._writing.discard(path)
+            return
+        if self._released.get(path) == signature:
+            return
+        pending = self._pending.get(path)
+        if pending is None or pending[0] != signature:
+            self._pending[path] = (signature, time.monotonic())
+
+    def ready(self):
+        now = time.monotonic()
+        settled = []
+        for path, (signature, since) in list(self._pending.items()):
+            current = _signature(path)
+            if current is None:
+                del self._pending[path]
+                self._writing.discard(path)
+            elif current != signature:
+                self._pending[path] = (current, now)
+            elif now - since >= self.settle_seconds and path not in self._writing:
+                del self._pending[path]
+                self._released[path] = signature
+                settled.append(path)
+        return settled
+
+    def prune(self):
+        """Forgets released files that were removed or replaced since."""
+        for path, signature in list(self._released.items()):
+            if _signature(path) != signature:
+                del self._released[path]
+
+
+def _enqueue(queue: JobQueue, path: str, conversion_type: str) -> bool:
+    try:
+        return queue.enqueue(path, conversion_type)
+    except FileNotFoundError:
+        return False  # Removed again before it could be queued
+
+
+def watch_folder(
+    input_folder: str,
+    output_folder: str,
+    convert,
+    rules: dict = None,
+    queue_path: str = None,
+    max_workers: int = None,
+    settle_seconds: float = 2.0,
+    poll_interval: float = 0.5,
+    options: dict = None,
+    prune_interval: float = 60.0,
+):
+    """
+    Watches input_folder and converts new files as they settle. Jobs go through
+    a persistent JobQueue and are drained by a bounded process pool, so a
+    restart resumes pending jobs and skips files that were already converted.
+    A worker crash breaks the pool; it is replaced and the jobs go on. Stops
+    cleanly on SIGINT/SIGTERM after in-flight jobs finish.
+
+    :param convert: Picklable callable run in the workers as
+                    convert(input_file, output_folder, conversion_type,
+                    input_folder, options) and returning a dict with
+                    "success" and "error"
+    :param rules: fnmatch pattern -> conversion type (DEFAULT_RULES if None)
+    :param prune_interval: Seconds between sweeps of files the debouncer no
+                           longer needs to remember
+    :raises ValueError: If output_folder is the watched folder; outputs would
+                        be picked up as inputs (e.g. pdf -> docx -> pdf ...)
+    """
+    rules = rules or DEFAULT_RULES
+    options = options or {}
+    max_workers = max_workers or os.cpu_count()
+    input_folder = os.path.abspath(input_folder)
+    os.makedirs(output_folder, exist_ok=True)
+    if os.path.samefile(input_folder, output_folder):
+        raise ValueError("The output folder must not be the watched folder.")
+
+    queue = JobQueue(queue_path or os.path.join(output_folder, ".convert_queue.db"))
+    queue.recover()
+    watcher = open_watcher(input_folder)
+    debouncer = Debouncer(settle_seconds)
+
+    # Pick up files that arrived while the daemon was down
+    for path, writing in _scan(input_folder):
+        debouncer.touch(path, writing)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    previous_handlers = {
+        signum: signal.signal(signum, stop)
+        for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    print(f"Watching {input_folder} ({type(watcher).__name__})")
+
+    in_flight = {}
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    last_prune = time.monotonic()
+    try:
+        while not stopping or in_flight:
+            if not stopping:
+                for path, writing in watcher.read(poll_interval):
+                    debouncer.touch(path, writing)
+                for path in debouncer.ready():
+                    conversion_type = match_rule(path, rules)
+                    if conversion_type and _enqueue(queue, path, conversion_type):
+                        name = os.path.basename(path)
+                        print(f"Queued {name} ({conversion_type})")
+                if time.monotonic() - last_prune >= prune_interval:
+                    debouncer.prune()
+                    last_prune = time.monotonic()
+            else:
+                time.sleep(poll_interval)
+
+            # Jobs of a crashed worker fail with BrokenProcessPool and count
+            # as an attempt, so a file that crashes every time gives up
+            for future in [future for future in in_flight if future.done()]:
+                job = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    error = None if result["success"] else result["error"]
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                queue.finish(job["id"], error)
+                status = "done" if error is None else f"failed: {error}"
+                print(f"{os.path.basename(job['input_path'])}: {status}")
+
+            if stopping:
+                continue
+            for job in queue.claim(max_workers - len(in_flight)):
+                try:
+                    future = executor.submit(
+                        convert,
+                        os.path.basename(job["input_path"]),
+                        output_folder,
+                        job["conversion_type"],
+                        os.path.dirname(job["input_path"]),
+                        options,
+                    )
+                except BrokenProcessPool:
+                    # The job never ran, so it goes back to the queue; the
+                    # rest of this claim goes to the new pool
+                    queue.requeue(job["id"])
+                    print("Worker pool crashed, starting a new one")
+                    executor.shutdown(wait=False)
+                    executor = ProcessPoolExecutor(max_workers=max_workers)
+                    continue
+                in_flight[future] = job
+    finally:
+        executor.shutdown(wait=True)
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        watcher.close()
+        queue.close()
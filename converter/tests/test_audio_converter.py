@@ -0,0 +1,63 @@
+# tests/test_audio_converter.py
+
+import os
+import shutil
+import tempfile
+import unittest
+import wave
+
+try:
+    import ffmpeg
+except ImportError:
+    ffmpeg = None
+
+
+@unittest.skipUnless(
+    ffmpeg is not None and shutil.which("ffmpeg"),
+    "ffmpeg-python and the ffmpeg binary are required",
+)
+class TestAudioConverter(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.work_dir, "source.wav")
+        # One second of silence at 22.05 kHz, so the WAV target must resample
+        with wave.open(self.source, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(22050)
+            f.writeframes(b"\0\0" * 22050)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_streams_through_ffmpeg_and_back(self):
+        from src.audio_converter import WAV_SAMPLE_RATE, mp3_to_wav, wav_to_mp3
+
+        mp3_path = os.path.join(self.work_dir, "clip.mp3")
+        wav_path = os.path.join(self.work_dir, "clip.wav")
+        with open(mp3_path, "wb") as f:
+            f.write(b"stale")  # Overwritten without a prompt
+        wav_to_mp3(self.source, mp3_path)
+        mp3_to_wav(mp3_path, wav_path)
+
+        self.assertGreater(os.path.getsize(mp3_path), len(b"stale"))
+        with wave.open(wav_path) as f:
+            self.assertEqual(f.getframerate(), WAV_SAMPLE_RATE)
+            self.assertEqual(f.getsampwidth(), 2)
+            # MP3 pads with encoder delay, but the length stays about a second
+            self.assertAlmostEqual(f.getnframes() / WAV_SAMPLE_RATE, 1.0, delta=0.2)
+
+    def test_fan_out_writes_every_target(self):
+        from src.audio_converter import fan_out
+
+        targets = [
+            ("wav_to_mp3", os.path.join(self.work_dir, "out.mp3"), {}),
+            ("mp3_to_wav", os.path.join(self.work_dir, "out.wav"), {}),
+        ]
+        fan_out(self.source, targets)
+        for _, output_path, _ in targets:
+            self.assertGreater(os.path.getsize(output_path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
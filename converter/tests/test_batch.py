@@ -0,0 +1,47 @@
+# tests/test_batch.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import main
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(Image is not None, "Pillow is required")
+class TestBatchConvertFilesParallel(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.output_folder = os.path.join(self.work_dir, "output")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_failing_file_does_not_abort_the_batch(self):
+        with open(os.path.join(self.work_dir, "broken.jpg"), "wb") as f:
+            f.write(b"not a jpeg")
+        for name in ("first.jpg", "second.jpg"):
+            image = Image.new("RGB", (32, 32), (10, 120, 200))
+            image.save(os.path.join(self.work_dir, name), "JPEG")
+
+        results = main.batch_convert_files_parallel(
+            self.work_dir, self.output_folder, "jpg_to_png", "jpg", max_workers=2
+        )
+        self.assertEqual(
+            [(result["input_file"], result["success"]) for result in results],
+            [("broken.jpg", False), ("first.jpg", True), ("second.jpg", True)],
+        )
+        self.assertIsNotNone(results[0]["error"])
+        self.assertIsNone(results[0]["output_path"])
+        for result in results[1:]:
+            self.assertTrue(os.path.exists(result["output_path"]))
+            self.assertIsNotNone(result["size_delta"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# tests/test_chunked_encode.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import ffmpeg
+except ImportError:
+    ffmpeg = None
+
+
+@unittest.skipUnless(
+    ffmpeg is not None and shutil.which("ffmpeg") and shutil.which("ffprobe"),
+    "ffmpeg-python and the ffmpeg binaries are required",
+)
+class TestChunkedEncode(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.work_dir, "source.mp4")
+        # 6 s at 25 fps with a keyframe every 10 frames, plus audio
+        video = ffmpeg.input("testsrc=duration=6:size=160x120:rate=25", f="lavfi")
+        audio = ffmpeg.input("sine=duration=6", f="lavfi")
+        ffmpeg.output(
+            video, audio, self.source, vcodec="libx264", g=10, acodec="aac"
+        ).run(quiet=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def video_stream(self, path):
+        return ffmpeg.probe(path, select_streams="v:0", count_frames=None)[
+            "streams"
+        ][0]
+
+    def test_matches_source(self):
+        from src.video_converter import chunked_encode
+
+        output = os.path.join(self.work_dir, "output.mp4")
+        chunked = chunked_encode(
+            self.source,
+            output,
+            {"vcodec": "libx264", "preset": "ultrafast"},
+            {"acodec": "aac"},
+            segment_seconds=1,
+            max_workers=2,
+        )
+        self.assertTrue(chunked)
+
+        source = self.video_stream(self.source)
+        encoded = self.video_stream(output)
+        self.assertEqual(encoded["nb_read_frames"], source["nb_read_frames"])
+        self.assertAlmostEqual(
+            float(encoded["duration"]), float(source["duration"]), delta=1 / 25
+        )
+
+    def test_short_input_is_left_alone(self):
+        from src.video_converter import chunked_encode
+
+        output = os.path.join(self.work_dir, "output.mp4")
+        encoded = chunked_encode(
+            self.source, output, {"vcodec": "libx264"}, segment_seconds=4
+        )
+        self.assertFalse(encoded)
+        self.assertFalse(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+# tests/test_docx_cleaner.py
+
+import io
+import unittest
+import zipfile
+from xml.etree import ElementTree
+
+from src.docx_cleaner import clean_docx_xml
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
+<w:body>
+<w:p>
+<w:r>
+<w:rPr>
+<w:rFonts w:asciiTheme="minorHAnsi" w:hAnsiTheme="minorHAnsi" w:cs="Times"/>
+<w:b/>
+<w:color w:val="FF0000"/>
+<w:sz w:val="32"/>
+<w:highlight w:val="yellow"/>
+</w:rPr>
+<w:t>Styled</w:t>
+</w:r>
+<w:r><w:t xml:space="preserve">Plain </w:t></w:r>
+</w:p>
+<w:tbl>
+<w:tr>
+<w:tc>
+<w:tcPr><w:tcW w:w="2000" w:type="dxa"/><w:shd w:val="clear" w:fill="FF0000"/></w:tcPr>
+<w:p><w:r><w:t>Cell</w:t></w:r></w:p>
+</w:tc>
+<w:tc><w:p/></w:tc>
+</w:tr>
+</w:tbl>
+</w:body>
+</w:document>
+"""
+
+STYLES = '<w:styles xmlns:w="x"><w:color w:val="FF0000"/></w:styles>'
+
+
+def make_docx(document: str = DOCUMENT) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as docx:
+        docx.writestr("[Content_Types].xml", "<Types/>")
+        docx.writestr("word/document.xml", document)
+        docx.writestr("word/styles.xml", STYLES)
+    buffer.seek(0)
+    return buffer
+
+
+class TestCleanDocxXml(unittest.TestCase):
+    def setUp(self):
+        self.output = io.BytesIO()
+        clean_docx_xml(make_docx(), self.output)
+        self.output.seek(0)
+        with zipfile.ZipFile(self.output) as docx:
+            self.names = docx.namelist()
+            self.styles = docx.read("word/styles.xml").decode()
+            self.document = ElementTree.fromstring(docx.read("word/document.xml"))
+
+    def run_properties(self):
+        return [run.find(f"{W}rPr") for run in self.document.iter(f"{W}r")]
+
+    def test_keeps_every_part(self):
+        self.assertEqual(
+            self.names, ["[Content_Types].xml", "word/document.xml", "word/styles.xml"]
+        )
+        self.assertEqual(self.styles, STYLES)
+
+    def test_runs_get_black_arial_without_size_or_highlight(self):
+        properties = self.run_properties()
+        self.assertEqual(len(properties), 3)
+        for rpr in properties:
+            self.assertIsNotNone(rpr, "Every run gets run properties")
+            fonts = rpr.find(f"{W}rFonts")
+            self.assertEqual(fonts.get(f"{W}ascii"), "Arial")
+            self.assertEqual(fonts.get(f"{W}hAnsi"), "Arial")
+            self.assertIsNone(fonts.get(f"{W}asciiTheme"))
+            self.assertEqual(rpr.find(f"{W}color").get(f"{W}val"), "000000")
+            self.assertIsNone(rpr.find(f"{W}sz"))
+            self.assertIsNone(rpr.find(f"{W}highlight"))
+
+    def test_run_properties_keep_schema_order(self):
+        styled = self.run_properties()[0]
+        self.assertEqual(
+            [child.tag[len(W) :] for child in styled], ["rFonts", "b", "color"]
+        )
+        self.assertEqual(styled.find(f"{W}rFonts").get(f"{W}cs"), "Times")
+
+    def test_cells_get_single_white_fill(self):
+        cells = list(self.document.iter(f"{W}tc"))
+        self.assertEqual(len(cells), 2)
+        for cell in cells:
+            tcpr = cell.find(f"{W}tcPr")
+            shadings = tcpr.findall(f"{W}shd")
+            self.assertEqual(len(shadings), 1)
+            self.assertEqual(shadings[0].get(f"{W}fill"), "FFFFFF")
+        self.assertEqual(
+            [child.tag[len(W) :] for child in cells[0].find(f"{W}tcPr")],
+            ["tcW", "shd"],
+        )
+
+    def test_text_is_preserved(self):
+        texts = [text.text for text in self.document.iter(f"{W}t")]
+        self.assertEqual(texts, ["Styled", "Plain ", "Cell"])
+
+    def test_custom_namespace_prefix(self):
+        document = DOCUMENT.replace("w:", "wx:").replace("xmlns:w=", "xmlns:wx=")
+        output = io.BytesIO()
+        clean_docx_xml(make_docx(document), output)
+        output.seek(0)
+        with zipfile.ZipFile(output) as docx:
+            cleaned = ElementTree.fromstring(docx.read("word/document.xml"))
+        fonts = next(cleaned.iter(f"{W}rFonts"))
+        self.assertEqual(fonts.get(f"{W}ascii"), "Arial")
+
+
+if __name__ == "__main__":
+    unittest.main()
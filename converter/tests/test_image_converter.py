@@ -0,0 +1,104 @@
+# tests/test_image_converter.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import main
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class TestIngestCommand(unittest.TestCase):
+    def test_parses_the_size_box(self):
+        args = main.build_parser().parse_args(
+            ["ingest", "-e", "HEIC", "-e", "jpg", "--size", "1920x1080"]
+        )
+        self.assertEqual(args.extensions, ["HEIC", "jpg"])
+        self.assertEqual(args.size, (1920, 1080))
+        self.assertEqual(args.quality, 100)
+
+
+@unittest.skipUnless(Image is not None, "Pillow is required")
+class TestIngestImages(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.output_folder = os.path.join(self.work_dir, "output")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def make_jpg(self, name, size):
+        path = os.path.join(self.work_dir, name)
+        Image.new("RGB", size, (200, 40, 40)).save(path, "JPEG")
+        return path
+
+    def test_downscales_to_fit_the_box(self):
+        from src.image_converter import ingest_images
+
+        large = self.make_jpg("large.jpg", (1600, 1200))
+        small = self.make_jpg("small.jpg", (100, 50))
+        results = ingest_images([large, small], self.output_folder, size=(400, 400))
+        self.assertTrue(all(result["success"] for result in results))
+        sizes = []
+        for result in results:
+            with Image.open(result["outputs"][0]) as image:
+                sizes.append(image.size)
+        # Aspect ratio is kept and small images are never enlarged
+        self.assertEqual(sizes, [(400, 300), (100, 50)])
+
+    def test_full_size_without_a_box(self):
+        from src.image_converter import ingest_images
+
+        path = self.make_jpg("photo.jpg", (640, 480))
+        (result,) = ingest_images([path], self.output_folder)
+        with Image.open(result["outputs"][0]) as image:
+            self.assertEqual(image.size, (640, 480))
+
+    def test_broken_file_fails_alone(self):
+        from src.image_converter import ingest_images
+
+        broken = os.path.join(self.work_dir, "broken.jpg")
+        with open(broken, "wb") as f:
+            f.write(b"not a jpeg")
+        good = self.make_jpg("good.jpg", (64, 64))
+        results = ingest_images([broken, good], self.output_folder)
+        self.assertEqual([result["success"] for result in results], [False, True])
+        self.assertEqual(results[0]["outputs"], [])
+
+
+@unittest.skipUnless(Image is not None, "Pillow is required")
+class TestColorKey(unittest.TestCase):
+    def test_mask_keys_pixels_within_the_tolerance(self):
+        from src.image_converter import color_key_mask
+
+        image = Image.new("RGB", (4, 1))
+        image.putdata([(255, 255, 255), (250, 252, 255), (240, 255, 255), (0, 0, 0)])
+        mask = color_key_mask(image, (255, 255, 255), tolerance=5)
+        self.assertEqual(mask.mode, "L")
+        self.assertEqual([mask.getpixel((x, 0)) for x in range(4)], [255, 255, 0, 0])
+
+    def test_jpg_to_png_makes_the_keyed_color_transparent(self):
+        from src.image_converter import jpg_to_png
+
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        input_path = os.path.join(work_dir, "input.png")
+        output_path = os.path.join(work_dir, "output.png")
+        image = Image.new("RGB", (2, 1))
+        image.putdata([(255, 255, 255), (10, 20, 30)])
+        image.save(input_path)  # Lossless, so the colors survive exactly
+
+        jpg_to_png(input_path, output_path, transparent_color=(255, 255, 255))
+        with Image.open(output_path) as output:
+            self.assertEqual(output.mode, "RGBA")
+            self.assertEqual(output.getpixel((0, 0)), (255, 255, 255, 0))
+            self.assertEqual(output.getpixel((1, 0)), (10, 20, 30, 255))
+
+
+if __name__ == "__main__":
+    unittest.main()
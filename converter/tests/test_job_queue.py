@@ -0,0 +1,99 @@
+# tests/test_job_queue.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.job_queue import JobQueue
+
+
+class TestJobQueue(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.work_dir, "jobs.db")
+        self.queue = JobQueue(self.db_path, max_attempts=2)
+        self.input_path = os.path.join(self.work_dir, "clip.mov")
+        with open(self.input_path, "wb") as f:
+            f.write(b"movie")
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_same_file_version_is_queued_once(self):
+        self.assertTrue(self.queue.enqueue(self.input_path, "mov_to_mp4"))
+        self.assertFalse(self.queue.enqueue(self.input_path, "mov_to_mp4"))
+        # Another conversion of the same file is a separate job
+        self.assertTrue(self.queue.enqueue(self.input_path, "video_to_gif"))
+
+    def test_changed_file_is_queued_again(self):
+        self.queue.enqueue(self.input_path, "mov_to_mp4")
+        with open(self.input_path, "ab") as f:
+            f.write(b" edited")
+        self.assertTrue(self.queue.enqueue(self.input_path, "mov_to_mp4"))
+
+    def test_claim_and_finish(self):
+        self.queue.enqueue(self.input_path, "mov_to_mp4")
+        jobs = self.queue.claim(5)
+        self.assertEqual(
+            [(job["input_path"], job["conversion_type"]) for job in jobs],
+            [(self.input_path, "mov_to_mp4")],
+        )
+        self.assertEqual(self.queue.claim(5), [])
+        self.assertEqual(self.queue.claim(0), [])
+
+        self.queue.finish(jobs[0]["id"])
+        self.assertEqual(self.queue.counts(), {"done": 1})
+
+    def test_failed_job_is_retried_until_max_attempts(self):
+        self.queue.enqueue(self.input_path, "mov_to_mp4")
+        job = self.queue.claim(1)[0]
+        self.queue.finish(job["id"], "ffmpeg crashed")
+        self.assertEqual(self.queue.counts(), {"pending": 1})
+
+        job = self.queue.claim(1)[0]
+        self.queue.finish(job["id"], "ffmpeg crashed")
+        self.assertEqual(self.queue.counts(), {"failed": 1})
+        self.assertEqual(self.queue.claim(1), [])
+
+    def test_running_jobs_are_recovered_after_restart(self):
+        self.queue.enqueue(self.input_path, "mov_to_mp4")
+        self.queue.claim(1)
+        self.queue.close()
+
+        self.queue = JobQueue(self.db_path, max_attempts=2)
+        self.assertEqual(self.queue.counts(), {"running": 1})
+        self.queue.recover()
+        self.assertEqual(len(self.queue.claim(1)), 1)
+
+
+class TestJobQueuePaths(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.queue = JobQueue(os.path.join(self.work_dir, "jobs.db"))
+        self.path = os.path.join(self.work_dir, "clip.mov")
+        with open(self.path, "wb") as f:
+            f.write(b"movie")
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.work_dir)
+
+    def test_relative_and_absolute_paths_are_one_job(self):
+        self.assertTrue(self.queue.enqueue(os.path.relpath(self.path), "mov_to_mp4"))
+        self.assertFalse(self.queue.enqueue(self.path, "mov_to_mp4"))
+        self.assertEqual(self.queue.claim(1)[0]["input_path"], self.path)
+
+    def test_requeue_does_not_use_up_an_attempt(self):
+        queue = JobQueue(os.path.join(self.work_dir, "retry.db"), max_attempts=2)
+        queue.enqueue(self.path, "mov_to_mp4")
+        queue.requeue(queue.claim(1)[0]["id"])
+        job = queue.claim(1)[0]
+        queue.finish(job["id"], "crashed")
+        self.assertEqual(queue.counts(), {"pending": 1})
+        queue.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
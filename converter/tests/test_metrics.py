@@ -0,0 +1,70 @@
+# tests/test_metrics.py
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+
+
+def fake_converter(input_path, output_path):
+    with open(output_path, "wb") as f:
+        f.write(b"converted")
+    return "transcode"
+
+
+class TestRunConversionMetrics(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.records = []
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def convert(self, input_file, **kwargs):
+        with mock.patch.object(main, "get_converter", return_value=fake_converter):
+            return main.run_conversion(
+                input_file,
+                self.work_dir,
+                "wav_to_mp3",
+                input_folder=self.work_dir,
+                on_metrics=self.records.append,
+                **kwargs,
+            )
+
+    def test_successful_conversion_is_recorded(self):
+        with open(os.path.join(self.work_dir, "clip.wav"), "wb") as f:
+            f.write(b"audio")
+        sink = os.path.join(self.work_dir, "metrics.jsonl")
+        result = self.convert("clip.wav", metrics_sink=sink)
+        self.assertEqual(self.records, [result["metrics"]])
+        record = self.records[0]
+        self.assertTrue(record["success"])
+        self.assertEqual(record["strategy"], "transcode")
+        self.assertEqual((record["bytes_in"], record["bytes_out"]), (5, 9))
+        with open(sink) as f:
+            self.assertEqual(json.loads(f.readline())["strategy"], "transcode")
+
+    def test_missing_input_is_recorded_as_a_failure(self):
+        with self.assertRaises(FileNotFoundError):
+            self.convert("missing.wav")
+        self.assertEqual(len(self.records), 1)
+        self.assertFalse(self.records[0]["success"])
+        self.assertIn("FileNotFoundError", self.records[0]["error"])
+
+    def test_process_pool_batch_rejects_a_callback(self):
+        with self.assertRaises(ValueError):
+            main.batch_convert_files_parallel(
+                self.work_dir,
+                self.work_dir,
+                "wav_to_mp3",
+                "wav",
+                on_metrics=self.records.append,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# tests/test_office_pool.py
+
+import subprocess
+import threading
+import time
+import unittest
+from unittest import mock
+
+from src import office_pool
+from src.office_pool import OfficePool, OfficeWorker
+
+
+class HungDesktop:
+    """Stands in for a LibreOffice desktop that no longer answers."""
+
+    def __init__(self):
+        self.released = threading.Event()
+
+    def terminate(self):
+        self.released.wait()
+
+
+class FakeWorker:
+    def __init__(self, soffice=None, **options):
+        self.converted = []
+
+    def start(self):
+        pass
+
+    def is_healthy(self):
+        return True
+
+    def convert(self, input_path, output_path):
+        self.converted.append(input_path)
+
+    def stop(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+class TestOfficeWorker(unittest.TestCase):
+    def test_stop_kills_an_office_that_does_not_terminate(self):
+        worker = OfficeWorker(health_timeout=0.2)
+        worker.process = subprocess.Popen(["sleep", "60"])
+        worker._desktop = desktop = HungDesktop()
+        try:
+            start = time.monotonic()
+            worker.stop()
+            self.assertLess(time.monotonic() - start, 5)
+            self.assertIsNone(worker.process)
+        finally:
+            desktop.released.set()
+
+
+class TestOfficePool(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(office_pool, "OfficeWorker", FakeWorker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_convert_after_close_raises(self):
+        pool = OfficePool(size=1)
+        pool.convert("a.docx", "a.pdf")
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            pool.convert("b.docx", "b.pdf")
+
+    def test_close_releases_callers_waiting_for_a_worker(self):
+        pool = OfficePool(size=1)
+        worker = pool._idle.get()  # Busy with another conversion
+        errors = []
+
+        def convert():
+            try:
+                pool.convert("a.docx", "a.pdf")
+            except RuntimeError as e:
+                errors.append(e)
+
+        waiting = threading.Thread(target=convert)
+        waiting.start()
+        pool.close(timeout=0.1)
+        waiting.join(timeout=5)
+        self.assertFalse(waiting.is_alive())
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(worker.converted, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+# tests/test_optimizer.py
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(Image is not None, "Pillow is required")
+class TestOptimizeJpg(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def make_jpg(self, name, quality):
+        # Noise compresses poorly, so the quality setting shows in the size
+        noise = random.Random(0).randbytes(128 * 128 * 3)
+        image = Image.frombytes("RGB", (128, 128), noise)
+        path = os.path.join(self.work_dir, name)
+        image.save(path, "JPEG", quality=quality)
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_smaller_result_replaces_the_original(self):
+        from src.optimizer import optimize_file
+
+        path = self.make_jpg("photo.jpg", quality=100)
+        original_bytes = os.path.getsize(path)
+        result = optimize_file(path, quality=50)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["original_bytes"], original_bytes)
+        self.assertEqual(result["optimized_bytes"], os.path.getsize(path))
+        self.assertEqual(
+            result["bytes_saved"], original_bytes - result["optimized_bytes"]
+        )
+        self.assertGreater(result["bytes_saved"], 0)
+
+    def test_larger_result_keeps_the_original(self):
+        from src.optimizer import optimize_file
+
+        path = self.make_jpg("photo.jpg", quality=20)
+        before = self.read(path)
+        result = optimize_file(path, quality=95)
+        self.assertTrue(result["success"])
+        self.assertEqual(result["bytes_saved"], 0)
+        self.assertEqual(self.read(path), before)
+        self.assertEqual(os.listdir(self.work_dir), ["photo.jpg"])
+
+    def test_budget_is_met_when_reachable(self):
+        from src.optimizer import optimize_file
+
+        path = self.make_jpg("photo.jpg", quality=100)
+        budget = os.path.getsize(self.make_jpg("reference.jpg", quality=40))
+        result = optimize_file(path, quality=95, max_bytes=budget)
+        self.assertTrue(result["success"])
+        self.assertLessEqual(os.path.getsize(path), budget)
+
+    def test_hardlinked_copy_is_left_intact(self):
+        from src.optimizer import optimize_file
+
+        path = self.make_jpg("photo.jpg", quality=100)
+        cache_entry = os.path.join(self.work_dir, "cache_entry.jpg")
+        os.link(path, cache_entry)
+        before = self.read(cache_entry)
+        optimize_file(path, quality=50)
+        self.assertEqual(self.read(cache_entry), before)
+        self.assertNotEqual(self.read(path), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
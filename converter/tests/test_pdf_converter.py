@@ -0,0 +1,41 @@
+# tests/test_pdf_converter.py
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import pdf_converter
+
+# Records the child's working directory and arguments instead of parsing
+FAKE_PARSE = """
+import os, sys
+with open(sys.argv[2], "w") as f:
+    f.write("\\n".join([os.getcwd()] + sys.argv[1:]))
+"""
+
+
+class TestMultiProcessParse(unittest.TestCase):
+    def test_child_runs_in_the_work_dir(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as work_dir, mock.patch.object(
+            pdf_converter, "_MULTI_PROCESS_PARSE", FAKE_PARSE
+        ):
+            raw_path = pdf_converter._parse_in_child("in.pdf", 2, None, 4, work_dir)
+            with open(raw_path) as f:
+                child_cwd, input_path, _, start, end, workers = f.read().split("\n")
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(os.path.realpath(child_cwd), os.path.realpath(work_dir))
+        self.assertEqual(input_path, os.path.abspath("in.pdf"))
+        self.assertEqual((start, end, workers), ("2", "", "4"))
+
+    def test_child_failure_raises(self):
+        with tempfile.TemporaryDirectory() as work_dir, mock.patch.object(
+            pdf_converter, "_MULTI_PROCESS_PARSE", "raise SystemExit('bad pdf')"
+        ):
+            with self.assertRaisesRegex(RuntimeError, "bad pdf"):
+                pdf_converter._parse_in_child("in.pdf", 0, None, 2, work_dir)
+
+
+if __name__ == "__main__":
+    unittest.main()
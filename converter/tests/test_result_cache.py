@@ -0,0 +1,163 @@
+# tests/test_result_cache.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from src.result_cache import ResultCache
+
+
+def fake_converter(input_path, output_path):
+    # Writes in place, like the real backends
+    with open(input_path, "rb") as source, open(output_path, "wb") as output:
+        output.write(b"converted:" + source.read())
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.cache = ResultCache(os.path.join(self.work_dir, "cache"))
+        self.input_path = self.write("input.wav", b"audio")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.work_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_miss_then_hit(self):
+        key = self.cache.make_key(self.input_path, "wav_to_mp3", {})
+        output_path = os.path.join(self.work_dir, "output.mp3")
+        self.assertFalse(self.cache.fetch(key, output_path))
+        self.assertFalse(os.path.exists(output_path))
+
+        self.write("output.mp3", b"mp3")
+        self.cache.store(key, output_path)
+        os.remove(output_path)
+        self.assertTrue(self.cache.fetch(key, output_path))
+        self.assertEqual(self.read(output_path), b"mp3")
+
+    def test_key_covers_content_type_and_options(self):
+        key = self.cache.make_key(self.input_path, "gif_to_video", {"fps": 10})
+        self.assertNotEqual(
+            key, self.cache.make_key(self.input_path, "video_to_gif", {"fps": 10})
+        )
+        self.assertNotEqual(
+            key, self.cache.make_key(self.input_path, "gif_to_video", {"fps": 12})
+        )
+        other_input = self.write("other.wav", b"other audio")
+        self.assertNotEqual(
+            key, self.cache.make_key(other_input, "gif_to_video", {"fps": 10})
+        )
+
+    def test_tuple_and_list_options_share_a_key(self):
+        self.assertEqual(
+            self.cache.make_key(
+                self.input_path, "jpg_to_png", {"transparent_color": (255, 255, 255)}
+            ),
+            self.cache.make_key(
+                self.input_path, "jpg_to_png", {"transparent_color": [255, 255, 255]}
+            ),
+        )
+
+    def test_evicts_least_recently_used(self):
+        self.cache.max_bytes = 10
+        output_path = self.write("output.bin", b"x" * 4)
+        keys = ["a" * 64, "b" * 64, "c" * 64]
+        for age, key in enumerate(keys[:2]):
+            self.cache.store(key, output_path)
+            entry = self.cache._entry_path(key, output_path)
+            os.utime(entry, (1000 + age, 1000 + age))
+        # Using the oldest entry makes the second one the eviction candidate
+        self.assertTrue(self.cache.fetch(keys[0], output_path))
+        self.cache.store(keys[2], output_path)
+
+        stored = [
+            os.path.exists(self.cache._entry_path(key, output_path)) for key in keys
+        ]
+        self.assertEqual(stored, [True, False, True])
+
+    def test_directory_is_only_walked_when_over_the_limit(self):
+        self.cache.max_bytes = 10
+        output_path = self.write("output.bin", b"x" * 4)
+        with mock.patch("os.walk", wraps=os.walk) as walk:
+            self.cache.store("a" * 64, output_path)  # First store scans once
+            self.cache.store("b" * 64, output_path)
+            self.assertEqual(walk.call_count, 1)
+            self.cache.store("c" * 64, output_path)  # 12 bytes: evicts
+            self.assertEqual(walk.call_count, 2)
+
+    def test_entry_evicted_during_fetch_is_a_miss(self):
+        key = "a" * 64
+        output_path = self.write("output.mp3", b"mp3")
+        self.cache.store(key, output_path)
+        entry = self.cache._entry_path(key, output_path)
+        real_link = os.link
+
+        def evict_then_link(source, destination):
+            os.remove(entry)  # Another worker evicts between check and link
+            real_link(source, destination)
+
+        with mock.patch("os.link", side_effect=evict_then_link):
+            self.assertFalse(self.cache.fetch(key, output_path))
+        self.assertFalse(os.path.exists(output_path))
+
+
+class TestRunConversionCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.work_dir, "input")
+        self.output_dir = os.path.join(self.work_dir, "output")
+        os.makedirs(self.input_dir)
+        os.makedirs(self.output_dir)
+        self.cache = ResultCache(os.path.join(self.work_dir, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def write_input(self, content: bytes):
+        with open(os.path.join(self.input_dir, "test.wav"), "wb") as f:
+            f.write(content)
+
+    def convert(self):
+        with mock.patch.object(main, "get_converter", return_value=fake_converter):
+            return main.run_conversion(
+                "test.wav",
+                self.output_dir,
+                "wav_to_mp3",
+                input_folder=self.input_dir,
+                cache=self.cache,
+            )
+
+    def test_miss_after_hit_leaves_entry_intact(self):
+        self.write_input(b"first")
+        self.assertFalse(self.convert()["cache_hit"])
+        result = self.convert()
+        self.assertTrue(result["cache_hit"])
+
+        # A changed input misses and is converted onto the same output path
+        self.write_input(b"second")
+        result = self.convert()
+        self.assertFalse(result["cache_hit"])
+        with open(result["output_path"], "rb") as f:
+            self.assertEqual(f.read(), b"converted:second")
+
+        self.write_input(b"first")
+        result = self.convert()
+        self.assertTrue(result["cache_hit"])
+        with open(result["output_path"], "rb") as f:
+            self.assertEqual(f.read(), b"converted:first")
+
+
+if __name__ == "__main__":
+    unittest.main()
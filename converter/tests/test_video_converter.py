@@ -0,0 +1,50 @@
+# tests/test_video_converter.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import ffmpeg
+except ImportError:
+    ffmpeg = None
+
+
+@unittest.skipUnless(
+    ffmpeg is not None and shutil.which("ffmpeg") and shutil.which("ffprobe"),
+    "ffmpeg-python and the ffmpeg binaries are required",
+)
+class TestVideoConverter(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.work_dir, "source.mov")
+        video = ffmpeg.input("testsrc=duration=1:size=160x120:rate=10", f="lavfi")
+        ffmpeg.output(video, self.source, vcodec="libx264").run(quiet=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_existing_outputs_are_overwritten(self):
+        from src.video_converter import mov_to_mp4
+
+        output = os.path.join(self.work_dir, "output.mp4")
+        for remux, strategy in ((True, "remux"), (False, "transcode")):
+            with open(output, "wb") as f:
+                f.write(b"stale")
+            # Without -y ffmpeg would stop at its overwrite prompt
+            self.assertEqual(mov_to_mp4(self.source, output, remux=remux), strategy)
+            self.assertGreater(os.path.getsize(output), len(b"stale"))
+
+    def test_missed_gif_target_is_reported(self):
+        from src.video_converter import GIF, GIF_OVER_TARGET, video_to_gif
+
+        output = os.path.join(self.work_dir, "output.gif")
+        self.assertEqual(video_to_gif(self.source, output), GIF)
+        missed = video_to_gif(self.source, output, target_size=1)
+        self.assertEqual(missed, GIF_OVER_TARGET)
+        self.assertTrue(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
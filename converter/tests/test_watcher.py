@@ -0,0 +1,144 @@
+# tests/test_watcher.py
+
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from src.job_queue import JobQueue
+from src.watcher import Debouncer, InotifyWatcher, watch_folder
+
+
+class TestDebouncer(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.work_dir, "clip.mov")
+        with open(self.path, "wb") as f:
+            f.write(b"movie")
+        self.debouncer = Debouncer(settle_seconds=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_settled_file_is_released_once(self):
+        self.debouncer.touch(self.path)
+        self.assertEqual(self.debouncer.ready(), [self.path])
+        self.debouncer.touch(self.path)
+        self.assertEqual(self.debouncer.ready(), [])
+
+    def test_open_file_waits_for_close(self):
+        self.debouncer.touch(self.path, writing=True)
+        self.assertEqual(self.debouncer.ready(), [])
+        self.debouncer.touch(self.path, writing=False)
+        self.assertEqual(self.debouncer.ready(), [self.path])
+
+    def test_paths_are_absolute(self):
+        relative = os.path.relpath(self.path)
+        self.debouncer.touch(relative)
+        self.assertEqual(self.debouncer.ready(), [os.path.abspath(relative)])
+
+    def test_prune_forgets_removed_files(self):
+        self.debouncer.touch(self.path)
+        self.debouncer.ready()
+        os.remove(self.path)
+        self.debouncer.prune()
+        self.assertEqual(self.debouncer._released, {})
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestInotifyWatcher(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.watcher = InotifyWatcher(self.work_dir)
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.work_dir)
+
+    def read_all(self):
+        events = []
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            batch = self.watcher.read(0.1)
+            if not batch and events:
+                break
+            events.extend(batch)
+        return events
+
+    def test_reports_writes_then_close(self):
+        path = os.path.join(self.work_dir, "clip.mov")
+        with open(path, "wb") as f:
+            f.write(b"movie")
+            f.flush()
+            self.assertIn((path, True), self.read_all())
+        self.assertEqual(self.read_all()[-1], (path, False))
+
+    def test_hidden_files_are_ignored(self):
+        with open(os.path.join(self.work_dir, ".partial"), "wb") as f:
+            f.write(b"x")
+        self.assertEqual(self.watcher.read(0.2), [])
+
+
+def crash_once(input_file, output_folder, conversion_type, input_folder, options):
+    # Kills the worker process the first time, like a segfaulting backend
+    marker = os.path.join(output_folder, "crashed")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return {"success": True, "error": None}
+
+
+class TestWatchFolder(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.work_dir, "input")
+        self.output_dir = os.path.join(self.work_dir, "output")
+        os.makedirs(self.input_dir)
+        self.queue_path = os.path.join(self.work_dir, "jobs.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def stop_when_done(self):
+        queue = JobQueue(self.queue_path)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline and queue.counts() != {"done": 1}:
+            time.sleep(0.05)
+        queue.close()
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    def test_recovers_from_a_crashed_worker(self):
+        with open(os.path.join(self.input_dir, "clip.mov"), "wb") as f:
+            f.write(b"movie")
+        threading.Thread(target=self.stop_when_done, daemon=True).start()
+        watch_folder(
+            self.input_dir,
+            self.output_dir,
+            crash_once,
+            queue_path=self.queue_path,
+            max_workers=1,
+            settle_seconds=0,
+            poll_interval=0.05,
+        )
+
+        queue = JobQueue(self.queue_path)
+        self.assertEqual(queue.counts(), {"done": 1})
+        queue.close()
+
+    def test_refuses_to_write_into_the_watched_folder(self):
+        # pdf_to_docx and docx_to_pdf would keep converting each other's output
+        with self.assertRaises(ValueError):
+            watch_folder(
+                self.input_dir,
+                os.path.join(self.input_dir, "."),
+                crash_once,
+                queue_path=self.queue_path,
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()